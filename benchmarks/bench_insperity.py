@@ -0,0 +1,317 @@
+"""
+Benchmarks for the Insperity REST API client
+
+Measures the throughput (records per second) and peak memory of the client's stages against a local
+MockInsperityServer, for several workforce sizes and page sizes:
+
+- process_multipage_response -- paging and JSON decoding of the employee list (sequential and parallel pages)
+- get_employee_list vs. get_minimal_employee_list -- paging, decoding and building the records
+- fill_employee_record and fill_minimal_employee_record -- building the records from raw dictionaries (no network)
+- token refresh under contention -- many threads finding the access token expired at the same time
+
+Run from the repository root:
+
+    python -m benchmarks.bench_insperity                            # run and print the results
+    python -m benchmarks.bench_insperity --save                     # ... and save them as the baseline
+    python -m benchmarks.bench_insperity --compare                  # ... and compare them to the baseline
+    python -m benchmarks.bench_insperity --sizes 1000 100000 --page-sizes 100 --latency 0.01
+
+The results are saved as JSON in benchmarks/baselines/<name>.json (--name, defaults to "default"). With --compare,
+any benchmark that is more than --threshold slower than the baseline (or uses that much more memory) is reported,
+and the exit status is 1. Each timing is the best of --repeat runs, after one warm up run. The peak memory is the
+peak of the Python allocations (tracemalloc) during one more run.
+
+Len Wanger
+2025
+"""
+
+import argparse
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+import gc
+import json
+import math
+import os
+from pathlib import Path
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+
+os.environ.setdefault('INSPERITY_CLIENT_ID', "benchmark")
+os.environ.setdefault('INSPERITY_SECRET', "benchmark")
+
+import insperity_rest_api as rest_api
+from insperity_mock_server import MockInsperityServer, MockServerConfig
+from insperity_rest_client import InsperityClient, set_default_client
+from insperity_rest_ratelimit import AdaptiveRateLimiter
+from insperity_rest_utils import fill_employee_record, fill_minimal_employee_record, get_headers
+
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+DEFAULT_SIZES = (1_000, 10_000)
+DEFAULT_PAGE_SIZES = (100, 500)
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25  # fraction slower (or more memory) than the baseline reported as a regression
+TOKEN_THREAD_COUNTS = (1, 8, 32)
+CLIENT_RATE = 100_000.0  # requests per second for the client's rate limiter -- high enough to not be measured
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    params: dict
+    records: int
+    seconds: float  # best of the timed runs
+    peak_bytes: int|None = None
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        params = ",".join(f"{name}={value}" for name, value in self.params.items())
+        return f"{self.name}[{params}]"
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.seconds if self.seconds > 0.0 else math.inf
+
+
+def measure(name: str, params: dict, function: Callable[[], tuple[int, dict]], repeat: int=DEFAULT_REPEAT,
+            memory: bool=True) -> BenchmarkResult:
+    """
+    Time a benchmark function (best of repeat runs after a warm up run) and measure its peak memory.
+
+    :param name: name of the benchmark
+    :param params: parameters of the benchmark (e.g. size and page size), part of its key in the baseline
+    :param function: function called with no arguments that returns (number of records, dictionary of extra values)
+    :param repeat: number of timed runs
+    :param memory: if True, measure the peak memory (tracemalloc) in one more run
+    :return: BenchmarkResult
+    """
+    records, extra = function()  # warm up
+    timings = []
+
+    for _ in range(repeat):
+        gc.collect()
+        start_time = time.perf_counter()
+        records, extra = function()
+        timings.append(time.perf_counter() - start_time)
+
+    peak_bytes = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            function()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return BenchmarkResult(name, params, records, min(timings), peak_bytes, extra)
+
+
+def _use_client():
+    # a fresh client for each benchmark: no response cache, and a rate limiter that doesn't slow it down
+    set_default_client(InsperityClient(rate_limiter=AdaptiveRateLimiter(rate=CLIENT_RATE, max_rate=CLIENT_RATE)))
+
+
+def bench_paging(server: MockInsperityServer, size: int, page_size: int, repeat: int,
+                 memory: bool) -> list[BenchmarkResult]:
+    # benchmark getting the employee lists from a server with size employees and page_size records per page
+    _use_client()
+    token_dict, client_id, legal_id = rest_api.get_credentials(client_code="MOCK")
+    params = {'size': size, 'page_size': page_size}
+    pages = math.ceil(size / page_size)
+    results = []
+
+    url, headers, request_params = rest_api._employee_list_request(token_dict, client_id, legal_id)
+    for max_workers in (1, rest_api.DEFAULT_PAGE_WORKERS):
+        def process_pages():
+            raw_list = rest_api.process_multipage_response(url, headers, request_params, max_workers=max_workers,
+                                                           token_dict=token_dict)
+            return len(raw_list), {'pages': pages}
+
+        results.append(measure("process_multipage_response", {**params, 'max_workers': max_workers}, process_pages,
+                               repeat, memory))
+
+    def get_employee_list():
+        return len(rest_api.get_employee_list(token_dict, client_id, legal_id)), {'pages': pages}
+
+    def get_minimal_employee_list():
+        return len(rest_api.get_minimal_employee_list(token_dict, client_id, legal_id)), {'pages': pages}
+
+    results.append(measure("get_employee_list", params, get_employee_list, repeat, memory))
+    results.append(measure("get_minimal_employee_list", params, get_minimal_employee_list, repeat, memory))
+    return results
+
+
+def bench_records(server: MockInsperityServer, size: int, repeat: int, memory: bool) -> list[BenchmarkResult]:
+    # benchmark building the records from the raw dictionaries (the raw lists are fetched once, not timed)
+    _use_client()
+    token_dict, client_id, legal_id = rest_api.get_credentials(client_code="MOCK")
+    raw_employees = rest_api.get_employee_list_raw(token_dict, client_id, legal_id)
+    raw_minimal_employees = rest_api.get_minimal_employee_list_raw(token_dict, client_id, legal_id)
+
+    def fill_employees():
+        return len([fill_employee_record(raw_employee) for raw_employee in raw_employees]), {}
+
+    def fill_minimal_employees():
+        return len([fill_minimal_employee_record(raw_employee) for raw_employee in raw_minimal_employees]), {}
+
+    return [measure("fill_employee_record", {'size': size}, fill_employees, repeat, memory),
+            measure("fill_minimal_employee_record", {'size': size}, fill_minimal_employees, repeat, memory)]
+
+
+def bench_token_refresh(server: MockInsperityServer, repeat: int, memory: bool) -> list[BenchmarkResult]:
+    # benchmark thread_count threads each requesting a different employee just after all of the access tokens
+    #   expired -- every request gets a 401, and only one of them should refresh the token
+    _use_client()
+    token_dict, client_id, legal_id = rest_api.get_credentials(client_code="MOCK")
+    results = []
+
+    for thread_count in TOKEN_THREAD_COUNTS:
+        urls = [rest_api.EMPLOYEE_BY_ID.format(base_url=rest_api.BASE_URL, client_id=client_id, legal_id=legal_id,
+                                               employee_id=server.workforce.employee_id(index))
+                for index in range(thread_count)]
+
+        def refresh_under_contention():
+            server.expire_tokens()
+            token_requests = server.request_counts['token']
+            barrier = threading.Barrier(thread_count)
+
+            def get_employee(url: str):
+                barrier.wait()
+                rest_api.process_response(url, get_headers(token_dict['access_token']), {}, token_dict=token_dict)
+
+            threads = [threading.Thread(target=get_employee, args=(url,)) for url in urls]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            return thread_count, {'token_requests': server.request_counts['token'] - token_requests}
+
+        results.append(measure("token_refresh_contention", {'threads': thread_count}, refresh_under_contention,
+                               repeat, memory))
+
+    return results
+
+
+def run_benchmarks(sizes: list[int], page_sizes: list[int], repeat: int=DEFAULT_REPEAT, latency: float=0.0,
+                   memory: bool=True, progress: bool=True) -> list[BenchmarkResult]:
+    """
+    Run all of the benchmarks.
+
+    :param sizes: numbers of employees in the mock workforce
+    :param page_sizes: numbers of records per page
+    :param repeat: number of timed runs of each benchmark
+    :param latency: seconds of latency the mock server adds to each response
+    :param memory: if True, measure the peak memory of each benchmark
+    :param progress: if True, print each result as it finishes
+    :return: list of BenchmarkResult
+    """
+    results = []
+
+    def add_results(new_results: list[BenchmarkResult]):
+        results.extend(new_results)
+        if progress:
+            for result in new_results:
+                print(format_result(result), flush=True)
+
+    for size in sizes:
+        for page_size in page_sizes:
+            config = MockServerConfig(employees=size, legals=1, page_size=page_size, latency=latency,
+                                      page_cache=math.ceil(size / page_size) + 1)
+
+            with MockInsperityServer(config) as server:
+                rest_api.set_base_url(server.base_url)
+                add_results(bench_paging(server, size, page_size, repeat, memory))
+
+                if page_size == page_sizes[0]:
+                    add_results(bench_records(server, size, repeat, memory))
+
+                if (size == sizes[0]) and (page_size == page_sizes[0]):
+                    add_results(bench_token_refresh(server, repeat, memory))
+
+    rest_api.set_base_url(None)
+    set_default_client(None)
+    return results
+
+
+def format_result(result: BenchmarkResult) -> str:
+    memory = f"{result.peak_bytes / 2**20:9.1f} MiB" if result.peak_bytes is not None else " " * 13
+    extra = " ".join(f"{name}={value}" for name, value in result.extra.items())
+    return f"{result.key:<70} {result.seconds:9.4f} s {result.records_per_second:12,.0f} rec/s {memory}  {extra}"
+
+
+def save_baseline(path: Path, results: list[BenchmarkResult]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': {result.key: {**asdict(result), 'records_per_second': result.records_per_second}
+                    for result in results},
+    }
+    path.write_text(json.dumps(baseline, indent=2))
+
+
+def compare_to_baseline(path: Path, results: list[BenchmarkResult], threshold: float=DEFAULT_THRESHOLD) -> list[str]:
+    # return a description of each regression (slower, or more peak memory, by more than threshold) from the baseline
+    baseline = json.loads(path.read_text())['results']
+    regressions = []
+
+    for result in results:
+        previous = baseline.get(result.key, None)
+        if previous is None:
+            continue
+
+        if result.seconds > previous['seconds'] * (1.0 + threshold):
+            regressions.append(f"{result.key}: {result.seconds:.4f} s (baseline {previous['seconds']:.4f} s)")
+
+        if (result.peak_bytes is not None) and (previous['peak_bytes'] is not None) and \
+                (result.peak_bytes > previous['peak_bytes'] * (1.0 + threshold)):
+            regressions.append(f"{result.key}: peak memory {result.peak_bytes:,} bytes "
+                               f"(baseline {previous['peak_bytes']:,} bytes)")
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Insperity REST API client against a mock server")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="numbers of employees")
+    parser.add_argument('--page-sizes', type=int, nargs='+', default=list(DEFAULT_PAGE_SIZES), help="records per page")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="timed runs of each benchmark")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds of latency added to each response")
+    parser.add_argument('--no-memory', action='store_true', help="don't measure the peak memory")
+    parser.add_argument('--name', default="default", help="name of the baseline file")
+    parser.add_argument('--save', action='store_true', help="save the results as the baseline")
+    parser.add_argument('--compare', action='store_true', help="compare the results to the baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="regression threshold (fraction)")
+    args = parser.parse_args()
+
+    baseline_path = BASELINE_DIR / f"{args.name}.json"
+    results = run_benchmarks(args.sizes, args.page_sizes, repeat=args.repeat, latency=args.latency,
+                             memory=not args.no_memory)
+    exit_status = 0
+
+    if args.compare:
+        if not baseline_path.exists():
+            print(f"\nno baseline to compare to: {baseline_path}")
+        else:
+            regressions = compare_to_baseline(baseline_path, results, threshold=args.threshold)
+            print(f"\n{len(regressions)} regressions from {baseline_path}")
+            for regression in regressions:
+                print(f"\t{regression}")
+            exit_status = 1 if regressions else 0
+
+    if args.save:
+        save_baseline(baseline_path, results)
+        print(f"\nsaved baseline: {baseline_path}")
+
+    return exit_status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
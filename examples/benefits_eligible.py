@@ -1,24 +1,27 @@
 """
 Example of calling the Insperity REST API using the insperity_mcp package to find employees who are eligible for benefits.
 
-    X status == active
+    - status == active
     - type is salaried, or FT equiv. (hourly with >= 30 hrs per week)
     - get name and email
     - save to CSV file
 
+The rules are evaluated for all of the employees at once with the eligibility engine (insperity_benefits_eligibility),
+which also gives the reason each ineligible employee didn't qualify.
+
 Len Wanger
 2025
 """
-from tarfile import fully_trusted_filter
-
 from dotenv import load_dotenv
 
+from insperity_benefits_eligibility import DEFAULT_LOOKBACK_WEEKS, DEFAULT_RULES, evaluate_eligibility, pay_type_mask
+from insperity_employee_table import EmployeeTable
+from insperity_export import export_records
 from insperity_rest_api import *
+from insperity_timecard_hours import TimecardWeekCache, get_hours_worked
 
 
 if __name__ == '__main__':
-    eligible_employees = []
-
     # load environment variables from .env file, such as client_code and api secret
     load_dotenv()
 
@@ -28,19 +31,26 @@ if __name__ == '__main__':
     # Get access credentials (token_dict, client_id, legal_id) to call the API endpoints
     token_dict, client_id, legal_id = get_credentials(client_code=legal_id_ves, legal_name_substring=None)
 
-    full_employee_list = get_employee_list(token_dict=token_dict, client_id=client_id, legal_id=legal_id, employee_status_filter="Active")
-    employee_list = []
+    table = EmployeeTable.from_api(token_dict=token_dict, client_id=client_id, legal_id=legal_id)
+
+    # hours worked by each hourly employee over the lookback window (employee id -> hours). Finished weeks are cached
+    #   in timecard_weeks.db, so only the newest week is requested on the next run.
+    hourly = table.filter(~pay_type_mask(table))
+
+    with TimecardWeekCache("timecard_weeks.db") as cache:
+        hours_worked = get_hours_worked(token_dict=token_dict, client_id=client_id, legal_id=legal_id,
+                                        employees=hourly.id.tolist(), lookback_weeks=DEFAULT_LOOKBACK_WEEKS,
+                                        cache=cache)
 
-    for employee in full_employee_list:
-        if 'salary' in employee.employment_category_code.lower():
-            employee_list.append(employee)
-        else:
-            # 30 hrs per week average?
-            pass
+    result = evaluate_eligibility(table, DEFAULT_RULES, hours_worked=hours_worked)
+    eligible = result.eligible()
 
-        # check if averaging 30 hours per week
-        # if employee.average_hours_per_week >= 30:
+    columns = ["first_name", "last_name", "email"]
+    rows = zip(eligible.first_name.tolist(), eligible.last_name.tolist(), eligible.email.tolist())
+    export_records("benefits_eligible.csv", (dict(zip(columns, row)) for row in rows), columns=columns)
 
+    for employee_id, reason in result.ineligible().items():
+        print(f"\t{employee_id}\t{reason}")
 
-    print(f"Found {len(employee_list)} employees eligible for benefits.")
-    print("\nDone!")
\ No newline at end of file
+    print(f"Found {len(eligible)} employees eligible for benefits.")
+    print("\nDone!")
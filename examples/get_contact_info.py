@@ -1,12 +1,16 @@
 """
 Simple example to get a list of emails for employees matching a name.
 
+The employee list is loaded once into an EmployeeDirectory, so each search is done locally (and allows misspellings)
+instead of calling the employees endpoint with searchText.
+
 Len Wanger
 2025
 """
 
 from dotenv import load_dotenv
 
+from insperity_employee_directory import EmployeeDirectory
 from insperity_rest_api import *
 
 
@@ -20,6 +24,9 @@ if __name__ == '__main__':
     # Get access credentials (token_dict, client_id, legal_id) to call the API endpoints
     token_dict, client_id, legal_id = get_credentials(client_code=legal_id_ves, legal_name_substring=None)
 
+    # load the employee list once -- searches are done in memory
+    directory = EmployeeDirectory.from_api(token_dict=token_dict, client_id=client_id, legal_id=legal_id)
+
     # Get search term from user
     while True:
         print("\n\n")
@@ -33,8 +40,8 @@ if __name__ == '__main__':
             else:
                 print("\tSearch term cannot be empty. Please try again.")
 
-        # call the employees API endpoint to get a list of matching employees
-        retrieved_employees = get_employee_list(token_dict=token_dict, client_id=client_id, legal_id=legal_id, search_text=search_text)
+        # search the directory for the best matching employees
+        retrieved_employees = [employee for employee, score in directory.search(search_text)]
 
         # print details of matching employees
         print(f"Number of employees returned: {len(retrieved_employees)}\n")
@@ -0,0 +1,47 @@
+"""
+Example of getting the headcount and benefits eligibility for several entities (clients/legals) at once. The
+credentials and employee lists of all of the entities are fetched in parallel.
+
+Len Wanger
+2025
+"""
+
+from dotenv import load_dotenv
+
+from insperity_benefits_eligibility import SALARIED_PAY_TYPES, AllOf, PayTypeRule, StatusRule, evaluate_eligibility
+from insperity_multi_entity import Entity, get_multi_entity_employees
+from insperity_rest_api import *
+
+
+if __name__ == '__main__':
+    # load environment variables from .env file, such as client_code and api secret
+    load_dotenv()
+
+    #  You will want to use your own values for the LEGAL_ID and legal_name_substring variables
+    entities = [
+        Entity(client_code=os.getenv('LEGAL_ID_VES'), name="VES"),
+        Entity(client_code=os.getenv('LEGAL_ID_LV'), name="LV"),
+        Entity(client_code=os.getenv('LEGAL_ID_NPT'), legal_name_substring="Newport", name="NPT"),
+    ]
+
+    result = get_multi_entity_employees(entities, employee_status_filter="Active")
+
+    for entity_name, error in result.errors.items():
+        print(f"error getting {entity_name}: {error}")
+
+    print("\nheadcount:")
+    for entity_name, count in result.headcount().items():
+        print(f"\t{entity_name}\t{count}")
+
+    # only the salaried employees are checked -- hourly employees also need their timecard hours (see
+    #   benefits_eligible.py), so they are left out rather than all failing the average hours rule
+    salaried_rules = AllOf(StatusRule(("Active",)), PayTypeRule(SALARIED_PAY_TYPES))
+    table = result.to_table()
+    eligibility = evaluate_eligibility(table, salaried_rules)
+    eligible = eligibility.eligible()
+
+    print("\nsalaried employees eligible for benefits:")
+    for entity_name in result.headcount():
+        print(f"\t{entity_name}\t{(eligible.entity == entity_name).sum()}")
+
+    print("\nDone!")
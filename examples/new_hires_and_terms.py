@@ -0,0 +1,46 @@
+"""
+Example of using a local mirror of the employee data to find employees hired in the last 120 days and employees
+terminated since the last time the script was run (e.g. for NEST enrollment).
+
+The first run pulls the full employee list into employees.db. Later runs only write the records that changed, and
+the queries are answered from the local database.
+
+Len Wanger
+2025
+"""
+
+from datetime import date, timedelta
+
+from dotenv import load_dotenv
+
+from insperity_employee_mirror import EmployeeMirror
+from insperity_rest_api import *
+
+
+if __name__ == '__main__':
+    # load environment variables from .env file, such as client_code and api secret
+    load_dotenv()
+
+    #  You will want to use your own values for the LEGAL_ID and legal_name_substring variables
+    legal_id_ves = os.getenv('LEGAL_ID_VES')
+
+    # Get access credentials (token_dict, client_id, legal_id) to call the API endpoints
+    token_dict, client_id, legal_id = get_credentials(client_code=legal_id_ves, legal_name_substring=None)
+
+    with EmployeeMirror("employees.db") as mirror:
+        counts = mirror.sync(token_dict=token_dict, client_id=client_id, legal_id=legal_id)
+        print(f"sync: {counts['seen']} employees, {counts['added']} added, {counts['changed']} changed, "
+              f"{counts['removed']} removed")
+
+        print("\nhired in the last 120 days:")
+        for employee in mirror.hired_since(date.today() - timedelta(days=120), legal_id=legal_id):
+            print(f"\t{employee.first_name} {employee.last_name}\t{employee.hire_date}\t{employee.email}")
+
+        previous_sync = mirror.last_sync(legal_id, previous=True)
+
+        if previous_sync is not None:
+            print(f"\nterminated since {previous_sync}:")
+            for employee in mirror.terminated_since(previous_sync, legal_id=legal_id):
+                print(f"\t{employee.first_name} {employee.last_name}\t{employee.email}")
+
+    print("\nDone!")
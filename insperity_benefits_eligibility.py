@@ -0,0 +1,234 @@
+"""
+Benefits eligibility rules engine
+
+Eligibility rules are declared as data (status, pay type, FTE, tenure and average weekly hours, combined with AllOf and
+AnyOf) and evaluated over an EmployeeTable as array operations -- every employee is checked in one pass, and each
+ineligible employee gets the reason they failed:
+
+    rules = AllOf(StatusRule(("Active",)), AnyOf(PayTypeRule(SALARIED_PAY_TYPES), AverageHoursRule(30.0)))
+    result = evaluate_eligibility(table, rules, hours_worked=hours_by_employee_id)
+    for employee_id, reason in result.ineligible().items():
+        print(employee_id, reason)
+
+AverageHoursRule needs the hours each employee worked over the rule's lookback window, given as a dictionary of
+employee id to hours (employees without hours are treated as averaging 0 hours a week).
+
+evaluate_legals gets the employee list once (the employees endpoint returns every legal of the client), splits it by
+legal code and evaluates the rules for each legal.
+
+Len Wanger
+2025
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import date
+
+import numpy as np
+
+from insperity_employee_table import EmployeeTable
+from insperity_rest_api import get_legals
+
+
+SALARIED_PAY_TYPES = ("Salary", "Auto Salary")
+FULL_TIME_HOURS_PER_WEEK = 30.0  # ACA full-time threshold
+DEFAULT_LOOKBACK_WEEKS = 12
+
+
+@dataclass
+class EligibilityContext:
+    # data the rules are evaluated against
+    table: EmployeeTable
+    hours_worked: np.ndarray  # hours worked in the lookback window, one per row (0.0 if unknown)
+    as_of: date
+
+
+##############################################################################################################
+# Rules -- mask() returns a boolean array, True for the employees that pass the rule
+##############################################################################################################
+@dataclass(frozen=True)
+class StatusRule:
+    statuses: tuple[str, ...] = ("Active",)
+
+    def mask(self, context: EligibilityContext) -> np.ndarray:
+        return np.isin(context.table.employment_status, self.statuses)
+
+    def reason(self) -> str:
+        return f"employment status not in {', '.join(self.statuses)}"
+
+
+def pay_type_mask(table: EmployeeTable, pay_types: Iterable[str]=SALARIED_PAY_TYPES) -> np.ndarray:
+    # return a boolean array, True for the employees with one of the pay types (compared case insensitively)
+    return np.isin(np.char.lower(table.pay_type), [pay_type.lower() for pay_type in pay_types])
+
+
+@dataclass(frozen=True)
+class PayTypeRule:
+    pay_types: tuple[str, ...] = SALARIED_PAY_TYPES  # compared case insensitively
+
+    def mask(self, context: EligibilityContext) -> np.ndarray:
+        return pay_type_mask(context.table, self.pay_types)
+
+    def reason(self) -> str:
+        return f"pay type not in {', '.join(self.pay_types)}"
+
+
+@dataclass(frozen=True)
+class FteRule:
+    min_fte: float = 0.75
+
+    def mask(self, context: EligibilityContext) -> np.ndarray:
+        return context.table.fte >= self.min_fte  # NaN (unknown FTE) fails
+
+    def reason(self) -> str:
+        return f"FTE below {self.min_fte:g}"
+
+
+@dataclass(frozen=True)
+class TenureRule:
+    min_days: int = 90  # waiting period
+
+    def mask(self, context: EligibilityContext) -> np.ndarray:
+        return context.table.tenure(context.as_of) >= self.min_days  # NaN (unknown hire date) fails
+
+    def reason(self) -> str:
+        return f"employed less than {self.min_days} days"
+
+
+@dataclass(frozen=True)
+class AverageHoursRule:
+    min_hours_per_week: float = FULL_TIME_HOURS_PER_WEEK
+    lookback_weeks: int = DEFAULT_LOOKBACK_WEEKS
+
+    def mask(self, context: EligibilityContext) -> np.ndarray:
+        return context.hours_worked / self.lookback_weeks >= self.min_hours_per_week
+
+    def reason(self) -> str:
+        return f"averaging under {self.min_hours_per_week:g} hours/week over {self.lookback_weeks} weeks"
+
+
+@dataclass(frozen=True, init=False)
+class AllOf:
+    rules: tuple = ()
+
+    def __init__(self, *rules):
+        if len(rules) == 0:
+            raise ValueError("AllOf needs at least one rule")
+        object.__setattr__(self, 'rules', rules)
+
+    def mask(self, context: EligibilityContext) -> np.ndarray:
+        return np.logical_and.reduce([rule.mask(context) for rule in self.rules])
+
+
+@dataclass(frozen=True, init=False)
+class AnyOf:
+    rules: tuple = ()
+
+    def __init__(self, *rules):
+        if len(rules) == 0:
+            raise ValueError("AnyOf needs at least one rule")
+        object.__setattr__(self, 'rules', rules)
+
+    def mask(self, context: EligibilityContext) -> np.ndarray:
+        return np.logical_or.reduce([rule.mask(context) for rule in self.rules])
+
+
+# salaried employees, and hourly employees averaging 30+ hours a week, are eligible
+DEFAULT_RULES = AllOf(StatusRule(("Active",)), AnyOf(PayTypeRule(SALARIED_PAY_TYPES), AverageHoursRule()))
+
+
+def _evaluate(rule, context: EligibilityContext) -> tuple[np.ndarray, list[str|None]]:
+    # return the mask for a rule and the reason each row failed it (None for the rows that pass). The reasons are only
+    #   built for the failing rows. AllOf reports each rule that failed, AnyOf reports all of its rules.
+    if not isinstance(rule, (AllOf, AnyOf)):
+        mask = rule.mask(context)
+        reasons = [None] * len(mask)
+        reason = rule.reason()
+
+        for row in np.flatnonzero(~mask):
+            reasons[row] = reason
+
+        return mask, reasons
+
+    child_results = [_evaluate(child, context) for child in rule.rules]
+    masks = [child_mask for child_mask, _ in child_results]
+
+    if isinstance(rule, AllOf):
+        mask, separator = np.logical_and.reduce(masks), "; "
+    else:
+        mask, separator = np.logical_or.reduce(masks), " and "
+
+    reasons = [None] * len(mask)
+    for row in np.flatnonzero(~mask):
+        reasons[row] = separator.join(child_reasons[row] for _, child_reasons in child_results
+                                      if child_reasons[row] is not None)
+
+    return mask, reasons
+
+
+@dataclass
+class EligibilityResult:
+    table: EmployeeTable
+    eligible_mask: np.ndarray
+    reasons: list[str|None] = field(repr=False)  # reason each employee is ineligible (None if eligible)
+
+    def eligible(self) -> EmployeeTable:
+        # return the table of eligible employees
+        return self.table.filter(self.eligible_mask)
+
+    def eligible_ids(self) -> set[str]:
+        return set(self.table.id[self.eligible_mask].tolist())
+
+    def ineligible(self) -> dict[str, str]:
+        # return a dictionary of employee id to the reason the employee isn't eligible
+        employee_ids = self.table.id.tolist()
+        return {employee_ids[row]: self.reasons[row] for row in np.flatnonzero(~self.eligible_mask)}
+
+
+def evaluate_eligibility(table: EmployeeTable, rules=DEFAULT_RULES, hours_worked: dict[str, float]|None=None,
+                         as_of: date|None=None) -> EligibilityResult:
+    """
+    Evaluate the eligibility rules for every employee in a table.
+
+    :param table: EmployeeTable of the employees to check
+    :param rules: rule to evaluate (usually an AllOf/AnyOf of other rules)
+    :param hours_worked: dictionary of employee id to hours worked in the AverageHoursRule lookback window
+    :param as_of: date to evaluate the tenure rules at (defaults to today)
+    :return: EligibilityResult
+    """
+    hours_worked = hours_worked or {}
+    hours_array = np.array([hours_worked.get(employee_id, 0.0) for employee_id in table.id.tolist()], dtype=float)
+    context = EligibilityContext(table, hours_array, as_of if as_of is not None else date.today())
+
+    mask, reasons = _evaluate(rules, context)
+    return EligibilityResult(table, mask, reasons)
+
+
+def evaluate_legals(token_dict: dict, client_id: str, legal_ids: Iterable[str], rules=DEFAULT_RULES,
+                    hours_worked: dict[str, float]|None=None, as_of: date|None=None) -> dict[str, EligibilityResult]:
+    """
+    Get the employees of several legals and evaluate the eligibility rules for each of them. The employee list is
+    read once and split by the legal code of each legal.
+
+    :param token_dict:
+    :param client_id:
+    :param legal_ids: ids of the legals to check
+    :param rules: rule to evaluate
+    :param hours_worked: dictionary of employee id to hours worked in the AverageHoursRule lookback window
+    :param as_of: date to evaluate the tenure rules at (defaults to today)
+    :return: dictionary of legal id to EligibilityResult
+    """
+    legal_ids = [str(legal_id) for legal_id in legal_ids]
+
+    if len(legal_ids) == 0:
+        return {}
+
+    legal_codes = {str(legal['id']): legal.get('legalCode') for legal in get_legals(token_dict)}
+    unknown_ids = [legal_id for legal_id in legal_ids if not legal_codes.get(legal_id)]
+    if unknown_ids:
+        raise ValueError(f"unknown legal ids (or legals without a legal code): {', '.join(unknown_ids)}")
+
+    table = EmployeeTable.from_api(token_dict, client_id, legal_ids[0], all_legals=True)
+    return {legal_id: evaluate_eligibility(table.filter(table.legal_code == legal_codes[legal_id]), rules,
+                                           hours_worked, as_of)
+            for legal_id in legal_ids}
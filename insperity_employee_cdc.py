@@ -0,0 +1,281 @@
+"""
+Change data capture between employee list snapshots
+
+EmployeeChangeTracker keeps a snapshot of the employee list -- a content hash per employee id plus the values of a
+few tracked fields -- and diffs each new pull against it in one pass. Only the records whose hash changed are looked
+at field by field, so a "what changed since yesterday" run costs about the same as streaming the list:
+
+    tracker = EmployeeChangeTracker(EmployeeSnapshotStore("employee_snapshots.db"))
+    change_set = tracker.pull_changes(token_dict, client_id, legal_id)
+
+    for event in change_set.events:
+        print(event.change_type, event.employee_id, event.field_changes)
+    new_hires = change_set.of_type(HIRE)
+
+The change types are:
+
+- HIRE: an employee id that wasn't in the last snapshot
+- TERMINATION: the employment status changed to a terminated status
+- REHIRE: the employment status changed from a terminated status
+- FIELD_CHANGE: a tracked field (email, job title, pay type, manager or employment status) changed
+- REMOVED: an employee id in the last snapshot is no longer in the list (e.g. filtered out by an employee status
+  filter -- to see terminations, pull the list without a status filter)
+
+field_changes has the (old, new) values of the tracked fields that changed. A record whose other fields changed
+(e.g. the address) is saved in the new snapshot, but no event is made for it. The first pull of a scope (e.g. a legal)
+only takes the snapshot.
+
+Len Wanger
+2025
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+import sqlite3
+import threading
+
+from insperity_rest_api import (DEFAULT_PAGE_WORKERS, DEFAULT_PREFETCH_PAGES, filter_legal_employees, get_legal_code,
+                                iter_employees_raw)
+from insperity_rest_types import LazyEmployee
+from insperity_rest_utils import employee_content_hash
+
+
+HIRE = 'hire'
+TERMINATION = 'termination'
+REHIRE = 'rehire'
+FIELD_CHANGE = 'field_change'
+REMOVED = 'removed'
+
+DEFAULT_TRACKED_FIELDS = ('employment_status', 'email', 'job_title', 'pay_type', 'assigned_manager_id')
+_QUERY_CHUNK_SIZE = 500  # ids per SQLite query when reading the tracked values of changed employees
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS employee_snapshots (
+    scope TEXT NOT NULL,
+    id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    tracked_json TEXT NOT NULL,
+    PRIMARY KEY (scope, id)
+);
+CREATE TABLE IF NOT EXISTS snapshot_state (
+    scope TEXT PRIMARY KEY,
+    taken_at TEXT NOT NULL
+);
+"""
+
+
+def _is_terminated(employment_status: str|None) -> bool:
+    return (employment_status is not None) and employment_status.startswith("Term")
+
+
+@dataclass
+class ChangeEvent:
+    change_type: str                    # HIRE, TERMINATION, REHIRE, FIELD_CHANGE or REMOVED
+    employee_id: str
+    record: LazyEmployee|None = None    # the new record (None for REMOVED)
+    field_changes: dict[str, tuple] = field(default_factory=dict)  # tracked field -> (old value, new value)
+
+
+@dataclass
+class ChangeSet:
+    scope: str
+    events: list[ChangeEvent] = field(default_factory=list)
+    seen: int = 0
+    unchanged: int = 0
+    changed: int = 0                    # hash changed (with or without a tracked field change)
+    added: int = 0
+    removed: int = 0
+    first_snapshot: bool = False        # True if there was no snapshot to compare to
+    previous_snapshot: datetime|None = None
+
+    def of_type(self, change_type: str) -> list[ChangeEvent]:
+        return [event for event in self.events if event.change_type == change_type]
+
+
+class EmployeeSnapshotStore:
+    """
+    SQLite store of the employee snapshots (content hash and tracked values per employee), one per scope.
+
+    :param db_path: path of the SQLite database file (":memory:" for an in-memory store)
+    """
+    def __init__(self, db_path: str=":memory:"):
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+        with self.lock, self.connection:
+            self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def taken_at(self, scope: str) -> datetime|None:
+        # return the time the snapshot of the scope was taken (None if there is no snapshot)
+        with self.lock:
+            row = self.connection.execute("SELECT taken_at FROM snapshot_state WHERE scope = ?", (scope,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row is not None else None
+
+    def load_hashes(self, scope: str) -> dict[str, str]:
+        # return a dictionary of employee id -> content hash for the scope
+        with self.lock:
+            return dict(self.connection.execute("SELECT id, content_hash FROM employee_snapshots WHERE scope = ?",
+                                                (scope,)))
+
+    def load_tracked(self, scope: str, employee_ids: list[str]) -> dict[str, dict]:
+        # return a dictionary of employee id -> tracked field values, for only the given employees
+        tracked = {}
+
+        with self.lock:
+            for start in range(0, len(employee_ids), _QUERY_CHUNK_SIZE):
+                chunk = employee_ids[start:start + _QUERY_CHUNK_SIZE]
+                rows = self.connection.execute(
+                    f"SELECT id, tracked_json FROM employee_snapshots WHERE scope = ? AND id IN "
+                    f"({', '.join('?' * len(chunk))})", (scope, *chunk))
+                tracked.update((employee_id, json.loads(tracked_json)) for employee_id, tracked_json in rows)
+
+        return tracked
+
+    def save_changes(self, scope: str, upserts: Iterable[tuple[str, str, dict]], removed_ids: Iterable[str],
+                     taken_at: datetime):
+        # write the (employee id, content hash, tracked values) of the added and changed employees, delete the
+        #   removed employees, and set the time of the snapshot
+        with self.lock, self.connection:
+            self.connection.executemany(
+                """INSERT INTO employee_snapshots (scope, id, content_hash, tracked_json) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (scope, id) DO UPDATE SET content_hash = excluded.content_hash,
+                       tracked_json = excluded.tracked_json""",
+                [(scope, employee_id, content_hash, json.dumps(tracked, default=str))
+                 for employee_id, content_hash, tracked in upserts])
+            self.connection.executemany("DELETE FROM employee_snapshots WHERE scope = ? AND id = ?",
+                                        [(scope, employee_id) for employee_id in removed_ids])
+            self.connection.execute(
+                """INSERT INTO snapshot_state (scope, taken_at) VALUES (?, ?)
+                   ON CONFLICT (scope) DO UPDATE SET taken_at = excluded.taken_at""",
+                (scope, taken_at.isoformat(timespec='seconds')))
+
+
+class EmployeeChangeTracker:
+    """
+    Diff employee list pulls against the last snapshot and emit typed change events.
+
+    :param store: EmployeeSnapshotStore (defaults to an in-memory store)
+    :param tracked_fields: Employee fields compared for FIELD_CHANGE events (and kept in the snapshot)
+    """
+    def __init__(self, store: EmployeeSnapshotStore|None=None, tracked_fields: tuple[str, ...]=DEFAULT_TRACKED_FIELDS):
+        self.store = store if store is not None else EmployeeSnapshotStore()
+        self.tracked_fields = tracked_fields
+
+    def _tracked_values(self, record: LazyEmployee) -> dict:
+        values = {}
+
+        for name in self.tracked_fields:
+            value = getattr(record, name)
+            values[name] = value.isoformat() if hasattr(value, 'isoformat') else value
+
+        return values
+
+    def _make_event(self, employee_id: str, record: LazyEmployee, old: dict, new: dict) -> ChangeEvent|None:
+        # return the event for a changed employee (None if no tracked field changed)
+        field_changes = {name: (old.get(name, None), new[name]) for name in self.tracked_fields
+                         if old.get(name, None) != new[name]}
+
+        if not field_changes:
+            return None
+
+        old_status, new_status = old.get('employment_status', None), new.get('employment_status', None)
+
+        if 'employment_status' in field_changes and _is_terminated(new_status) and not _is_terminated(old_status):
+            change_type = TERMINATION
+        elif 'employment_status' in field_changes and _is_terminated(old_status) and not _is_terminated(new_status):
+            change_type = REHIRE
+        else:
+            change_type = FIELD_CHANGE
+
+        return ChangeEvent(change_type, employee_id, record, field_changes)
+
+    def detect_changes(self, scope: str, raw_employees: Iterable[dict], save: bool=True,
+                       taken_at: datetime|None=None) -> ChangeSet:
+        """
+        Diff raw employee records against the snapshot of the scope in one pass, and (if save is True) make them
+        the new snapshot.
+
+        :param scope: name of the snapshot (e.g. the legal id)
+        :param raw_employees: raw employee records (e.g. from iter_employees_raw)
+        :param save: if True, save the changes to the snapshot
+        :param taken_at: time of the new snapshot (defaults to now)
+        :return: ChangeSet
+        """
+        previous_snapshot = self.store.taken_at(scope)
+        change_set = ChangeSet(scope, first_snapshot=previous_snapshot is None, previous_snapshot=previous_snapshot)
+        remaining_hashes = self.store.load_hashes(scope)  # ids not seen yet in the new pull
+        upserts = []
+        changed = []  # (employee id, record, new tracked values) of the employees whose hash changed
+
+        for raw_employee in raw_employees:
+            change_set.seen += 1
+            employee_id = str(raw_employee['id'])
+            content_hash = employee_content_hash(raw_employee)
+            old_hash = remaining_hashes.pop(employee_id, None)
+
+            if old_hash == content_hash:
+                change_set.unchanged += 1
+                continue
+
+            # only the new and changed records are converted
+            record = LazyEmployee(raw_employee)
+            tracked = self._tracked_values(record)
+            upserts.append((employee_id, content_hash, tracked))
+
+            if old_hash is None:
+                change_set.added += 1
+                if not change_set.first_snapshot:
+                    change_set.events.append(ChangeEvent(HIRE, employee_id, record))
+            else:
+                change_set.changed += 1
+                changed.append((employee_id, record, tracked))
+
+        removed_ids = list(remaining_hashes)
+        change_set.removed = len(removed_ids)
+        old_tracked = self.store.load_tracked(scope, [employee_id for employee_id, _, _ in changed] + removed_ids)
+
+        for employee_id, record, tracked in changed:
+            event = self._make_event(employee_id, record, old_tracked.get(employee_id, {}), tracked)
+            if event is not None:
+                change_set.events.append(event)
+
+        for employee_id in removed_ids:
+            old = old_tracked.get(employee_id, {})
+            change_set.events.append(ChangeEvent(REMOVED, employee_id, None,
+                                                 {name: (value, None) for name, value in old.items()}))
+
+        if save:
+            self.store.save_changes(scope, upserts, removed_ids, taken_at or datetime.now())
+
+        return change_set
+
+    def pull_changes(self, token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None,
+                     save: bool=True) -> ChangeSet:
+        """
+        Stream the employee list of a legal from the REST API and diff it against the legal's last snapshot. The
+        employees endpoint returns the employees of every legal of the client, so only the legal's employees are
+        compared (the others would show up as hires in every legal's snapshot).
+
+        :param token_dict:
+        :param client_id:
+        :param legal_id: legal id (also the name of the snapshot)
+        :param employee_status_filter: employee status filter (None to see terminations)
+        :param save: if True, save the changes to the snapshot
+        :return: ChangeSet
+        """
+        raw_employees = iter_employees_raw(token_dict, client_id, legal_id, employee_status_filter,
+                                           prefetch=DEFAULT_PREFETCH_PAGES, max_workers=DEFAULT_PAGE_WORKERS)
+        raw_employees = filter_legal_employees(raw_employees, get_legal_code(token_dict, legal_id))
+        scope = legal_id if employee_status_filter is None else f"{legal_id}:{employee_status_filter}"
+        return self.detect_changes(scope, raw_employees, save=save)
@@ -0,0 +1,333 @@
+"""
+In-memory employee directory with fuzzy search
+
+EmployeeDirectory is built from get_employee_list and indexes each employee's name, email, employee number and time
+clock id, so looking up an employee doesn't need a searchText call to the REST API:
+
+    directory = EmployeeDirectory.from_api(token_dict, client_id, legal_id, refresh_interval=15*60)
+    for employee, score in directory.search("jon smth"):
+        print(f"{score:.2f} {employee.first_name} {employee.last_name} {employee.email}")
+
+Two indexes over the distinct words are used. A sorted word list finds words starting with the query (bisect), and a
+trigram index finds words that share three letter sequences with the query, so misspelled names still match. Matching
+employees are ranked by trigram similarity, with a bonus for prefix and exact matches and a small edit distance bonus
+to break ties (so "jon" ranks John ahead of Jose).
+
+Only the employees that can still make the top results are scored: the matching words of each query word are
+visited from best to worst, and the search stops once no employee that hasn't been scored can beat the results so
+far. The cost depends on how many employees share the best matching names, not on the size of the directory. On a
+20,000 employee synthetic directory (40 first and 40 last names, so about 500 employees share each name) single word
+and identifier searches take 0.1-0.3 ms, and multi-word fuzzy searches 0.5-3 ms. Directories with more varied names
+are faster.
+
+If a refresh_interval is given the directory reloads the employee list in a background thread. Searches keep using the
+old index until the new one is built, then switch to it.
+
+Len Wanger
+2025
+"""
+
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from collections.abc import Callable
+import heapq
+import re
+import threading
+
+from insperity_rest_api import get_employee_list, get_legal_code
+from insperity_rest_types import Employee
+
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_TRIGRAM_CANDIDATES = 50  # only score the words that share the most trigrams with each query word
+MIN_WORD_SCORE = 0.3  # ignore words less similar than this to a query word
+PREFIX_BONUS = 0.25
+EXACT_BONUS = 0.5
+EDIT_DISTANCE_BONUS = 0.05  # bonus for a word the same as the query word, less per edit (breaks trigram ties)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _words(text: str|None) -> list[str]:
+    # split text into lower case words (letters and digits)
+    return _WORD_RE.findall(text.lower()) if text else []
+
+
+def _trigrams(word: str) -> set[str]:
+    # return the trigrams of a word, padded so short words and word starts have trigrams too
+    padded = f"  {word} "
+    return {padded[i:i+3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(word1: str, word2: str) -> int:
+    # return the Levenshtein distance between two words
+    previous = list(range(len(word2) + 1))
+
+    for i, char1 in enumerate(word1, 1):
+        current = [i]
+        for j, char2 in enumerate(word2, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char1 != char2)))
+        previous = current
+
+    return previous[-1]
+
+
+def _name_keys(employee: Employee) -> list[str]:
+    # return the names of an employee -- fuzzy matched by word
+    return [employee.first_name, employee.middle_name, employee.last_name]
+
+
+def _identifier_keys(employee: Employee) -> list[str]:
+    # return the identifiers of an employee -- matched exactly or by prefix
+    return [employee.email, employee.employee_number, employee.time_clock_id]
+
+
+class _DirectoryIndex:
+    # immutable index over a list of employees -- replaced as a whole when the directory is refreshed. The prefix and
+    #   trigram indexes for names are over the vocabulary (the distinct name words), which is much smaller than the
+    #   list of employees, and word_employees maps each word back to the employees that have it. Identifiers (email,
+    #   employee number, time clock id) are unique per employee, so they are only matched exactly or by prefix.
+    def __init__(self, employees: list[Employee]):
+        self.employees = employees
+        self.word_employees = defaultdict(set)  # name word -> employee indexes (sorted lists once built)
+        self.employee_words = []  # employee index -> name words of the employee
+        self.word_trigrams = {}  # name word -> trigrams of the word
+        self.trigram_words = defaultdict(list)  # trigram -> name words
+        identifiers = []
+
+        for index, employee in enumerate(employees):
+            employee_words = {word for key in _name_keys(employee) for word in _words(key)}
+            self.employee_words.append(tuple(employee_words))
+
+            for word in employee_words:
+                self.word_employees[word].add(index)
+
+            for key in _identifier_keys(employee):
+                if key:
+                    identifiers.append((str(key).lower(), index))
+
+        for word in self.word_employees:
+            self.word_trigrams[word] = frozenset(_trigrams(word))
+
+            for trigram in self.word_trigrams[word]:
+                self.trigram_words[trigram].append(word)
+
+        self.vocabulary = sorted(self.word_employees)
+        self.word_employees = {word: sorted(indexes) for word, indexes in self.word_employees.items()}
+        identifiers.sort()
+        self.identifiers = [identifier for identifier, _ in identifiers]
+        self.identifier_indexes = [index for _, index in identifiers]
+
+    @staticmethod
+    def _prefix_positions(sorted_list: list[str], prefix: str) -> range:
+        # return the positions of the items starting with prefix (at most MAX_TRIGRAM_CANDIDATES)
+        start = position = bisect_left(sorted_list, prefix)
+
+        while ((position < len(sorted_list)) and sorted_list[position].startswith(prefix) and
+               (position - start < MAX_TRIGRAM_CANDIDATES)):
+            position += 1
+
+        return range(start, position)
+
+    def prefix_words(self, prefix: str) -> list[str]:
+        # return the name words starting with prefix
+        return [self.vocabulary[position] for position in self._prefix_positions(self.vocabulary, prefix)]
+
+    def identifier_matches(self, query: str) -> dict[int, float]:
+        # return the employees with an identifier starting with query, scored by how much of the identifier matched
+        #   (plus a bonus for an exact match)
+        matches = {}
+
+        for position in self._prefix_positions(self.identifiers, query):
+            identifier = self.identifiers[position]
+            score = 0.5 + 0.5 * len(query) / len(identifier) + (EXACT_BONUS if identifier == query else 0.0)
+            index = self.identifier_indexes[position]
+            matches[index] = max(score, matches.get(index, 0.0))
+
+        return matches
+
+    def similar_words(self, query_word: str) -> dict[str, float]:
+        # return the words similar to query_word with their scores: trigram similarity (Dice coefficient), plus a
+        #   bonus if the word starts with query_word and a small bonus for a small edit distance
+        query_trigrams = _trigrams(query_word)
+        trigram_counts = Counter()
+
+        for trigram in query_trigrams:
+            trigram_counts.update(self.trigram_words.get(trigram, ()))
+
+        candidates = {word for word, _ in trigram_counts.most_common(MAX_TRIGRAM_CANDIDATES)}
+        candidates.update(self.prefix_words(query_word))
+
+        word_scores = {}
+        for word in candidates:
+            word_trigrams = self.word_trigrams[word]
+            score = 2 * len(query_trigrams & word_trigrams) / (len(query_trigrams) + len(word_trigrams))
+
+            if word.startswith(query_word):
+                score += PREFIX_BONUS
+
+            if score >= MIN_WORD_SCORE:
+                distance = _edit_distance(query_word, word)
+                word_scores[word] = score + EDIT_DISTANCE_BONUS * max(0.0, 1.0 - distance / len(query_word))
+
+        return word_scores
+
+    def _name_score(self, index: int, query_word_scores: list[dict[str, float]]) -> float:
+        # return the score of an employee: the average over the query words of the best score of any of its words
+        employee_words = self.employee_words[index]
+        total = 0.0
+
+        for word_scores in query_word_scores:
+            best = 0.0
+            for word in employee_words:
+                score = word_scores.get(word, 0.0)
+                if score > best:
+                    best = score
+            total += best
+
+        return total / len(query_word_scores)
+
+    def search(self, query: str, limit: int) -> list[tuple[Employee, float]]:
+        # The matching words of each query word are visited from best to worst score, and the employees with the
+        #   word are scored. An employee that hasn't been scored yet can score at most the average of the scores of
+        #   the next words to visit, so the search stops when that is no better than the limit'th best score. This
+        #   only scores the employees with the best matching words, instead of every employee with a matching word.
+        query_words = _words(query)
+
+        if (len(query_words) == 0) or (limit <= 0):
+            return []
+
+        query_word_scores = [self.similar_words(query_word) for query_word in query_words]
+        ranked_words = [sorted(word_scores.items(), key=lambda item: -item[1]) for word_scores in query_word_scores]
+        positions = [0] * len(ranked_words)
+        employee_scores = {}
+        top_scores = []  # min heap of the limit best scores
+
+        def add_score(index: int, score: float):
+            employee_scores[index] = score
+            if len(top_scores) < limit:
+                heapq.heappush(top_scores, score)
+            elif score > top_scores[0]:
+                heapq.heapreplace(top_scores, score)
+
+        for index, score in self.identifier_matches(query.strip().lower()).items():
+            add_score(index, max(score, self._name_score(index, query_word_scores)))
+
+        while True:
+            next_scores = [ranked[position][1] if position < len(ranked) else 0.0
+                           for ranked, position in zip(ranked_words, positions)]
+            best_unscored = sum(next_scores) / len(next_scores)
+
+            if (best_unscored == 0.0) or ((len(top_scores) == limit) and (best_unscored <= top_scores[0])):
+                break
+
+            # visit the next word of the query word with the best next word
+            word_list = max(range(len(next_scores)), key=next_scores.__getitem__)
+            word = ranked_words[word_list][positions[word_list]][0]
+            positions[word_list] += 1
+
+            for index in self.word_employees[word]:
+                if (len(top_scores) == limit) and (best_unscored <= top_scores[0]):
+                    break  # the rest of the employees with the word can't beat the results so far
+
+                if index not in employee_scores:
+                    add_score(index, self._name_score(index, query_word_scores))
+
+        best = heapq.nlargest(limit, employee_scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.employees[index], score) for index, score in best]
+
+
+class EmployeeDirectory:
+    """
+    In-memory fuzzy search over a list of employees.
+
+    :param employees: list of Employee objects to search
+    :param loader: function called with no arguments that returns a new list of Employee objects (used to refresh)
+    :param refresh_interval: if not None, reload the employees with loader every refresh_interval seconds in a
+        background thread
+    """
+    def __init__(self, employees: list[Employee]|None=None, loader: Callable[[], list[Employee]]|None=None,
+                 refresh_interval: float|None=None):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self._index = _DirectoryIndex(employees if employees is not None else (loader() if loader else []))
+        self._stop_event = threading.Event()
+        self._refresh_thread = None
+
+        if (refresh_interval is not None) and (loader is not None):
+            self.start_background_refresh()
+
+    @classmethod
+    def from_api(cls, token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None,
+                 refresh_interval: float|None=None) -> "EmployeeDirectory":
+        """
+        Build a directory of the employees of a legal from get_employee_list.
+
+        :param token_dict:
+        :param client_id:
+        :param legal_id:
+        :param employee_status_filter:
+        :param refresh_interval: if not None, reload the employee list every refresh_interval seconds
+        :return: EmployeeDirectory
+        """
+        legal_code = get_legal_code(token_dict, legal_id)
+
+        def loader() -> list[Employee]:
+            # the employee list has the employees of every legal of the client
+            employees = get_employee_list(token_dict=token_dict, client_id=client_id, legal_id=legal_id,
+                                          employee_status_filter=employee_status_filter)
+            return [employee for employee in employees if employee.legal_code == legal_code]
+
+        return cls(loader=loader, refresh_interval=refresh_interval)
+
+    def __len__(self) -> int:
+        return len(self._index.employees)
+
+    @property
+    def employees(self) -> list[Employee]:
+        return self._index.employees
+
+    def search(self, query: str, limit: int=DEFAULT_SEARCH_LIMIT) -> list[tuple[Employee, float]]:
+        """
+        Find the employees that best match the query (name, email, employee number or time clock id). Misspellings
+        and partial words are allowed.
+
+        :param query: text to search for (e.g. "smith", "jon smth", "jsmith@example.com")
+        :param limit: maximum number of matches to return
+        :return: list of (Employee, score) tuples, best match first
+        """
+        return self._index.search(query, limit)
+
+    def refresh(self):
+        # reload the employees and swap in the new index (searches use the old index until it is built)
+        if self.loader is None:
+            raise ValueError("EmployeeDirectory has no loader to refresh from")
+
+        self._index = _DirectoryIndex(self.loader())
+
+    def set_employees(self, employees: list[Employee]):
+        # replace the employees with a new list (e.g. loaded by an async client) and swap in the new index
+        self._index = _DirectoryIndex(employees)
+
+    def _refresh_loop(self):
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:  # keep the old index and try again at the next interval
+                pass
+
+    def start_background_refresh(self):
+        # start reloading the employees every refresh_interval seconds in a background thread
+        if self._refresh_thread is None:
+            self._stop_event.clear()
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, name="EmployeeDirectory refresh",
+                                                    daemon=True)
+            self._refresh_thread.start()
+
+    def stop(self):
+        # stop the background refresh thread
+        self._stop_event.set()
+
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+            self._refresh_thread = None
@@ -0,0 +1,311 @@
+"""
+Local SQLite mirror of Insperity employee data
+
+EmployeeMirror keeps a copy of the employee records for one or more legals in an indexed SQLite database, so
+questions like "who was hired since the last 120 day check" or "who was terminated since the last run" can be
+answered locally in milliseconds instead of pulling the full employee list from the REST API each time.
+
+    mirror = EmployeeMirror("employees.db")
+    mirror.sync(token_dict, client_id, legal_id)   # stream the employee list, write only the changed records
+    new_hires = mirror.hired_since(date.today() - timedelta(days=120), legal_id=legal_id)
+    terminated = mirror.terminated_since(mirror.last_sync(legal_id, previous=True), legal_id=legal_id)
+
+The REST API has no "changed since" filter, so a sync still reads the employee list, but it is streamed one page at a
+time, each record is compared with the stored content hash, and only new or changed records are written. The time of
+each sync is kept as a watermark per legal, and the time a record's employment status changed is saved with it.
+
+The full employee list endpoint returns the employees of every legal of the client, so sync keeps only the records
+with the legal's legal code. Employees that are no longer in the list of a sync (deleted, moved to another legal, or
+left out by the employee status filter) are flagged as removed: they are left out of the queries, and removed_since
+returns them.
+
+Len Wanger
+2025
+"""
+
+from collections.abc import Iterator
+from datetime import date, datetime
+import json
+import sqlite3
+import threading
+
+from insperity_rest_api import (DEFAULT_PAGE_WORKERS, DEFAULT_PREFETCH_PAGES, filter_legal_employees, get_legal_code,
+                                iter_employees_raw, iter_minimal_employees_raw)
+from insperity_rest_types import Employee, MinimalEmployee
+from insperity_rest_utils import (employee_content_hash, fill_employee_record, fill_minimal_employee_record,
+                                  string_to_date)
+
+
+EMPLOYEE_KIND = 'employee'
+MINIMAL_EMPLOYEE_KIND = 'minimal'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS employees (
+    legal_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    employee_number TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    email TEXT,
+    employment_status TEXT,
+    hire_date TEXT,
+    termination_date TEXT,
+    status_changed_at TEXT,
+    removed_at TEXT,
+    content_hash TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_changed TEXT NOT NULL,
+    raw_json TEXT NOT NULL,
+    PRIMARY KEY (legal_id, id)
+);
+CREATE INDEX IF NOT EXISTS employees_hire_date ON employees (hire_date);
+CREATE INDEX IF NOT EXISTS employees_termination_date ON employees (termination_date);
+CREATE INDEX IF NOT EXISTS employees_status ON employees (employment_status, status_changed_at);
+CREATE INDEX IF NOT EXISTS employees_last_changed ON employees (last_changed);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    legal_id TEXT PRIMARY KEY,
+    last_sync TEXT NOT NULL,
+    previous_sync TEXT
+);
+"""
+
+
+def _date_str(date_value: str|None) -> str|None:
+    # convert a REST API date string (e.g. "2019-01-01T00:00:00") to an ISO date string (e.g. "2019-01-01")
+    if not date_value:
+        return None
+
+    parsed_date = string_to_date(date_value)
+    return None if parsed_date is None else parsed_date.isoformat()
+
+
+def _employee_columns(employee_dict: dict, kind: str) -> dict:
+    # pull the indexed columns out of a raw employee (or minimal employee) record
+    if kind == EMPLOYEE_KIND:
+        name_address = employee_dict.get('nameAddress') or {}
+        first_name, last_name = name_address.get('firstName'), name_address.get('lastName')
+        email = employee_dict.get('emailAddress')
+    else:
+        first_name, last_name = employee_dict.get('firstName'), employee_dict.get('lastName')
+        email = employee_dict.get('selfServiceEmail')
+
+    return {
+        'id': str(employee_dict['id']),
+        'employee_number': employee_dict.get('employeeNumber'),
+        'first_name': first_name,
+        'last_name': last_name,
+        'email': email,
+        'employment_status': employee_dict.get('employmentStatus'),
+        'hire_date': _date_str(employee_dict.get('hireDate')),
+        'termination_date': _date_str(employee_dict.get('terminationDate')),
+    }
+
+
+class EmployeeMirror:
+    """
+    Indexed SQLite mirror of employee records, kept up to date with incremental syncs.
+
+    :param db_path: path of the SQLite database file (":memory:" for an in-memory mirror)
+    """
+    def __init__(self, db_path: str=":memory:"):
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+
+        with self.lock, self.connection:
+            if db_path != ":memory:":
+                self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(_SCHEMA)
+
+            # add the removed_at column to mirrors made before employees were flagged as removed
+            columns = {row['name'] for row in self.connection.execute("PRAGMA table_info(employees)")}
+            if 'removed_at' not in columns:
+                self.connection.execute("ALTER TABLE employees ADD COLUMN removed_at TEXT")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    ##########################################################################################################
+    # Sync
+    ##########################################################################################################
+    def apply_records(self, legal_id: str, employee_dicts: Iterator[dict], kind: str=EMPLOYEE_KIND,
+                      sync_time: datetime|None=None) -> dict:
+        """
+        Write new and changed raw employee records to the mirror, flag the employees of the legal that aren't in
+        employee_dicts as removed, and move the sync watermark for the legal.
+
+        :param legal_id: legal id the records belong to
+        :param employee_dicts: iterable of raw employee records of the legal (e.g. from iter_employees_raw filtered
+            with filter_legal_employees)
+        :param kind: EMPLOYEE_KIND for full employee records, MINIMAL_EMPLOYEE_KIND for minimal employee records
+        :param sync_time: time of the sync (defaults to now)
+        :return: dictionary with the number of records seen, added, changed, unchanged and removed
+        """
+        sync_time_str = (sync_time or datetime.now()).isoformat(timespec='seconds')
+        counts = {'seen': 0, 'added': 0, 'changed': 0, 'unchanged': 0, 'removed': 0}
+
+        with self.lock, self.connection:
+            # on the first sync of a legal, the status of the records wasn't seen to change
+            first_sync = self.connection.execute("SELECT 1 FROM sync_state WHERE legal_id = ?",
+                                                 (legal_id,)).fetchone() is None
+            stored = {row['id']: (row['content_hash'], row['employment_status'], row['removed_at'])
+                      for row in self.connection.execute(
+                          "SELECT id, content_hash, employment_status, removed_at FROM employees WHERE legal_id = ?",
+                          (legal_id,))}
+            unseen_ids = set(stored)
+
+            for employee_dict in employee_dicts:
+                counts['seen'] += 1
+                content_hash = employee_content_hash(employee_dict)
+                columns = _employee_columns(employee_dict, kind)
+                old = stored.get(columns['id'], None)
+                unseen_ids.discard(columns['id'])
+
+                if old is None:
+                    counts['added'] += 1
+                    status_changed_at = None if first_sync else sync_time_str
+                    first_seen = sync_time_str
+                elif old[0] == content_hash:
+                    counts['unchanged'] += 1
+                    if old[2] is not None:  # back in the list after being removed
+                        self.connection.execute("UPDATE employees SET removed_at = NULL WHERE legal_id = ? AND id = ?",
+                                                (legal_id, columns['id']))
+                    continue
+                else:
+                    counts['changed'] += 1
+                    status_changed_at = sync_time_str if old[1] != columns['employment_status'] else None
+                    first_seen = None
+
+                self.connection.execute(
+                    """INSERT INTO employees (legal_id, id, kind, employee_number, first_name, last_name, email,
+                           employment_status, hire_date, termination_date, status_changed_at, content_hash,
+                           first_seen, last_changed, raw_json)
+                       VALUES (:legal_id, :id, :kind, :employee_number, :first_name, :last_name, :email,
+                           :employment_status, :hire_date, :termination_date, :status_changed_at, :content_hash,
+                           :first_seen, :last_changed, :raw_json)
+                       ON CONFLICT (legal_id, id) DO UPDATE SET
+                           kind = excluded.kind, employee_number = excluded.employee_number,
+                           first_name = excluded.first_name, last_name = excluded.last_name, email = excluded.email,
+                           employment_status = excluded.employment_status, hire_date = excluded.hire_date,
+                           termination_date = excluded.termination_date,
+                           status_changed_at = COALESCE(excluded.status_changed_at, employees.status_changed_at),
+                           removed_at = NULL, content_hash = excluded.content_hash, last_changed = excluded.last_changed,
+                           raw_json = excluded.raw_json""",
+                    {**columns, 'legal_id': legal_id, 'kind': kind, 'status_changed_at': status_changed_at,
+                     'content_hash': content_hash, 'first_seen': first_seen or sync_time_str,
+                     'last_changed': sync_time_str, 'raw_json': json.dumps(employee_dict)})
+
+            removed_ids = [(sync_time_str, legal_id, employee_id) for employee_id in unseen_ids
+                           if stored[employee_id][2] is None]
+            self.connection.executemany("UPDATE employees SET removed_at = ? WHERE legal_id = ? AND id = ?",
+                                        removed_ids)
+            counts['removed'] = len(removed_ids)
+
+            self.connection.execute(
+                """INSERT INTO sync_state (legal_id, last_sync, previous_sync) VALUES (?, ?, NULL)
+                   ON CONFLICT (legal_id) DO UPDATE SET previous_sync = sync_state.last_sync,
+                       last_sync = excluded.last_sync""", (legal_id, sync_time_str))
+
+        return counts
+
+    def sync(self, token_dict: dict, client_id: str, legal_id: str, minimal: bool=False,
+             employee_status_filter: str|None=None) -> dict:
+        """
+        Sync the mirror with the REST API for one legal. The employee list is streamed one page at a time and only
+        new or changed records are written. Employees of the legal that aren't in the list are flagged as removed
+        (so with an employee status filter, employees whose status no longer matches are flagged as removed).
+
+        :param token_dict:
+        :param client_id:
+        :param legal_id:
+        :param minimal: if True, mirror the minimal employee records instead of the full employee records
+        :param employee_status_filter:
+        :return: dictionary with the number of records seen, added, changed, unchanged and removed
+        """
+        if minimal is True:
+            employee_dicts = iter_minimal_employees_raw(token_dict, client_id, legal_id, employee_status_filter,
+                                                        prefetch=DEFAULT_PREFETCH_PAGES, max_workers=DEFAULT_PAGE_WORKERS)
+            return self.apply_records(legal_id, employee_dicts, kind=MINIMAL_EMPLOYEE_KIND)
+
+        # the full employee list has the employees of every legal of the client
+        employee_dicts = filter_legal_employees(
+            iter_employees_raw(token_dict, client_id, legal_id, employee_status_filter,
+                               prefetch=DEFAULT_PREFETCH_PAGES, max_workers=DEFAULT_PAGE_WORKERS),
+            get_legal_code(token_dict, legal_id))
+        return self.apply_records(legal_id, employee_dicts, kind=EMPLOYEE_KIND)
+
+    def last_sync(self, legal_id: str, previous: bool=False) -> datetime|None:
+        # return the time of the last sync for the legal (or the sync before it if previous is True)
+        row = self.connection.execute("SELECT last_sync, previous_sync FROM sync_state WHERE legal_id = ?",
+                                      (legal_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        sync_time_str = row['previous_sync'] if previous else row['last_sync']
+        return None if sync_time_str is None else datetime.fromisoformat(sync_time_str)
+
+    ##########################################################################################################
+    # Queries
+    ##########################################################################################################
+    def _query(self, where: str, params: tuple, legal_id: str|None,
+               include_removed: bool=False) -> list[Employee|MinimalEmployee]:
+        # run a query on the employees table and return the matching records as Employee/MinimalEmployee objects.
+        #   Employees flagged as removed are left out unless include_removed is True.
+        if include_removed is False:
+            where = f"({where}) AND removed_at IS NULL"
+
+        if legal_id is not None:
+            where = f"({where}) AND legal_id = ?"
+            params = params + (legal_id,)
+
+        rows = self.connection.execute(f"SELECT kind, raw_json FROM employees WHERE {where} ORDER BY last_name, "
+                                       f"first_name", params).fetchall()
+        return [fill_employee_record(json.loads(row['raw_json'])) if row['kind'] == EMPLOYEE_KIND else
+                fill_minimal_employee_record(json.loads(row['raw_json'])) for row in rows]
+
+    def get(self, employee_id: str, legal_id: str|None=None) -> Employee|MinimalEmployee|None:
+        # return the employee with the given id, or None if it isn't in the mirror
+        employees = self._query("id = ?", (str(employee_id),), legal_id)
+        return employees[0] if len(employees) > 0 else None
+
+    def hired_since(self, since: date, legal_id: str|None=None) -> list[Employee|MinimalEmployee]:
+        # return the employees with a hire date on or after since
+        return self._query("hire_date >= ?", (since.isoformat(),), legal_id)
+
+    def terminated_since(self, since: date|datetime, legal_id: str|None=None) -> list[Employee|MinimalEmployee]:
+        # return the terminated employees with a termination date (or, if the record has no termination date, a
+        #   change to a terminated status seen by a sync) on or after since
+        since_date = since.date() if isinstance(since, datetime) else since
+        since_time = since if isinstance(since, datetime) else datetime.combine(since, datetime.min.time())
+        return self._query("employment_status LIKE 'Term%' AND (termination_date >= ? OR "
+                           "(termination_date IS NULL AND status_changed_at >= ?))",
+                           (since_date.isoformat(), since_time.isoformat(timespec='seconds')), legal_id)
+
+    def with_status(self, employment_status: str, legal_id: str|None=None) -> list[Employee|MinimalEmployee]:
+        # return the employees with the given employment status (e.g. "Active")
+        return self._query("employment_status = ?", (employment_status,), legal_id)
+
+    def removed_since(self, since: datetime, legal_id: str|None=None) -> list[Employee|MinimalEmployee]:
+        # return the employees flagged as removed by a sync on or after since
+        return self._query("removed_at >= ?", (since.isoformat(timespec='seconds'),), legal_id, include_removed=True)
+
+    def changed_since(self, since: datetime, legal_id: str|None=None) -> list[Employee|MinimalEmployee]:
+        # return the employees added or changed by a sync on or after since
+        return self._query("last_changed >= ?", (since.isoformat(timespec='seconds'),), legal_id)
+
+    def count(self, legal_id: str|None=None) -> int:
+        # return the number of employees in the mirror (not counting the employees flagged as removed)
+        if legal_id is None:
+            return self.connection.execute("SELECT COUNT(*) FROM employees WHERE removed_at IS NULL").fetchone()[0]
+
+        return self.connection.execute("SELECT COUNT(*) FROM employees WHERE legal_id = ? AND removed_at IS NULL",
+                                       (legal_id,)).fetchone()[0]
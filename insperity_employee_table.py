@@ -0,0 +1,204 @@
+"""
+Columnar employee table for workforce-wide analytics
+
+EmployeeTable stores each employee field as a NumPy array (one row per employee), so questions about the whole
+workforce are answered with array operations instead of a Python loop over Employee objects:
+
+    table = EmployeeTable.from_api(token_dict, client_id, legal_id)
+    mask = (table.age() > 40) & (table.tenure_years() > 5) & (table.employment_status == "Active")
+    for employee in table.filter(mask).employees():
+        print(employee.first_name, employee.last_name)
+
+Dates are datetime64[D] arrays (NaT if missing), numbers are float arrays (NaN if missing) and text fields are string
+arrays ("" if missing). The table is built straight from the raw employee dicts, one page at a time, so no Employee
+objects are created.
+
+NumPy is an optional dependency -- install it with: pip install insperity-mcp[analytics]
+
+Len Wanger
+2025
+"""
+
+from collections.abc import Iterable
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("EmployeeTable requires numpy -- install it with: pip install insperity-mcp[analytics]") from e
+
+from insperity_rest_api import (DEFAULT_PAGE_WORKERS, DEFAULT_PREFETCH_PAGES, filter_legal_employees, get_legal_code,
+                                iter_employees_raw)
+from insperity_rest_types import LazyEmployee
+
+
+DAYS_PER_YEAR = 365.25
+
+# column name -> path of keys in the raw employee dict
+TEXT_COLUMNS = {
+    'id': ('id',),
+    'employee_number': ('employeeNumber',),
+    'first_name': ('nameAddress', 'firstName'),
+    'last_name': ('nameAddress', 'lastName'),
+    'email': ('emailAddress',),
+    'state': ('nameAddress', 'state'),
+    'gender': ('gender',),
+    'employment_status': ('employmentStatus',),
+    'employment_category_code': ('employmentCategoryCode',),
+    'pay_type': ('payType',),
+    'job_title': ('jobTitle',),
+    'work_location': ('workLocation',),
+    'legal_code': ('legalCode',),
+}
+DATE_COLUMNS = {
+    'birth_date': ('birthDate',),
+    'hire_date': ('hireDate',),
+}
+NUMBER_COLUMNS = {
+    'fte': ('employmentCategoryFullTimeEquivalent',),
+    'hourly_rate': ('hourlyRate',),
+    'annual_salary': ('annualSalary',),
+}
+
+
+def _get_value(raw_employee: dict, path: tuple[str, ...]):
+    # return the value at a path of keys in a raw employee dict (None if a key is missing)
+    value = raw_employee
+    for key in path:
+        value = value.get(key, None)
+        if value is None:
+            return None
+    return value
+
+
+def _to_number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _days_since(dates: np.ndarray, as_of: date|None) -> np.ndarray:
+    # return the number of days from each date to as_of (today if None) as floats, NaN where the date is NaT
+    days = (np.datetime64(date.today() if as_of is None else as_of, 'D') - dates).astype(float)
+    days[np.isnat(dates)] = np.nan
+    return days
+
+
+class EmployeeTable:
+    """
+    Columnar (NumPy array) table of employees. Each column is an attribute with the same name as the Employee field
+    (e.g. table.hire_date, table.pay_type), plus fte (employmentCategoryFullTimeEquivalent as a number).
+
+    :param columns: dictionary of column name to array (all the same length)
+    :param raw_employees: array of the raw employee dicts, one per row (used by employees())
+    """
+    def __init__(self, columns: dict[str, np.ndarray], raw_employees: np.ndarray):
+        self.columns = columns
+        self.raw_employees = raw_employees
+
+    @classmethod
+    def from_raw(cls, raw_employees: Iterable[dict]) -> "EmployeeTable":
+        """
+        Build a table from raw employee dicts (e.g. from get_employee_list_raw or iter_employees_raw).
+
+        :param raw_employees: iterable of raw employee dicts
+        :return: EmployeeTable
+        """
+        values = {name: [] for name in (*TEXT_COLUMNS, *DATE_COLUMNS, *NUMBER_COLUMNS)}
+        raw_list = []
+
+        for raw_employee in raw_employees:
+            raw_list.append(raw_employee)
+
+            for name, path in TEXT_COLUMNS.items():
+                values[name].append(_get_value(raw_employee, path) or "")
+
+            for name, path in DATE_COLUMNS.items():
+                date_str = _get_value(raw_employee, path)
+                values[name].append(date_str[:10] if date_str else "NaT")  # date part of "2019-01-01T00:00:00"
+
+            for name, path in NUMBER_COLUMNS.items():
+                values[name].append(_to_number(_get_value(raw_employee, path)))
+
+        columns = {}
+        for name in TEXT_COLUMNS:
+            columns[name] = np.array(values[name], dtype=str)
+        for name in DATE_COLUMNS:
+            columns[name] = np.array(values[name], dtype='datetime64[D]')
+        for name in NUMBER_COLUMNS:
+            columns[name] = np.array(values[name], dtype=float)
+
+        raw_array = np.empty(len(raw_list), dtype=object)
+        raw_array[:] = raw_list
+        return cls(columns, raw_array)
+
+    @classmethod
+    def from_api(cls, token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None,
+                 all_legals: bool=False) -> "EmployeeTable":
+        """
+        Build a table of the employees of a legal from the employees endpoint. The pages are read with
+        iter_employees_raw, so the next pages are fetched while the rows for the current page are added.
+
+        The endpoint returns the employees of every legal of the client, so only the rows with the legal's legal code
+        are kept. To get every legal in one table (e.g. to split it by the legal_code column), set all_legals to True.
+
+        :param token_dict:
+        :param client_id:
+        :param legal_id:
+        :param employee_status_filter:
+        :param all_legals: if True, keep the employees of all of the legals of the client
+        :return: EmployeeTable
+        """
+        raw_employees = iter_employees_raw(token_dict, client_id, legal_id, employee_status_filter,
+                                           prefetch=DEFAULT_PREFETCH_PAGES, max_workers=DEFAULT_PAGE_WORKERS)
+
+        if all_legals is False:
+            raw_employees = filter_legal_employees(raw_employees, get_legal_code(token_dict, legal_id))
+
+        return cls.from_raw(raw_employees)
+
+    def __len__(self) -> int:
+        return len(self.raw_employees)
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        columns = self.__dict__.get('columns', {})
+
+        if name in columns:
+            return columns[name]
+
+        raise AttributeError(f"'EmployeeTable' object has no attribute '{name}'")
+
+    def __getitem__(self, key):
+        # table["column name"] returns a column, table[mask or indexes] returns a new table with those rows
+        if isinstance(key, str):
+            return self.columns[key]
+
+        return self.filter(key)
+
+    def filter(self, mask: np.ndarray) -> "EmployeeTable":
+        # return a new table with the rows selected by a boolean mask (or an array of row indexes)
+        return EmployeeTable({name: column[mask] for name, column in self.columns.items()}, self.raw_employees[mask])
+
+    def employees(self) -> list[LazyEmployee]:
+        # return the rows as LazyEmployee objects
+        return [LazyEmployee(raw_employee) for raw_employee in self.raw_employees]
+
+    ##########################################################################################################
+    # Vectorized versions of the Employee methods -- as_of defaults to today
+    ##########################################################################################################
+    def age(self, as_of: date|None=None) -> np.ndarray:
+        # return the age of each employee in years (NaN if the birth date is missing)
+        return _days_since(self.birth_date, as_of) / DAYS_PER_YEAR
+
+    def older_than(self, years_old: float, as_of: date|None=None) -> np.ndarray:
+        # return a mask of the employees at least years_old years old (same test as Employee.older_than)
+        return self.age(as_of) >= years_old
+
+    def tenure(self, as_of: date|None=None) -> np.ndarray:
+        # return the days since hire of each employee (NaN if the hire date is missing)
+        return _days_since(self.hire_date, as_of)
+
+    def tenure_years(self, as_of: date|None=None) -> np.ndarray:
+        # return the years since hire of each employee (NaN if the hire date is missing)
+        return self.tenure(as_of) / DAYS_PER_YEAR
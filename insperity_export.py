@@ -0,0 +1,467 @@
+"""
+Export employee and check data to CSV, JSONL or Parquet files
+
+The export functions stream the pages of the REST API straight into the file writer, one record at a time, so the
+whole list is never held in memory -- a 100k+ employee export uses about as much memory as a few pages:
+
+    export_employees("employees.csv.gz", token_dict, client_id, legal_id, employee_status_filter="Active",
+                     fields=['id', 'first_name', 'last_name', 'email', 'hire_date'])
+    export_minimal_employees("employees.jsonl", token_dict, client_id, legal_id)
+    export_checks("checks_2025.parquet", token_dict, client_id, legal_id, year_filter=2025)
+
+The format is taken from the file name (.csv, .jsonl/.ndjson or .parquet) unless format is given. CSV and JSONL
+files are compressed if the name ends in .gz, .bz2 or .xz (or compression is given), Parquet files use snappy
+compression by default. fields selects (and orders) the columns -- for the employee exports only the selected
+fields are converted from the raw records. The SSN is only exported if it is in fields.
+
+Parquet needs pyarrow: pip install insperity-mcp[parquet]
+
+Len Wanger
+2025
+"""
+
+import bz2
+from collections import deque
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+import csv
+from dataclasses import dataclass, field, fields as dataclass_fields
+from datetime import date
+import gzip
+import io
+import json
+import lzma
+from pathlib import Path
+
+from insperity_rest_api import (DEFAULT_PAGE_WORKERS, DEFAULT_PREFETCH_PAGES, filter_legal_employees,
+                                get_employee_checks_raw, get_legal_code, iter_employees_raw,
+                                iter_minimal_employees_raw)
+from insperity_rest_client import get_default_client
+from insperity_rest_fanout import DEFAULT_FANOUT_WORKERS, get_employee_id
+from insperity_rest_types import Employee, LazyEmployee, LazyMinimalEmployee, MinimalEmployee
+
+
+CSV_FORMAT = 'csv'
+JSONL_FORMAT = 'jsonl'
+PARQUET_FORMAT = 'parquet'
+
+DEFAULT_PARQUET_BATCH_ROWS = 10_000  # rows per Parquet row group
+PARQUET_CHUNK_ROWS = 1_000  # rows converted to a (columnar) arrow record batch at a time while a row group is built
+DEFAULT_PARQUET_COMPRESSION = 'snappy'
+EXCLUDED_FIELDS = ('ssn',)  # only exported if asked for
+
+_FORMAT_SUFFIXES = {'.csv': CSV_FORMAT, '.jsonl': JSONL_FORMAT, '.ndjson': JSONL_FORMAT, '.parquet': PARQUET_FORMAT}
+_COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz'}
+_COMPRESSION_OPENERS = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+
+@dataclass
+class ExportResult:
+    path: Path
+    rows: int = 0
+    extra_columns: list[str] = field(default_factory=list)  # keys of later rows not in the columns (not exported)
+    errors: dict[str, Exception] = field(default_factory=dict)  # employee id -> error (for export_checks)
+
+
+def get_format(path: str|Path, format: str|None=None, compression: str|None=None) -> tuple[str, str|None]:
+    # return the (format, compression) for a file -- taken from the file name if they aren't given
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes]
+
+    if (compression is None) and suffixes and (suffixes[-1] in _COMPRESSION_SUFFIXES):
+        compression = _COMPRESSION_SUFFIXES[suffixes.pop()]
+
+    if format is None:
+        format = _FORMAT_SUFFIXES.get(suffixes[-1], None) if suffixes else None
+
+    if format not in (CSV_FORMAT, JSONL_FORMAT, PARQUET_FORMAT):
+        raise ValueError(f"Unknown export format for {path} (use format='csv', 'jsonl' or 'parquet')")
+
+    return format, compression
+
+
+def _open_text(path: Path, compression: str|None) -> io.TextIOBase:
+    if compression is None:
+        return open(path, "w", newline="", encoding="utf-8")
+
+    if compression not in _COMPRESSION_OPENERS:
+        raise ValueError(f"Unknown compression: {compression} (use 'gzip', 'bz2' or 'xz')")
+
+    return _COMPRESSION_OPENERS[compression](path, "wt", newline="", encoding="utf-8")
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _flat_value(value):
+    # value for a flat (CSV or Parquet) column -- nested values are written as JSON
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    return value
+
+
+##############################################################################################################
+# Writers
+##############################################################################################################
+class RecordWriter:
+    """
+    Base class of the file writers. Rows are dictionaries of column name to value, written one at a time.
+
+    If columns is None the columns are the keys of the first row -- the file layout is fixed when the first row is
+    written, so keys that only appear in later rows aren't written. They are listed in extra_columns.
+
+    :param path: path of the file to write
+    :param columns: column names (None to use the keys of the first row)
+    """
+    def __init__(self, path: str|Path, columns: list[str]|None=None):
+        self.path = Path(path)
+        self.columns = list(columns) if columns is not None else None
+        self.column_set = None  # set of the columns, if they were taken from the first row
+        self.extra_columns = {}  # keys of later rows that aren't columns (a dict to keep them in order)
+        self.rows = 0
+
+    def write(self, row: dict):
+        if self.columns is None:
+            self.columns = list(row)
+            self.column_set = set(self.columns)
+        elif (self.column_set is not None) and (len(row) != len(self.column_set) or row.keys() - self.column_set):
+            self.extra_columns.update(dict.fromkeys(name for name in row if name not in self.column_set))
+
+        self._write(row)
+        self.rows += 1
+
+    def write_rows(self, rows: Iterable[dict]):
+        for row in rows:
+            self.write(row)
+
+    def _write(self, row: dict):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CsvRecordWriter(RecordWriter):
+    # CSV file with a header row. Dates are written as ISO dates and nested values as JSON.
+    def __init__(self, path: str|Path, columns: list[str]|None=None, compression: str|None=None):
+        super().__init__(path, columns)
+        self.file = _open_text(self.path, compression)
+        self.writer = None
+
+    def _write(self, row: dict):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=self.columns, extrasaction='ignore')
+            self.writer.writeheader()
+
+        self.writer.writerow({name: _flat_value(value) for name, value in row.items()})
+
+    def close(self):
+        if (self.writer is None) and (self.columns is not None):  # no rows -- still write the header
+            csv.writer(self.file).writerow(self.columns)
+        self.file.close()
+
+
+class JsonlRecordWriter(RecordWriter):
+    # one JSON object per line, with the columns in order
+    def __init__(self, path: str|Path, columns: list[str]|None=None, compression: str|None=None):
+        super().__init__(path, columns)
+        self.file = _open_text(self.path, compression)
+
+    def _write(self, row: dict):
+        self.file.write(json.dumps({name: row.get(name, None) for name in self.columns}, default=_json_default))
+        self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetRecordWriter(RecordWriter):
+    """
+    Parquet file, written batch_rows rows (one row group) at a time. The column types are taken from column_types
+    (e.g. the Employee field types) where given, and the rest are inferred from the first rows: numbers are written
+    as float64 (so a column of whole numbers in the first rows can hold fractions later), and columns that are all
+    null in the first rows are written as strings. Values of later rows that don't match a string column are written
+    as strings, and nested values as JSON strings.
+
+    :param path: path of the file to write
+    :param columns: column names (None to use the keys of the first row)
+    :param compression: Parquet compression codec (e.g. 'snappy', 'zstd', 'gzip' or None)
+    :param batch_rows: rows per row group
+    :param column_types: dictionary of column name -> Python type (str, int, float, bool or date)
+    """
+    def __init__(self, path: str|Path, columns: list[str]|None=None, compression: str|None=DEFAULT_PARQUET_COMPRESSION,
+                 batch_rows: int=DEFAULT_PARQUET_BATCH_ROWS, column_types: dict[str, type]|None=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow: pip install insperity-mcp[parquet]") from None
+
+        super().__init__(path, columns)
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.compression = compression
+        self.batch_rows = batch_rows
+        self.column_types = column_types or {}
+        self.string_columns = []  # columns written as strings (their values are converted to strings)
+        self.chunk = []  # rows not converted yet
+        self.batches = []  # record batches of the row group being built
+        self.batch_row_count = 0
+        self.schema = None
+        self.writer = None
+
+    def _write(self, row: dict):
+        self.chunk.append({name: _flat_value(row.get(name, None)) for name in self.columns})
+
+        if len(self.chunk) >= PARQUET_CHUNK_ROWS:
+            self._convert_chunk()
+
+        if self.batch_row_count >= self.batch_rows:
+            self._write_row_group()
+
+    def _get_schema(self):
+        # the schema from the column types, with the other columns inferred from the first rows
+        pa = self.pa
+        arrow_types = {str: pa.string(), int: pa.float64(), float: pa.float64(), bool: pa.bool_(), date: pa.date32()}
+        untyped_columns = [name for name in self.columns if self.column_types.get(name, None) not in arrow_types]
+        inferred = None
+
+        if untyped_columns and self.chunk:
+            inferred = pa.Table.from_pylist([{name: row[name] for name in untyped_columns} for row in self.chunk]).schema
+
+        schema_fields = []
+
+        for name in self.columns:
+            if self.column_types.get(name, None) in arrow_types:
+                field_type = arrow_types[self.column_types[name]]
+            else:
+                field_type = inferred.field(name).type if inferred is not None else pa.string()
+
+            if pa.types.is_null(field_type):
+                field_type = pa.string()
+            elif pa.types.is_integer(field_type) or pa.types.is_floating(field_type):
+                field_type = pa.float64()
+
+            schema_fields.append(pa.field(name, field_type))
+
+        schema = pa.schema(schema_fields)
+        self.string_columns = [schema_field.name for schema_field in schema if pa.types.is_string(schema_field.type)]
+        return schema
+
+    def _convert_chunk(self):
+        # convert the buffered rows to an arrow record batch, which is much smaller than the row dictionaries
+        if self.schema is None:
+            self.schema = self._get_schema()
+
+        if self.chunk:
+            # a string column can get other values after the first rows (e.g. a column that was all null)
+            for row in self.chunk:
+                for name in self.string_columns:
+                    value = row[name]
+                    if (value is not None) and not isinstance(value, str):
+                        row[name] = _json_default(value)
+
+            self.batches.append(self.pa.RecordBatch.from_pylist(self.chunk, schema=self.schema))
+            self.batch_row_count += len(self.chunk)
+            self.chunk = []
+
+    def _write_row_group(self):
+        self._convert_chunk()
+
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, self.schema, compression=self.compression)
+
+        if self.batches:
+            self.writer.write_table(self.pa.Table.from_batches(self.batches, schema=self.schema))
+            self.batches = []
+            self.batch_row_count = 0
+
+    def close(self):
+        if self.columns is not None:
+            self._write_row_group()
+
+        if self.writer is not None:
+            self.writer.close()
+
+
+def open_writer(path: str|Path, columns: list[str]|None=None, format: str|None=None,
+                compression: str|None=None, column_types: dict[str, type]|None=None) -> RecordWriter:
+    """
+    Open a writer for a CSV, JSONL or Parquet file.
+
+    :param path: path of the file to write
+    :param columns: column names (None to use the keys of the first row)
+    :param format: 'csv', 'jsonl' or 'parquet' (None to use the file name)
+    :param compression: 'gzip', 'bz2' or 'xz' for CSV/JSONL (None to use the file name), or a Parquet codec
+    :param column_types: dictionary of column name -> Python type, for the Parquet schema (other columns are
+        inferred from the first rows)
+    :return: RecordWriter (use it as a context manager, or call close())
+    """
+    format, compression = get_format(path, format, compression)
+
+    if format == CSV_FORMAT:
+        return CsvRecordWriter(path, columns, compression)
+    elif format == JSONL_FORMAT:
+        return JsonlRecordWriter(path, columns, compression)
+
+    return ParquetRecordWriter(path, columns, compression if compression is not None else DEFAULT_PARQUET_COMPRESSION,
+                               column_types=column_types)
+
+
+def export_records(path: str|Path, rows: Iterable[dict], columns: list[str]|None=None, format: str|None=None,
+                   compression: str|None=None, column_types: dict[str, type]|None=None) -> ExportResult:
+    # write rows (dictionaries of column name to value) to a file, one at a time
+    with open_writer(path, columns, format, compression, column_types) as writer:
+        writer.write_rows(rows)
+
+    return ExportResult(Path(path), writer.rows, list(writer.extra_columns))
+
+
+##############################################################################################################
+# Employee and check exports
+##############################################################################################################
+def get_export_fields(record_class: type, requested_fields: list[str]|None) -> list[str]:
+    # return the fields to export (all of them except the SSN if none requested) -- raises ValueError for unknown
+    #   fields
+    all_fields = [record_field.name for record_field in dataclass_fields(record_class)]
+
+    if not requested_fields:
+        return [name for name in all_fields if name not in EXCLUDED_FIELDS]
+
+    unknown_fields = [name for name in requested_fields if name not in all_fields]
+    if unknown_fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown_fields)}. Fields: {', '.join(all_fields)}")
+
+    return list(dict.fromkeys(requested_fields))
+
+
+def _export_lazy_records(path: str|Path, raw_records: Iterable[dict], make_record: type, record_class: type,
+                         field_names: list[str], format: str|None, compression: str|None) -> ExportResult:
+    # only the exported fields of each record are converted from the raw record. The column types are the field
+    #   types of the record class, so a field that is null in the first rows doesn't change the Parquet schema.
+    rows = ({name: getattr(record, name) for name in field_names}
+            for record in map(make_record, raw_records))
+    column_types = {record_field.name: record_field.type for record_field in dataclass_fields(record_class)}
+    return export_records(path, rows, field_names, format, compression, column_types)
+
+
+def export_employees(path: str|Path, token_dict: dict, client_id: str, legal_id: str,
+                     employee_status_filter: str|None=None, search_text: str|None=None,
+                     fields: list[str]|None=None, format: str|None=None, compression: str|None=None,
+                     prefetch: int=DEFAULT_PREFETCH_PAGES, max_workers: int=DEFAULT_PAGE_WORKERS) -> ExportResult:
+    """
+    Export the employee records (Employee fields) to a CSV, JSONL or Parquet file, one page at a time. The
+    employees endpoint returns the employees of every legal of the client, so only the legal's employees are exported.
+
+    :param path: path of the file to write
+    :param token_dict:
+    :param client_id:
+    :param legal_id:
+    :param employee_status_filter:
+    :param search_text:
+    :param fields: Employee fields to export, in order (None for all of the fields except the SSN)
+    :param format: 'csv', 'jsonl' or 'parquet' (None to use the file name)
+    :param compression: 'gzip', 'bz2' or 'xz' for CSV/JSONL (None to use the file name), or a Parquet codec
+    :param prefetch: number of pages to fetch ahead of the writer
+    :param max_workers: max number of pages to request at the same time
+    :return: ExportResult
+    """
+    field_names = get_export_fields(Employee, fields)
+    raw_employees = iter_employees_raw(token_dict, client_id, legal_id, employee_status_filter, search_text,
+                                       with_ssn='ssn' in field_names, prefetch=prefetch, max_workers=max_workers)
+    raw_employees = filter_legal_employees(raw_employees, get_legal_code(token_dict, legal_id))
+    return _export_lazy_records(path, raw_employees, LazyEmployee, Employee, field_names, format, compression)
+
+
+def export_minimal_employees(path: str|Path, token_dict: dict, client_id: str, legal_id: str,
+                             employee_status_filter: str|None=None, fields: list[str]|None=None,
+                             format: str|None=None, compression: str|None=None, prefetch: int=DEFAULT_PREFETCH_PAGES,
+                             max_workers: int=DEFAULT_PAGE_WORKERS) -> ExportResult:
+    """
+    Export the minimal employee records (MinimalEmployee fields) to a CSV, JSONL or Parquet file, one page at a time.
+
+    See export_employees for the parameters. fields are MinimalEmployee fields.
+    """
+    field_names = get_export_fields(MinimalEmployee, fields)
+    raw_employees = iter_minimal_employees_raw(token_dict, client_id, legal_id, employee_status_filter,
+                                               prefetch=prefetch, max_workers=max_workers)
+    return _export_lazy_records(path, raw_employees, LazyMinimalEmployee, MinimalEmployee, field_names, format, compression)
+
+
+def export_checks(path: str|Path, token_dict: dict, client_id: str, legal_id: str, employees: Iterable|None=None,
+                  year_filter: int|None=None, include_details: bool|None=None, fields: list[str]|None=None,
+                  format: str|None=None, compression: str|None=None,
+                  max_workers: int=DEFAULT_FANOUT_WORKERS) -> ExportResult:
+    """
+    Export the pay checks of many employees to a CSV, JSONL or Parquet file. The checks are requested for up to
+    max_workers employees at a time and written in employee order as they arrive, so only the checks of a few
+    employees are held in memory. Each row is a raw check record with an employee_id column added in front.
+
+    With fields=None the columns are the keys of the first check (the file layout is fixed when the first row is
+    written). Keys that only appear in later checks aren't exported -- they are listed in the extra_columns of the
+    result, so pass fields to export them.
+
+    :param path: path of the file to write
+    :param token_dict:
+    :param client_id:
+    :param legal_id:
+    :param employees: Employee/MinimalEmployee objects, raw employee dicts or employee id strings (None for all of
+        the employees of the legal)
+    :param year_filter:
+    :param include_details:
+    :param fields: check record keys to export, in order (None for the keys of the first check -- see above)
+    :param format: 'csv', 'jsonl' or 'parquet' (None to use the file name)
+    :param compression: 'gzip', 'bz2' or 'xz' for CSV/JSONL (None to use the file name), or a Parquet codec
+    :param max_workers: maximum number of employees to request at the same time (capped at the default client's
+        pool_maxsize)
+    :return: ExportResult (with the employees whose checks couldn't be read in errors)
+    """
+    if employees is None:
+        employees = iter_minimal_employees_raw(token_dict, client_id, legal_id)
+
+    # more workers than pooled connections would open (and throw away) extra connections (see fan_out)
+    max_workers = max(1, min(max_workers, get_default_client().pool_maxsize))
+
+    employee_ids = map(get_employee_id, employees)
+    columns = ['employee_id'] + [name for name in fields if name != 'employee_id'] if fields else None
+    errors = {}
+
+    def get_checks(employee_id: str) -> list[dict]:
+        return get_employee_checks_raw(token_dict=token_dict, client_id=client_id, legal_id=legal_id,
+                                       employee_id=employee_id, year_filter=year_filter,
+                                       include_details=include_details)
+
+    with open_writer(path, columns, format, compression) as writer, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # keep at most 2 * max_workers employees in flight, and write them in order
+        futures = deque()
+
+        for employee_id in employee_ids:
+            futures.append((employee_id, executor.submit(get_checks, employee_id)))
+
+            while len(futures) >= 2 * max_workers:
+                _write_checks(writer, *futures.popleft(), errors)
+
+        while futures:
+            _write_checks(writer, *futures.popleft(), errors)
+
+    return ExportResult(Path(path), writer.rows, list(writer.extra_columns), errors)
+
+
+def _write_checks(writer: RecordWriter, employee_id: str, future, errors: dict):
+    try:
+        checks = future.result()
+    except Exception as e:
+        errors[employee_id] = e
+        return
+
+    for check in checks:
+        writer.write({'employee_id': employee_id, **check})
@@ -0,0 +1,321 @@
+"""
+MCP server for the Insperity REST API
+
+Exposes the employee lookup functions as MCP tools. The server keeps one warm InsperityServerState for its whole
+lifetime -- a pooled AsyncInsperityClient (with a response cache), the access token (refreshed before it expires),
+the client and legal ids, and an EmployeeDirectory of the employees -- so a tool call doesn't authenticate or load
+anything, and its latency is just the lookup:
+
+    fastmcp run insperity_mcp_server.py -t http -p 8080
+
+The client code and legal are read from environment variables (a .env file is loaded):
+
+- INSPERITY_CLIENT_CODE = Insperity client code
+- INSPERITY_LEGAL_NAME = substring of the legal name to use (optional, defaults to the first legal)
+- INSPERITY_DIRECTORY_REFRESH = seconds between reloads of the employee directory (optional, defaults to 900)
+
+The list tools and get_employee_checks return one page at a time, with only the requested fields. The employee
+records are LazyEmployee objects over the raw JSON, so fields that aren't requested are never converted. Each page has
+an opaque next_cursor to pass back to get the next page -- the cursor refers to a snapshot of the list, so paging
+through it is consistent even if the list is reloaded in the meantime.
+
+Len Wanger
+2025
+"""
+
+import asyncio
+import base64
+from contextlib import asynccontextmanager
+from dataclasses import fields
+from datetime import date
+import json
+import os
+import uuid
+
+from dotenv import load_dotenv
+from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+
+from insperity_employee_directory import EmployeeDirectory
+from insperity_rest_async import AsyncInsperityClient
+from insperity_rest_response_cache import ResponseCache
+from insperity_rest_types import Employee, LazyEmployee, LazyMinimalEmployee, MinimalEmployee
+
+
+MCP_SERVER_PORT = 8080
+DEFAULT_DIRECTORY_REFRESH = 15 * 60  # seconds
+DEFAULT_SEARCH_LIMIT = 10
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+SNAPSHOT_TTL = 10 * 60  # seconds a list snapshot is kept for its cursors
+MAX_SNAPSHOTS = 32
+
+DEFAULT_EMPLOYEE_FIELDS = ('id', 'first_name', 'last_name', 'email', 'phone_number', 'job_title', 'employment_status')
+DEFAULT_MINIMAL_EMPLOYEE_FIELDS = ('id', 'first_name', 'last_name', 'email', 'job_title', 'employment_status')
+EXCLUDED_FIELDS = ('ssn',)  # never returned by a tool
+ALL_EMPLOYEE_FIELDS = tuple(field.name for field in fields(Employee) if field.name not in EXCLUDED_FIELDS)
+
+
+def get_field_names(record_class: type, requested_fields: list[str]|None, default_fields: tuple[str, ...]) -> list[str]:
+    # return the fields to project (default_fields if none requested) -- raises ToolError for unknown fields
+    if not requested_fields:
+        return list(default_fields)
+
+    allowed_fields = [field.name for field in fields(record_class) if field.name not in EXCLUDED_FIELDS]
+    unknown_fields = [name for name in requested_fields if name not in allowed_fields]
+
+    if unknown_fields:
+        raise ToolError(f"Unknown fields: {', '.join(unknown_fields)}. Allowed fields: {', '.join(allowed_fields)}")
+
+    return list(dict.fromkeys(requested_fields))
+
+
+def record_to_dict(record, field_names: list[str]|None=None) -> dict:
+    # convert an Employee/MinimalEmployee (or lazy record) to a JSON friendly dictionary with only field_names (all
+    #   fields if None), never including the SSN. With a lazy record only the projected fields are read.
+    if field_names is None:
+        field_names = [field.name for field in fields(getattr(record, 'record_class', record))]
+
+    record_dict = {}
+
+    for name in field_names:
+        if name in EXCLUDED_FIELDS:
+            continue
+
+        value = getattr(record, name)
+        record_dict[name] = value.isoformat() if isinstance(value, date) else value
+
+    return record_dict
+
+
+def project_dict(raw_dict: dict, field_names: list[str]|None) -> dict:
+    # return a raw REST API dictionary with only field_names (all keys if None) -- missing fields are None
+    if not field_names:
+        return {name: value for name, value in raw_dict.items() if name not in EXCLUDED_FIELDS}
+
+    return {name: raw_dict.get(name, None) for name in dict.fromkeys(field_names) if name not in EXCLUDED_FIELDS}
+
+
+def encode_cursor(snapshot_id: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([snapshot_id, offset]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        snapshot_id, offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(snapshot_id), max(0, int(offset))
+    except (ValueError, TypeError):
+        raise ToolError("Invalid cursor") from None
+
+
+class InsperityServerState:
+    """
+    Warm state shared by all of the tool calls: client, credentials and employee directory.
+
+    :param client_code: Insperity client code
+    :param legal_name_substring: substring of the legal name to use (None for the first legal)
+    :param directory_refresh: seconds between reloads of the employee directory (None to never reload)
+    """
+    def __init__(self, client_code: str, legal_name_substring: str|None=None,
+                 directory_refresh: float|None=DEFAULT_DIRECTORY_REFRESH):
+        self.client_code = client_code
+        self.legal_name_substring = legal_name_substring
+        self.directory_refresh = directory_refresh
+        self.client = None
+        self.token_dict = None
+        self.client_id = None
+        self.legal_id = None
+        self.legal_code = None
+        self.directory = None
+        # raw lists for the cursors (only sliced and projected, so they aren't copied)
+        self.snapshots = ResponseCache(max_entries=MAX_SNAPSHOTS, default_ttl=SNAPSHOT_TTL, copy_values=False)
+        self._refresh_task = None
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        # connect, get the credentials and load the employee directory (only done once)
+        async with self._start_lock:
+            if self.client is not None:
+                return
+
+            client = AsyncInsperityClient(response_cache=ResponseCache())
+            self.token_dict, self.client_id, self.legal_id = await client.get_credentials(
+                client_code=self.client_code, legal_name_substring=self.legal_name_substring)
+            self.legal_code = await client.get_legal_code(self.token_dict, self.legal_id)
+            self.directory = EmployeeDirectory(employees=await self._load_employees(client))
+            self.client = client
+
+            if self.directory_refresh is not None:
+                self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def _load_employees(self, client: AsyncInsperityClient) -> list:
+        # the employee list has the employees of every legal of the client -- keep the ones of the server's legal
+        employees = await client.get_employee_list(self.token_dict, self.client_id, self.legal_id)
+        return [employee for employee in employees if employee.legal_code == self.legal_code]
+
+    async def _refresh_loop(self):
+        # reload the employee directory every directory_refresh seconds -- the index is built in a worker thread so
+        #   tool calls aren't blocked, and searches use the old index until the new one is ready
+        while True:
+            await asyncio.sleep(self.directory_refresh)
+
+            try:
+                employees = await self._load_employees(self.client)
+                await asyncio.to_thread(self.directory.set_employees, employees)
+            except Exception:  # keep the old directory and try again at the next interval
+                pass
+
+    async def get_page(self, endpoint: str, fetch_function, project, page_size: int, cursor: str|None) -> dict:
+        # return a page of records from a snapshot of a raw list, each converted to a dict with project. A new
+        #   snapshot is taken (with fetch_function) when there is no cursor, or the cursor's snapshot has expired.
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        raw_list = None
+        offset = 0
+
+        if cursor is not None:
+            snapshot_id, offset = decode_cursor(cursor)
+            hit, raw_list = self.snapshots.get(endpoint, snapshot_id)
+
+            if not hit:  # expired -- continue from the same offset in a new snapshot
+                raw_list = None
+
+        if raw_list is None:
+            snapshot_id = uuid.uuid4().hex
+            raw_list = await fetch_function()
+            self.snapshots.put(endpoint, snapshot_id, raw_list)
+
+        page = raw_list[offset:offset + page_size]
+        next_offset = offset + len(page)
+
+        return {
+            'results': [project(raw_record) for raw_record in page],
+            'total': len(raw_list),
+            'next_cursor': encode_cursor(snapshot_id, next_offset) if next_offset < len(raw_list) else None,
+        }
+
+    async def close(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+
+_state = None
+
+
+def get_state() -> InsperityServerState:
+    # return the server state, created from the environment variables the first time it is needed
+    global _state
+
+    if _state is None:
+        load_dotenv()
+        directory_refresh = os.getenv('INSPERITY_DIRECTORY_REFRESH', None)
+        _state = InsperityServerState(client_code=os.getenv('INSPERITY_CLIENT_CODE'),
+                                      legal_name_substring=os.getenv('INSPERITY_LEGAL_NAME', None),
+                                      directory_refresh=float(directory_refresh) if directory_refresh else
+                                      DEFAULT_DIRECTORY_REFRESH)
+    return _state
+
+
+async def get_started_state() -> InsperityServerState:
+    state = get_state()
+    await state.start()
+    return state
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    # warm up the state when the server starts, so the first tool call doesn't pay for it
+    state = await get_started_state()
+    try:
+        yield
+    finally:
+        await state.close()
+
+
+mcp = FastMCP(name="Insperity", lifespan=lifespan,
+              instructions="Look up employee information (names, emails, phone numbers, jobs and pay checks) in the "
+                           "Insperity HR system.")
+
+
+##############################################################################################################
+# Tools
+##############################################################################################################
+@mcp.tool
+async def search_employees(query: str, limit: int=DEFAULT_SEARCH_LIMIT, fields: list[str]|None=None) -> list[dict]:
+    """Find employees by name, email, employee number or time clock id. Misspellings and partial names are allowed.
+    Returns the best matches first, with a match score. limit is the maximum number of matches (1 to 500). fields is
+    the list of Employee fields to return (defaults to id, name, email, phone number, job title and status)."""
+    state = await get_started_state()
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    field_names = get_field_names(Employee, fields, DEFAULT_EMPLOYEE_FIELDS)
+    return [{**record_to_dict(employee, field_names), 'score': round(score, 3)}
+            for employee, score in state.directory.search(query, limit)]
+
+
+@mcp.tool
+async def get_employee(employee_id: str, fields: list[str]|None=None) -> dict:
+    """Get the record of an employee by employee id (the id returned by search_employees). fields is the list of
+    Employee fields to return (defaults to all of them)."""
+    state = await get_started_state()
+    field_names = get_field_names(Employee, fields, ALL_EMPLOYEE_FIELDS)
+    raw_employee = await state.client.get_employee_by_id(state.token_dict, state.client_id, state.legal_id,
+                                                         employee_id)
+    return record_to_dict(LazyEmployee(raw_employee), field_names)
+
+
+@mcp.tool
+async def list_employees(employee_status_filter: str|None=None, fields: list[str]|None=None,
+                         page_size: int=DEFAULT_PAGE_SIZE, cursor: str|None=None) -> dict:
+    """List the employees one page at a time (e.g. employee_status_filter="Active"). fields is the list of Employee
+    fields to return (defaults to id, name, email, phone number, job title and status). Returns results, total and
+    next_cursor -- pass next_cursor back as cursor to get the next page (it is null on the last page)."""
+    state = await get_started_state()
+    field_names = get_field_names(Employee, fields, DEFAULT_EMPLOYEE_FIELDS)
+
+    async def fetch_function() -> list[dict]:
+        # the employee list has the employees of every legal of the client -- keep the ones of the server's legal
+        raw_list = await state.client.get_employee_list_raw(state.token_dict, state.client_id, state.legal_id,
+                                                            employee_status_filter=employee_status_filter)
+        return [raw_employee for raw_employee in raw_list if raw_employee.get('legalCode') == state.legal_code]
+
+    return await state.get_page(f"employees:{employee_status_filter}", fetch_function,
+                                lambda raw_employee: record_to_dict(LazyEmployee(raw_employee), field_names),
+                                page_size, cursor)
+
+
+@mcp.tool
+async def list_minimal_employees(employee_status_filter: str|None=None, fields: list[str]|None=None,
+                                 page_size: int=DEFAULT_PAGE_SIZE, cursor: str|None=None) -> dict:
+    """List the employees with a minimal set of fields (name, email, city, state, hire date, status and job) one
+    page at a time. fields is the list of MinimalEmployee fields to return. Returns results, total and next_cursor --
+    pass next_cursor back as cursor to get the next page (it is null on the last page)."""
+    state = await get_started_state()
+    field_names = get_field_names(MinimalEmployee, fields, DEFAULT_MINIMAL_EMPLOYEE_FIELDS)
+    fetch_function = lambda: state.client.get_minimal_employee_list_raw(state.token_dict, state.client_id,
+                                                                        state.legal_id, employee_status_filter)
+    return await state.get_page(f"employeesMinimal:{employee_status_filter}", fetch_function,
+                                lambda raw_employee: record_to_dict(LazyMinimalEmployee(raw_employee), field_names),
+                                page_size, cursor)
+
+
+@mcp.tool
+async def get_employee_checks(employee_id: str, year_filter: int|None=None, include_details: bool|None=None,
+                              fields: list[str]|None=None, page_size: int=DEFAULT_PAGE_SIZE,
+                              cursor: str|None=None) -> dict:
+    """Get the pay checks of an employee (optionally only for one year) one page at a time. fields is the list of
+    check fields to return (e.g. checkNumber, checkDate, grossPay, netPay; defaults to all of them). Returns results,
+    total and next_cursor -- pass next_cursor back as cursor to get the next page (it is null on the last page)."""
+    state = await get_started_state()
+    fetch_function = lambda: state.client.get_employee_checks_raw(state.token_dict, state.client_id, state.legal_id,
+                                                                  employee_id, year_filter=year_filter,
+                                                                  include_details=include_details)
+    return await state.get_page(f"checks:{employee_id}:{year_filter}:{include_details}", fetch_function,
+                                lambda check: project_dict(check, fields), page_size, cursor)
+
+
+if __name__ == "__main__":
+    mcp.run(transport="http", port=MCP_SERVER_PORT)
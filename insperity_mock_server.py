@@ -0,0 +1,648 @@
+"""
+Offline stand-in for the Insperity REST API, with a synthetic workforce
+
+MockInsperityServer serves the endpoints used by insperity_rest_api (token, clients, legals, employeesMinimal,
+employees, employeesWithSSN, employee by id, checks and timecardData) from a local HTTP server, so the client can be
+tested, load tested and benchmarked without live credentials:
+
+    with MockInsperityServer(MockServerConfig(employees=100_000, latency=0.02, throttle_rate=0.01)) as server:
+        set_base_url(server.base_url)
+        token_dict, client_id, legal_id = get_credentials(client_code="MOCK")
+        employees = get_employee_list(token_dict, client_id, legal_id)
+
+or from the command line (then set INSPERITY_BASE_URL to the printed url):
+
+    python insperity_mock_server.py --employees 100000 --port 8089 --latency 0.02 --throttle-rate 0.01
+
+The workforce is generated from the seed, one employee at a time when a page is requested, so a 100k+ employee
+workforce doesn't use much memory and is the same on every run. Responses are paged like the REST API (nextPageUrl
+and totalCount), and faults can be injected: latency, token expiry, random 401s, 429s (with Retry-After) and 5xx
+errors, and a request rate limit.
+
+Len Wanger
+2025
+"""
+
+import argparse
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+
+API_PATH = "/rest/api"
+MOCK_CLIENT_ID = "5660"
+FIRST_EMPLOYEE_ID = 400000
+MAX_FILTERED_LISTS = 16  # number of filtered employee lists kept for paging
+
+FIRST_NAMES = ("James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+               "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Carlos", "Karen",
+               "Daniel", "Lisa", "Matthew", "Nancy", "Anthony", "Betty", "Mark", "Sandra", "Jose", "Ashley", "Wei",
+               "Priya", "Ahmed", "Fatima", "Hiroshi", "Olga", "Juan", "Maria", "Kwame", "Aisha")
+LAST_NAMES = ("Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+              "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+              "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+              "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores")
+CITIES = (("Las Vegas", "NV", "89101"), ("Henderson", "NV", "89002"), ("Newport Beach", "CA", "92660"),
+          ("Irvine", "CA", "92602"), ("Houston", "TX", "77001"), ("Phoenix", "AZ", "85001"))
+JOBS = (("ENG1", "Engineer"), ("TECH", "Technician"), ("ASSY", "Assembler"), ("SALES", "Sales Representative"),
+        ("ACCT", "Accountant"), ("MGR", "Manager"), ("HR", "HR Generalist"), ("SHIP", "Shipping Clerk"))
+PAY_TYPES = (("Hourly", "FT", "1.00"), ("Hourly", "PT", "0.50"), ("Auto Salary", "FT", "1.00"),
+             ("Salary", "FT", "1.00"))
+STATUSES = ("Active",) * 17 + ("Terminated",) * 2 + ("Leave of Absence",)
+
+
+@dataclass
+class MockServerConfig:
+    employees: int = 1000               # number of employees in the workforce
+    legals: int = 2                     # number of legals (employees are split evenly between them)
+    page_size: int = 100                # records per page
+    seed: int = 0                       # seed of the synthetic workforce
+    latency: float = 0.0                # seconds added to every response
+    latency_jitter: float = 0.0         # random extra seconds (0 to latency_jitter) added to every response
+    token_ttl: int = 3600               # seconds an access token is valid (expires_in)
+    unauthorized_rate: float = 0.0      # fraction of requests answered with 401 even with a valid token
+    throttle_rate: float = 0.0          # fraction of requests answered with 429
+    server_error_rate: float = 0.0      # fraction of requests answered with 500/502/503/504
+    retry_after: float = 1.0            # Retry-After seconds sent with a 429
+    rate_limit: float|None = None       # requests per second allowed before answering 429 (None for no limit)
+    checks_per_year: int = 26           # pay checks per employee per year
+    page_cache: int = 0                 # number of encoded pages kept and resent as is (0 for none) -- so a
+                                        #   benchmark measures the client instead of the mock server
+
+
+def _iso(day: date) -> str:
+    # date in the REST API's format (e.g. "2019-01-01T00:00:00")
+    return f"{day.isoformat()}T00:00:00"
+
+
+class SyntheticWorkforce:
+    """
+    Deterministic synthetic workforce -- each employee is generated from the seed and its index when it is needed.
+
+    :param size: number of employees
+    :param legal_ids: ids of the legals (employee index i is in legal_ids[i % len(legal_ids)])
+    :param seed: random seed
+    """
+    def __init__(self, size: int, legal_ids: list[str], seed: int=0):
+        self.size = size
+        self.legal_ids = legal_ids
+        self.seed = seed
+        self._filtered = OrderedDict()  # filter key -> list of matching employee indexes
+        self._lock = threading.Lock()
+
+    def _random(self, *key) -> random.Random:
+        # random generator for one part of the workforce -- seeded with a string so it is the same in every process
+        return random.Random(":".join(str(part) for part in (self.seed, *key)))
+
+    def employee_id(self, index: int) -> str:
+        return str(FIRST_EMPLOYEE_ID + index)
+
+    def index(self, employee_id: str) -> int|None:
+        # return the index of an employee id (None if there is no such employee)
+        try:
+            index = int(employee_id) - FIRST_EMPLOYEE_ID
+        except ValueError:
+            return None
+        return index if 0 <= index < self.size else None
+
+    def legal_indexes(self, legal_id: str) -> range:
+        # return the indexes of the employees of a legal
+        position = self.legal_ids.index(legal_id) if legal_id in self.legal_ids else len(self.legal_ids)
+        return range(position, self.size if position < len(self.legal_ids) else 0, len(self.legal_ids))
+
+    def employee(self, index: int, with_ssn: bool=False) -> dict:
+        # return the raw employee record (same shape as the employees endpoint)
+        rng = self._random('employee', index)
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        city, state, zip_code = rng.choice(CITIES)
+        job_id, job_title = rng.choice(JOBS)
+        pay_type, category_code, fte = rng.choice(PAY_TYPES)
+        hire_date = date(2005, 1, 1) + timedelta(days=rng.randrange(7300))
+        birth_date = hire_date - timedelta(days=rng.randrange(18 * 365, 50 * 365))
+        employment_status = rng.choice(STATUSES)
+        manager_index = rng.randrange(self.size)
+
+        return {
+            'id': self.employee_id(index),
+            'employeeNumber': f"{index + 1:06d}",
+            'timeclockId': f"T{index + 1:06d}",
+            'nameAddress': {
+                'firstName': first_name,
+                'lastName': last_name,
+                'middleName': rng.choice((None, "A", "J", "Lee", "Marie")),
+                'address1': f"{rng.randrange(100, 9999)} {rng.choice(LAST_NAMES)} St",
+                'address2': None,
+                'city': city,
+                'state': state,
+                'zipCode': zip_code,
+            },
+            'personal': {'homePhone': f"{rng.randrange(200, 999)}-555-{rng.randrange(10000):04d}"},
+            'emailAddress': f"{first_name}.{last_name}{index}@example.com".lower(),
+            'birthDate': _iso(birth_date),
+            'gender': rng.choice(("M", "F")),
+            'maritalStatus': rng.choice(("Single", "Married")),
+            'hireDate': _iso(hire_date),
+            'employmentStatus': employment_status,
+            'employmentCategoryCode': category_code,
+            'employmentCategoryFullTimeEquivalent': fte,
+            'payType': pay_type,
+            'hourlyRate': f"{rng.uniform(15.0, 60.0):.2f}" if pay_type == "Hourly" else None,
+            'annualSalary': f"{rng.uniform(45000, 180000):.2f}" if pay_type != "Hourly" else None,
+            'assignedManager': {'id': self.employee_id(manager_index), 'employeeName': f"Manager {manager_index}"},
+            'jobId': job_id,
+            'jobTitle': job_title,
+            'workLocation': city,
+            'legalCode': self.legal_ids[index % len(self.legal_ids)],
+            'ssn': f"{rng.randrange(100, 899):03d}-{rng.randrange(1, 99):02d}-{rng.randrange(1, 9999):04d}" if
+                   with_ssn else None,
+        }
+
+    def minimal_employee(self, index: int) -> dict:
+        # return the raw minimal employee record (same shape as the employeesMinimal endpoint)
+        employee = self.employee(index)
+        name_address = employee['nameAddress']
+
+        return {
+            'id': employee['id'],
+            'timeclockId': employee['timeclockId'],
+            'employeeNumber': employee['employeeNumber'],
+            'formalName': f"{name_address['lastName']}, {name_address['firstName']}",
+            'firstName': name_address['firstName'],
+            'lastName': name_address['lastName'],
+            'middleInitial': name_address['middleName'][0] if name_address['middleName'] else None,
+            'city': name_address['city'],
+            'state': name_address['state'],
+            'selfServiceEmail': employee['emailAddress'],
+            'hireDate': employee['hireDate'],
+            'employmentStatus': employee['employmentStatus'],
+            'isManager': employee['jobId'] == "MGR",
+            'isSupervisor': False,
+            'jobTitle': employee['jobTitle'],
+        }
+
+    def filtered_indexes(self, indexes: range, status_filter: str|None, search_text: str|None) -> range|list[int]:
+        # return the indexes of the employees matching the filters. Filtering generates every employee, so the
+        #   filtered lists are kept (for the next pages) in a small LRU cache.
+        if (status_filter is None) and (search_text is None):
+            return indexes
+
+        key = (indexes.start, indexes.step, status_filter, search_text.lower() if search_text else None)
+
+        with self._lock:
+            if key in self._filtered:
+                self._filtered.move_to_end(key)
+                return self._filtered[key]
+
+        matches = []
+        for index in indexes:
+            employee = self.employee(index)
+
+            if (status_filter is not None) and (employee['employmentStatus'] != status_filter):
+                continue
+
+            if search_text is not None:
+                name_address = employee['nameAddress']
+                text = f"{name_address['firstName']} {name_address['lastName']} {employee['emailAddress']}".lower()
+                if search_text.lower() not in text:
+                    continue
+
+            matches.append(index)
+
+        with self._lock:
+            self._filtered[key] = matches
+            while len(self._filtered) > MAX_FILTERED_LISTS:
+                self._filtered.popitem(last=False)
+
+        return matches
+
+    def checks(self, index: int, year: int|None, checks_per_year: int, include_details: bool) -> list[dict]:
+        # return the pay checks of an employee (biweekly, for the year or for the last two years)
+        employee = self.employee(index)
+        hourly_rate = float(employee['hourlyRate'] or 0.0)
+        salary = float(employee['annualSalary'] or 0.0)
+        years = [year] if year is not None else [date.today().year - 1, date.today().year]
+        checks = []
+
+        for check_year in years:
+            rng = self._random('checks', index, check_year)
+            for number in range(checks_per_year):
+                check_date = date(check_year, 1, 5) + timedelta(days=number * (364 // checks_per_year))
+
+                if check_date > date.today():
+                    break
+
+                hours = round(rng.uniform(60.0, 85.0), 2) if hourly_rate else 80.0
+                gross_pay = round(hours * hourly_rate if hourly_rate else salary / checks_per_year, 2)
+                check = {'checkNumber': f"{check_year}{number + 1:03d}", 'checkDate': _iso(check_date),
+                         'hours': hours, 'grossPay': gross_pay, 'netPay': round(gross_pay * 0.76, 2)}
+
+                if include_details:
+                    check['details'] = [{'earningCode': "REG", 'hours': hours, 'amount': gross_pay}]
+
+                checks.append(check)
+
+        return checks
+
+    def timecards(self, index: int, start_date: date, end_date: date) -> list[dict]:
+        # return a timecard record for each work day from start_date to end_date
+        employee = self.employee(index)
+        part_time = employee['employmentCategoryCode'] == "PT"
+        timecards = []
+        day = start_date
+
+        while day <= end_date:
+            if day.weekday() < 5:
+                rng = self._random('timecard', index, day.toordinal())
+                hours = round(rng.uniform(3.0, 5.0) if part_time else rng.uniform(7.0, 9.5), 2)
+                timecards.append({'employeeId': employee['id'], 'workDate': _iso(day), 'hours': hours})
+            day += timedelta(days=1)
+
+        return timecards
+
+
+class _RateLimiter:
+    # token bucket used for the mock server's rate_limit
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.last_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.last_time) * self.rate)
+            self.last_time = now
+
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+
+            return False
+
+
+_ROUTES = [
+    ('clients', re.compile(r"/clients/?$")),
+    ('legals', re.compile(r"/legals/?$")),
+    ('employees_minimal', re.compile(r"/clients/(?P<client_id>[^/]+)/legals/(?P<legal_id>[^/]+)/employeesMinimal$")),
+    ('employees', re.compile(r"/clients/(?P<client_id>[^/]+)/employees$")),
+    ('employees_with_ssn', re.compile(r"/clients/(?P<client_id>[^/]+)/employeesWithSSN$")),
+    ('checks', re.compile(r"/clients/(?P<client_id>[^/]+)/legals/(?P<legal_id>[^/]+)/employees/(?P<employee_id>[^/]+)"
+                          r"/checks$")),
+    ('timecard_data', re.compile(r"/clients/(?P<client_id>[^/]+)/legals/(?P<legal_id>[^/]+)/employees/"
+                                 r"(?P<employee_id>[^/]+)/timecardData$")),
+    ('employee_by_id', re.compile(r"/clients/(?P<client_id>[^/]+)/legals/(?P<legal_id>[^/]+)/employees/"
+                                  r"(?P<employee_id>[^/]+)$")),
+]
+
+
+class _MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+    disable_nagle_algorithm = True  # the headers and body are separate writes -- don't delay the body
+    server: "_MockHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _encode(self, body: dict, headers: dict|None=None) -> tuple[bytes, dict]:
+        # return the encoded (and gzip compressed if the client accepts it) body and its headers
+        content = json.dumps(body).encode()
+        headers = headers or {}
+
+        if (len(content) > 1024) and ('gzip' in self.headers.get('Accept-Encoding', '')):
+            content = gzip.compress(content, compresslevel=1)
+            headers = {**headers, 'Content-Encoding': "gzip"}
+
+        return content, headers
+
+    def _send_json(self, status: int, body: dict, headers: dict|None=None):
+        self._send_content(status, *self._encode(body, headers))
+
+    def _send_content(self, status: int, content: bytes, headers: dict):
+        self.send_response(status)
+        self.send_header('Content-Type', "application/json; charset=utf-8")
+        self.send_header('Content-Length', str(len(content)))
+
+        for name, value in headers.items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(content)
+        self.server.mock.record(status)
+
+    def _inject_faults(self) -> bool:
+        # add the latency and maybe answer with an injected error -- returns True if an error was sent
+        mock = self.server.mock
+        config = mock.config
+        delay = config.latency + (random.uniform(0.0, config.latency_jitter) if config.latency_jitter else 0.0)
+
+        if delay > 0.0:
+            time.sleep(delay)
+
+        if (mock.rate_limiter is not None) and not mock.rate_limiter.allow():
+            self._send_json(429, {'message': "Rate limit exceeded"}, {'Retry-After': f"{config.retry_after:g}"})
+            return True
+
+        if random.random() < config.throttle_rate:
+            self._send_json(429, {'message': "Too many requests"}, {'Retry-After': f"{config.retry_after:g}"})
+            return True
+
+        if random.random() < config.server_error_rate:
+            status = random.choice((500, 502, 503, 504))
+            self._send_json(status, {'message': "Injected server error"})
+            return True
+
+        return False
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        self.server.mock.count_request('token')
+
+        if self._inject_faults():
+            return
+
+        if urlsplit(self.path).path.rstrip('/') != f"{API_PATH}/token":
+            return self._send_json(404, {'message': "No HTTP resource was found that matches the request URI"})
+
+        form = {name: values[0] for name, values in parse_qs(body).items()}
+        grant_type = form.get('grant_type')
+
+        if (grant_type == "refresh_token") and not self.server.mock.use_refresh_token(form.get('refresh_token')):
+            return self._send_json(400, {'error': "invalid_grant"})
+
+        if grant_type not in ("client_credentials", "refresh_token"):
+            return self._send_json(400, {'error': "unsupported_grant_type"})
+
+        access_token, refresh_token = self.server.mock.new_tokens()
+        self._send_json(200, {'access_token': access_token, 'refresh_token': refresh_token, 'token_type': "bearer",
+                              'expires_in': self.server.mock.config.token_ttl})
+
+    def do_GET(self):
+        mock = self.server.mock
+        parts = urlsplit(self.path)
+        path = parts.path.removeprefix(API_PATH)
+        name, match = next(((name, match) for name, pattern in _ROUTES if (match := pattern.match(path)) is not None),
+                           (None, None))
+        mock.count_request(name)
+
+        if self._inject_faults():
+            return
+
+        authorization = self.headers.get('Authorization', '')
+        if not mock.is_valid_token(authorization.removeprefix("Bearer ")):
+            return self._send_json(401, {'message': "Authorization has been denied for this request."})
+
+        if random.random() < mock.config.unauthorized_rate:
+            return self._send_json(401, {'message': "Authorization has been denied for this request."})
+
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+
+        if match is not None:
+            return getattr(self, f"_get_{name}")(parts.path, query, **match.groupdict())
+
+        self._send_json(404, {'message': "No HTTP resource was found that matches the request URI"})
+
+    ##########################################################################################################
+    # Endpoints
+    ##########################################################################################################
+    def _send_page(self, path: str, query: dict, items: range|list, make_record):
+        # send one page of a paged response (pageNumber starts at 1)
+        mock = self.server.mock
+        cache_key = (path, tuple(sorted(query.items())), 'gzip' in self.headers.get('Accept-Encoding', ''))
+        cached = mock.get_cached_page(cache_key)
+
+        if cached is not None:
+            return self._send_content(200, *cached)
+
+        page_size = mock.config.page_size
+        page_number = max(1, int(query.get('pageNumber', 1)))
+        start = (page_number - 1) * page_size
+        results = [make_record(item) for item in items[start:start + page_size]]
+        next_page_url = None
+
+        if start + page_size < len(items):
+            next_query = urlencode({**query, 'pageNumber': page_number + 1})
+            next_page_url = f"{mock.base_url.removesuffix(API_PATH)}{path}?{next_query}"
+
+        content, headers = self._encode({'results': results, 'totalCount': len(items), 'pageNumber': page_number,
+                                         'pageSize': page_size, 'nextPageUrl': next_page_url})
+        mock.cache_page(cache_key, content, headers)
+        self._send_content(200, content, headers)
+
+    def _get_clients(self, path: str, query: dict):
+        self._send_json(200, {'results': [{'id': MOCK_CLIENT_ID, 'clientCode': "MOCK", 'clientName': "Mock Client"}],
+                              'totalCount': 1, 'nextPageUrl': None})
+
+    def _get_legals(self, path: str, query: dict):
+        workforce = self.server.mock.workforce
+        legals = [{'id': legal_id, 'legalName': f"Mock Legal {position + 1}", 'legalCode': legal_id}
+                  for position, legal_id in enumerate(workforce.legal_ids)]
+        self._send_json(200, {'results': legals, 'totalCount': len(legals), 'nextPageUrl': None})
+
+    def _get_employees_minimal(self, path: str, query: dict, client_id: str, legal_id: str):
+        workforce = self.server.mock.workforce
+        indexes = workforce.filtered_indexes(workforce.legal_indexes(legal_id), query.get('employeeStatusFilter'),
+                                             None)
+        self._send_page(path, query, indexes, workforce.minimal_employee)
+
+    def _get_employees(self, path: str, query: dict, client_id: str, with_ssn: bool=False):
+        workforce = self.server.mock.workforce
+        indexes = workforce.filtered_indexes(range(workforce.size), query.get('employeeStatusFilter'),
+                                             query.get('searchText'))
+        self._send_page(path, query, indexes, lambda index: workforce.employee(index, with_ssn=with_ssn))
+
+    def _get_employees_with_ssn(self, path: str, query: dict, client_id: str):
+        self._get_employees(path, query, client_id, with_ssn=True)
+
+    def _get_employee_index(self, employee_id: str) -> int|None:
+        index = self.server.mock.workforce.index(employee_id)
+
+        if index is None:
+            self._send_json(404, {'message': f"Employee {employee_id} not found"})
+
+        return index
+
+    def _get_employee_by_id(self, path: str, query: dict, client_id: str, legal_id: str, employee_id: str):
+        index = self._get_employee_index(employee_id)
+        if index is not None:
+            self._send_json(200, self.server.mock.workforce.employee(index))
+
+    def _get_checks(self, path: str, query: dict, client_id: str, legal_id: str, employee_id: str):
+        index = self._get_employee_index(employee_id)
+        if index is not None:
+            year = int(query['yearFilter']) if 'yearFilter' in query else None
+            include_details = query.get('includeDetails', "False").lower() == "true"
+            checks = self.server.mock.workforce.checks(index, year, self.server.mock.config.checks_per_year,
+                                                       include_details)
+            self._send_page(path, query, checks, lambda check: check)
+
+    def _get_timecard_data(self, path: str, query: dict, client_id: str, legal_id: str, employee_id: str):
+        index = self._get_employee_index(employee_id)
+        if index is not None:
+            end_date = date.fromisoformat(query['endDate'][:10]) if 'endDate' in query else date.today()
+            start_date = (date.fromisoformat(query['startDate'][:10]) if 'startDate' in query else
+                          end_date - timedelta(days=13))
+            timecards = self.server.mock.workforce.timecards(index, start_date, min(end_date, start_date +
+                                                                                     timedelta(days=366)))
+            self._send_page(path, query, timecards, lambda timecard: timecard)
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog -- many clients connect at once under load
+    mock: "MockInsperityServer"
+
+
+class MockInsperityServer:
+    """
+    Local HTTP server that stands in for the Insperity REST API.
+
+    :param config: MockServerConfig (defaults to MockServerConfig())
+    :param host: host to listen on
+    :param port: port to listen on (0 for any free port)
+    """
+    def __init__(self, config: MockServerConfig|None=None, host: str="127.0.0.1", port: int=0):
+        self.config = config if config is not None else MockServerConfig()
+        self.workforce = SyntheticWorkforce(self.config.employees, [str(6751 + i) for i in range(self.config.legals)],
+                                            seed=self.config.seed)
+        self.rate_limiter = _RateLimiter(self.config.rate_limit) if self.config.rate_limit else None
+        self.status_counts = Counter()  # HTTP status -> number of responses sent
+        self.request_counts = Counter()  # endpoint (e.g. 'token' or 'employees') -> number of requests received
+        self._access_tokens = {}  # access token -> expire time
+        self._refresh_tokens = set()
+        self._page_cache = OrderedDict()  # (path, query, gzip) -> (content, headers)
+        self._lock = threading.Lock()
+        self._http_server = _MockHTTPServer((host, port), _MockRequestHandler)
+        self._http_server.mock = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._http_server.server_address[:2]
+        return f"http://{host}:{port}{API_PATH}"
+
+    def new_tokens(self) -> tuple[str, str]:
+        access_token, refresh_token = secrets.token_urlsafe(24), secrets.token_urlsafe(24)
+
+        with self._lock:
+            self._access_tokens[access_token] = time.monotonic() + self.config.token_ttl
+            self._refresh_tokens.add(refresh_token)
+
+        return access_token, refresh_token
+
+    def use_refresh_token(self, refresh_token: str|None) -> bool:
+        # refresh tokens can only be used once
+        with self._lock:
+            if refresh_token in self._refresh_tokens:
+                self._refresh_tokens.discard(refresh_token)
+                return True
+            return False
+
+    def is_valid_token(self, access_token: str) -> bool:
+        with self._lock:
+            return self._access_tokens.get(access_token, 0.0) > time.monotonic()
+
+    def expire_tokens(self):
+        # make all of the access tokens expire now (to test token refresh)
+        with self._lock:
+            self._access_tokens.clear()
+
+    def get_cached_page(self, cache_key: tuple) -> tuple[bytes, dict]|None:
+        with self._lock:
+            cached = self._page_cache.get(cache_key, None)
+            if cached is not None:
+                self._page_cache.move_to_end(cache_key)
+            return cached
+
+    def cache_page(self, cache_key: tuple, content: bytes, headers: dict):
+        if self.config.page_cache <= 0:
+            return
+
+        with self._lock:
+            self._page_cache[cache_key] = (content, headers)
+            while len(self._page_cache) > self.config.page_cache:
+                self._page_cache.popitem(last=False)
+
+    def count_request(self, endpoint: str|None):
+        with self._lock:
+            self.request_counts[endpoint] += 1
+
+    def reset_counts(self):
+        with self._lock:
+            self.status_counts.clear()
+            self.request_counts.clear()
+
+    def record(self, status: int):
+        with self._lock:
+            self.status_counts[status] += 1
+
+    def start(self) -> "MockInsperityServer":
+        # start serving in a background thread
+        self._thread = threading.Thread(target=self._http_server.serve_forever, name="MockInsperityServer",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._http_server.shutdown()
+        self._http_server.server_close()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Insperity REST API")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--employees', type=int, default=MockServerConfig.employees)
+    parser.add_argument('--legals', type=int, default=MockServerConfig.legals)
+    parser.add_argument('--page-size', type=int, default=MockServerConfig.page_size)
+    parser.add_argument('--seed', type=int, default=MockServerConfig.seed)
+    parser.add_argument('--latency', type=float, default=MockServerConfig.latency)
+    parser.add_argument('--latency-jitter', type=float, default=MockServerConfig.latency_jitter)
+    parser.add_argument('--token-ttl', type=int, default=MockServerConfig.token_ttl)
+    parser.add_argument('--unauthorized-rate', type=float, default=MockServerConfig.unauthorized_rate)
+    parser.add_argument('--throttle-rate', type=float, default=MockServerConfig.throttle_rate)
+    parser.add_argument('--server-error-rate', type=float, default=MockServerConfig.server_error_rate)
+    parser.add_argument('--retry-after', type=float, default=MockServerConfig.retry_after)
+    parser.add_argument('--rate-limit', type=float, default=MockServerConfig.rate_limit)
+    parser.add_argument('--page-cache', type=int, default=MockServerConfig.page_cache)
+    args = parser.parse_args()
+
+    config = MockServerConfig(employees=args.employees, legals=args.legals, page_size=args.page_size, seed=args.seed,
+                              latency=args.latency, latency_jitter=args.latency_jitter, token_ttl=args.token_ttl,
+                              unauthorized_rate=args.unauthorized_rate, throttle_rate=args.throttle_rate,
+                              server_error_rate=args.server_error_rate, retry_after=args.retry_after,
+                              rate_limit=args.rate_limit, page_cache=args.page_cache)
+    server = MockInsperityServer(config, host=args.host, port=args.port)
+
+    print(f"Mock Insperity REST API with {config.employees} employees at: {server.base_url}")
+    print(f"\tset INSPERITY_BASE_URL={server.base_url}")
+
+    try:
+        server._http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._http_server.server_close()
+
+
+if __name__ == '__main__':
+    main()
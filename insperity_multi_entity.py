@@ -0,0 +1,182 @@
+"""
+Get the employees of several clients/legals at once
+
+An Entity is a client code plus a legal name substring. get_multi_entity_employees bootstraps the credentials and
+gets the employee list of every entity in parallel (each entity's list is requested as soon as its credentials are
+ready), so the run takes about as long as the slowest entity instead of the sum of all of them:
+
+    entities = [Entity(os.getenv('LEGAL_ID_VES'), name="Vegas"),
+                Entity(os.getenv('LEGAL_ID_NPT'), legal_name_substring="Newport")]
+    result = get_multi_entity_employees(entities, employee_status_filter="Active")
+    print(result.headcount())                       # {'Vegas': 120, 'Newport': 45}
+    for entity_name, employee in result.employees():
+        print(entity_name, employee.first_name, employee.last_name)
+
+The result is tagged with the entity name -- result.to_table() returns one EmployeeTable with an entity column (e.g.
+to evaluate the benefits eligibility rules for all of the entities at once). An error getting one entity doesn't stop
+the others, it is saved in result.errors.
+
+The employee list endpoint returns the employees of every legal of a client, so each entity keeps only the employees
+with its legal's legal code -- two entities with the same client code and different legals don't share employees.
+The results and errors are keyed by the entity labels, so the labels must be unique (give entities with the same
+client code and legal name substring different names).
+
+Len Wanger
+2025
+"""
+
+import asyncio
+from collections import Counter
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from insperity_rest_api import (filter_legal_employees, find_legal_code, get_credentials_and_legals,
+                                get_employee_list_raw)
+from insperity_rest_async import AsyncInsperityClient
+from insperity_rest_types import Employee, LazyEmployee
+from insperity_rest_utils import fill_employee_record
+
+
+@dataclass(frozen=True)
+class Entity:
+    client_code: str
+    legal_name_substring: str|None = None
+    name: str|None = None  # label for the entity's results (defaults to the legal name substring or client code)
+
+    @property
+    def label(self) -> str:
+        return self.name or self.legal_name_substring or self.client_code
+
+
+@dataclass
+class EntityEmployees:
+    entity: Entity
+    client_id: str
+    legal_id: str
+    legal_code: str
+    raw_employees: list[dict]
+
+
+@dataclass
+class MultiEntityResult:
+    results: list[EntityEmployees] = field(default_factory=list)
+    errors: dict[str, Exception] = field(default_factory=dict)  # entity label -> error
+
+    def employees(self, lazy: bool=False) -> list[tuple[str, Employee|LazyEmployee]]:
+        # return the merged list of (entity label, employee) for all of the entities
+        make_record = LazyEmployee if lazy else fill_employee_record
+        return [(entity_result.entity.label, make_record(raw_employee)) for entity_result in self.results
+                for raw_employee in entity_result.raw_employees]
+
+    def headcount(self, employment_status: str|None=None) -> dict[str, int]:
+        # return the number of employees per entity (only employees with employment_status if it is not None)
+        counts = Counter()
+
+        for entity_result in self.results:
+            counts[entity_result.entity.label] += sum(
+                1 for raw_employee in entity_result.raw_employees
+                if (employment_status is None) or (raw_employee.get('employmentStatus') == employment_status))
+
+        return dict(counts)
+
+    def to_table(self):
+        # return an EmployeeTable of all of the entities' employees, with an 'entity' column (requires numpy)
+        import numpy as np
+        from insperity_employee_table import EmployeeTable
+
+        table = EmployeeTable.from_raw(raw_employee for entity_result in self.results
+                                       for raw_employee in entity_result.raw_employees)
+        table.columns['entity'] = np.array([entity_result.entity.label for entity_result in self.results
+                                            for _ in entity_result.raw_employees], dtype=str)
+        return table
+
+
+def _check_labels(entities: list[Entity]):
+    # the results are keyed by entity label -- raise ValueError if two entities have the same label
+    duplicate_labels = [label for label, count in Counter(entity.label for entity in entities).items() if count > 1]
+
+    if duplicate_labels:
+        raise ValueError(f"Duplicate entity labels: {', '.join(duplicate_labels)} (give the entities unique names)")
+
+
+def _check_legal_id(entity: Entity, legal_id: str|None):
+    if legal_id is None:
+        raise ValueError(f"No legal matching '{entity.legal_name_substring}' for entity {entity.label}")
+
+
+def get_multi_entity_employees(entities: Iterable[Entity], employee_status_filter: str|None=None,
+                               max_workers: int=8) -> MultiEntityResult:
+    """
+    Get the credentials and employee lists of several entities in parallel.
+
+    :param entities: Entity objects (client code and legal name substring) -- raises ValueError if two have the
+        same label
+    :param employee_status_filter: employee status filter for all of the entities (e.g. "Active")
+    :param max_workers: maximum number of entities to get at the same time
+    :return: MultiEntityResult
+    """
+    entities = list(entities)
+    _check_labels(entities)
+    result = MultiEntityResult()
+
+    def get_entity(entity: Entity) -> EntityEmployees:
+        token_dict, client_id, legal_id, legal_ids = get_credentials_and_legals(
+            client_code=entity.client_code, legal_name_substring=entity.legal_name_substring)
+        _check_legal_id(entity, legal_id)
+        legal_code = find_legal_code(legal_ids, legal_id)  # from the legals that were just read
+        raw_employees = get_employee_list_raw(token_dict=token_dict, client_id=client_id, legal_id=legal_id,
+                                              employee_status_filter=employee_status_filter)
+        return EntityEmployees(entity, client_id, legal_id, legal_code,
+                               list(filter_legal_employees(raw_employees, legal_code)))
+
+    if len(entities) == 0:
+        return result
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(entities))) as executor:
+        futures = [executor.submit(get_entity, entity) for entity in entities]
+
+        for entity, future in zip(entities, futures):
+            try:
+                result.results.append(future.result())
+            except Exception as e:
+                result.errors[entity.label] = e
+
+    return result
+
+
+async def get_multi_entity_employees_async(client: AsyncInsperityClient, entities: Iterable[Entity],
+                                           employee_status_filter: str|None=None) -> MultiEntityResult:
+    """
+    asyncio version of get_multi_entity_employees -- all of the entities are run concurrently on the client (bounded
+    by its max_concurrency).
+
+    :param client: AsyncInsperityClient to use
+    :param entities: Entity objects (client code and legal name substring) -- raises ValueError if two have the
+        same label
+    :param employee_status_filter: employee status filter for all of the entities (e.g. "Active")
+    :return: MultiEntityResult
+    """
+    entities = list(entities)
+    _check_labels(entities)
+    result = MultiEntityResult()
+
+    async def get_entity(entity: Entity) -> EntityEmployees:
+        token_dict, client_id, legal_id, legal_ids = await client.get_credentials_and_legals(
+            client_code=entity.client_code, legal_name_substring=entity.legal_name_substring)
+        _check_legal_id(entity, legal_id)
+        legal_code = find_legal_code(legal_ids, legal_id)  # from the legals that were just read
+        raw_employees = await client.get_employee_list_raw(token_dict, client_id, legal_id,
+                                                           employee_status_filter=employee_status_filter)
+        return EntityEmployees(entity, client_id, legal_id, legal_code,
+                               list(filter_legal_employees(raw_employees, legal_code)))
+
+    entity_results = await asyncio.gather(*[get_entity(entity) for entity in entities], return_exceptions=True)
+
+    for entity, entity_result in zip(entities, entity_results):
+        if isinstance(entity_result, Exception):
+            result.errors[entity.label] = entity_result
+        else:
+            result.results.append(entity_result)
+
+    return result
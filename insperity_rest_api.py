@@ -18,6 +18,39 @@ Then can use these to call API endpoints:
     response = get_employee_list(token_dict, client_id, legal_id)
     print(f"number of employees returned: {len(response)}")
 
+For large lists, the iter_ versions of the list functions (e.g. iter_employees) yield records one page at a time
+instead of building the whole list in memory:
+
+    for employee in iter_employees(token_dict, client_id, legal_id):
+        print(employee.email)
+
+The employee list endpoints return the employees of every legal of the client (legal_id is not used). To get the
+employees of one legal, filter on the legal code:
+
+    legal_code = get_legal_code(token_dict, legal_id)
+    for raw_employee in filter_legal_employees(iter_employees_raw(token_dict, client_id, legal_id), legal_code):
+        ...
+
+get_client_credential_token (and so get_credentials) returns a TokenManager, which is used like the token
+dictionary, but refreshes the access token shortly before it expires. Every call, including each page of a
+multipage response, uses the current access token and refreshes it (once, shared by all threads) on a 401.
+
+All of the calls go through a shared InsperityClient (see insperity_rest_client.py), which keeps a pool of
+keep-alive connections open. To change the pool size, timeouts, or compression use set_default_client:
+
+    set_default_client(InsperityClient(pool_maxsize=32, timeout=(5.0, 120.0)))
+
+The client can also have a ResponseCache (see insperity_rest_response_cache.py), so repeating the same employee
+list or employee by id query within a few minutes doesn't call the REST API again:
+
+    set_default_client(InsperityClient(response_cache=ResponseCache()))
+    get_default_client().response_cache.invalidate()  # clear the cache, e.g. after a change to an employee
+
+Every HTTP call, multipage call, retry and token refresh is recorded in the client's metrics (see
+insperity_rest_metrics.py), which can be exported in the Prometheus text format or sent to a tracing system:
+
+    print(get_default_client().metrics.to_prometheus())
+
 TODO:
     more endpoints:
         - check details
@@ -47,15 +80,28 @@ Len Wanger
 2025
 """
 
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 import json
 from functools import wraps
+from itertools import islice
+import os
 
 import requests
 
+from insperity_rest_client import InsperityClient, get_default_client, set_default_client
+from insperity_rest_coalesce import request_key
+from insperity_rest_credential_cache import CredentialCache, get_default_credential_cache
+from insperity_rest_metrics import InsperityMetrics
+from insperity_rest_response_cache import (ResponseCache, EMPLOYEES_ENDPOINT, EMPLOYEES_MIN_ENDPOINT,
+                                           EMPLOYEE_BY_ID_ENDPOINT)
+from insperity_rest_token import TokenManager, get_expires_at, refresh_token_dict
 from insperity_rest_utils import *
 
 
-BASE_URL = "https://insperity.myisolved.com/rest/api"
+DEFAULT_BASE_URL = "https://insperity.myisolved.com/rest/api"
+BASE_URL = os.getenv('INSPERITY_BASE_URL', DEFAULT_BASE_URL)  # e.g. the url of an insperity_mock_server for testing
 GET_TOKEN = f"{BASE_URL}/token"  # POST
 CLIENTS = f"{BASE_URL}/clients"
 LEGALS = f"{BASE_URL}/legals"
@@ -69,11 +115,28 @@ EMPLOYEE_PAYROLL = "{base_url}/clients/{client_id}/legals/{legal_id}/employees/{
 
 EMPLOYEE_BY_ID = "{base_url}/clients/{client_id}/legals/{legal_id}/employees/{employee_id}"
 
+DEFAULT_PREFETCH_PAGES = 2  # number of pages fetched ahead of the consumer when building employee lists
+DEFAULT_PAGE_WORKERS = 8  # max number of pages requested at the same time when getting employee lists
+
+
+def set_base_url(base_url: str|None):
+    # change the url of the REST API (None for the default url) -- e.g. to point the endpoint functions at a
+    #   MockInsperityServer
+    global BASE_URL, GET_TOKEN, CLIENTS, LEGALS
+
+    BASE_URL = base_url.rstrip('/') if base_url is not None else DEFAULT_BASE_URL
+    GET_TOKEN = f"{BASE_URL}/token"
+    CLIENTS = f"{BASE_URL}/clients"
+    LEGALS = f"{BASE_URL}/legals"
+
 
 ##############################################################################################################
 # Refresh token decorator -- used to wrap endpoint functions that call the REST API. Will call to refresh the
 #   refresh token if access token expires, otherwise will just return the response from the endpoint function
 #   or raise an exception if the status code is not 200.
+#
+#   If token_dict is a TokenManager the access token is refreshed before the call if it is about to expire. The
+#   refresh is single-flight, so concurrent calls that get a 401 only refresh the token once.
 ##############################################################################################################
 def refresh_token(f):
    @wraps(f)
@@ -81,14 +144,13 @@ def refresh_token(f):
        retries = 0
 
        while True:
+           access_token = get_access_token(token_dict)
            response = f(token_dict, *args, **kwds)
 
            if response.status_code == 200:
                break
            elif (retries < 1) and (response.status_code == 401):  # get refresh token and try again
-               new_token_dict = get_refresh_token(token_dict=token_dict)
-               token_dict['refresh_token'] = new_token_dict['refresh_token']
-               token_dict['access_token'] = new_token_dict['access_token']
+               refresh_access_token(token_dict, stale_access_token=access_token)
                retries += 1
            else:
                raise requests.exceptions.HTTPError(
@@ -100,15 +162,41 @@ def refresh_token(f):
    return wrapper
 
 
+def _get_new_token_dict(token_dict: dict, metrics: InsperityMetrics|None=None) -> dict:
+    # get a new token dictionary using the refresh token. If the refresh token is no longer valid, get a new
+    #   token using the client credentials instead. The refresh is recorded in metrics (defaults to the default
+    #   client's metrics).
+    (metrics if metrics is not None else get_default_client().metrics).record_token_refresh()
+
+    try:
+        return get_refresh_token(token_dict=token_dict)
+    except requests.exceptions.HTTPError:
+        return get_client_credential_token(client_code=token_dict['client_code'])
+
+
+def get_access_token(token_dict: dict) -> str:
+    # return the access token to use for a call, refreshing it first if it is about to expire
+    if isinstance(token_dict, TokenManager):
+        return token_dict.get_access_token()
+
+    return token_dict['access_token']
+
+
+def refresh_access_token(token_dict: dict, stale_access_token: str|None=None) -> str:
+    # refresh the access token in token_dict (single-flight, see insperity_rest_token.refresh_token_dict) and return it
+    return refresh_token_dict(token_dict, stale_access_token, _get_new_token_dict)
+
+
 ##############################################################################################################
 # REST API endpoint functions
 ##############################################################################################################
-def get_client_credential_token(client_code: str) -> dict:
+def get_client_credential_token(client_code: str) -> TokenManager:
     """
     Get access token using client_credentials grant type.
 
     :param client_code: Insperity customer/client code
-    :return: dictionary containing access_token and refresh_token
+    :return: TokenManager (dictionary containing access_token and refresh_token) that refreshes the access token
+        before it expires
     """
     combined_key = get_combined_key()
 
@@ -122,19 +210,22 @@ def get_client_credential_token(client_code: str) -> dict:
         "clientCode": client_code,
     }
 
-    response = requests.post(GET_TOKEN, headers=headers, data=payload)
+    response = get_default_client().post(GET_TOKEN, headers=headers, data=payload)
 
     if response.status_code != 200:
         raise requests.exceptions.HTTPError(f"Error getting client information (status={response.status_code}): {response.text}")
 
     response_dict = json.loads(response.content)
 
-    return {
+    token_dict = {
         'access_token': response_dict['access_token'], 
         'refresh_token': response_dict['refresh_token'],
-        'client_code': client_code
+        'client_code': client_code,
+        'expires_at': get_expires_at(response_dict),
     }
 
+    return TokenManager(token_dict, refresh_function=_get_new_token_dict)
+
 
 def get_refresh_token(token_dict: dict) -> dict:
     """
@@ -156,7 +247,7 @@ def get_refresh_token(token_dict: dict) -> dict:
         "clientCode": token_dict['client_code']
     }
 
-    response = requests.post(GET_TOKEN, headers=headers, data=payload)
+    response = get_default_client().post(GET_TOKEN, headers=headers, data=payload)
 
     if response.status_code != 200:
         raise requests.exceptions.HTTPError(
@@ -167,7 +258,8 @@ def get_refresh_token(token_dict: dict) -> dict:
     return {
         'access_token': response_dict['access_token'], 
         'refresh_token': response_dict['refresh_token'],
-        'client_code': token_dict['client_code']
+        'client_code': token_dict['client_code'],
+        'expires_at': get_expires_at(response_dict),
     }
 
 
@@ -183,7 +275,7 @@ def get_client_info(token_dict: dict, client_code_filter: str|None=None, search_
     if search_text is not None:
         params['searchText'] = search_text
 
-    response = requests.get(CLIENTS, headers=headers, params=params)
+    response = get_default_client().get(CLIENTS, headers=headers, params=params)
     return response
 
 
@@ -191,43 +283,61 @@ def get_client_info(token_dict: dict, client_code_filter: str|None=None, search_
 def get_client_id(token_dict: dict) -> str:
     # test getting client information
     headers = get_headers(token_dict['access_token'])
-    response = requests.get(CLIENTS, headers=headers)
+    response = get_default_client().get(CLIENTS, headers=headers)
     return response
 
 
 def get_legals(token_dict: dict) -> dict:
     # test getting client information
     headers = get_headers(token_dict['access_token'])
-    response = requests.get(LEGALS, headers=headers)
-
-    if response.status_code != 200:
-        raise requests.exceptions.HTTPError(f"Error getting client information (status={response.status_code}): {response.text}")
-
-    response_dict = json.loads(response.content)
+    response_dict = process_response(LEGALS, headers, {}, token_dict=token_dict)
     return response_dict['results']
 
 
 def get_client_and_legal_ids(token_dict: dict) -> tuple[str, dict]:
     # test getting client information
     headers = get_headers(token_dict['access_token'])
-    response = requests.get(CLIENTS, headers=headers)
 
-    if response.status_code != 200:
-        raise requests.exceptions.HTTPError(f"Error getting client information (status={response.status_code}): {response.text}")
-
-    response_dict = json.loads(response.content)
+    response_dict = process_response(CLIENTS, headers, {}, token_dict=token_dict)
     client_id = response_dict['results'][0]['id']
 
-    response = requests.get(LEGALS, headers=headers)
-
-    if response.status_code != 200:
-        raise requests.exceptions.HTTPError(f"Error getting client information (status={response.status_code}): {response.text}")
-
-    response_dict = json.loads(response.content)
+    response_dict = process_response(LEGALS, headers, {}, token_dict=token_dict)
     legal_ids = response_dict['results']
     return client_id, legal_ids
 
 
+def get_legal_code(token_dict: dict, legal_id: str) -> str:
+    """
+    Get the legal code of a legal -- the legalCode field of its employee records. The employee list endpoints
+    (/clients/{client_id}/employees) return the employees of every legal of the client, so the legal code is needed
+    to pick out the employees of one legal (see filter_legal_employees).
+
+    :param token_dict:
+    :param legal_id:
+    :return: legal code
+    """
+    return find_legal_code(get_legals(token_dict), legal_id)
+
+
+def find_legal_code(legal_ids: list[dict], legal_id: str) -> str:
+    # return the legal code of a legal from the list of legals (e.g. from get_credentials_and_legals) -- raises
+    #   ValueError if the legal isn't in the list or has no legal code
+    for legal in legal_ids:
+        if str(legal['id']) == str(legal_id):
+            if not legal.get('legalCode'):
+                raise ValueError(f"legal {legal_id} has no legal code")
+            return legal['legalCode']
+
+    raise ValueError(f"unknown legal id: {legal_id}")
+
+
+def filter_legal_employees(raw_employees: Iterable[dict], legal_code: str) -> Iterator[dict]:
+    # yield the raw employee records that belong to the legal with the legal code
+    for raw_employee in raw_employees:
+        if raw_employee.get('legalCode') == legal_code:
+            yield raw_employee
+
+
 def get_legal_id(legal_ids: dict, legal_name_substring: str|None) -> tuple[str, dict]:
     # return the first legal id that matches the name substring
     if (len(legal_ids)==1) or (legal_name_substring is None):
@@ -240,26 +350,106 @@ def get_legal_id(legal_ids: dict, legal_name_substring: str|None) -> tuple[str,
     return None
 
 
-def get_credentials(client_code: str, legal_name_substring: str|None = None):
+def get_credentials(client_code: str, legal_name_substring: str|None = None,
+                    credential_cache: CredentialCache|None = None):
     """
     Get access token, client ID, and legal ID -- this is the simplest way to get started
     Calling the REST API endpoints, assuming you only will be using the same legal_id (company)
     for all calls
 
+    If a credential cache is used, the token, client ID and legal IDs saved by an earlier run are reused, so a warm
+    start makes no calls to the REST API. The cache is updated whenever the token is refreshed.
+
     :param client_code:
     :param legal_name_substring:
+    :param credential_cache: CredentialCache to use. If None, the cache named by the INSPERITY_CREDENTIAL_CACHE
+        environment variable is used (no cache if it is not set).
     :return: tuple of three values: token dictionary, client ID, legal ID
     """
-    token_dict = get_client_credential_token(client_code=client_code)
-    client_id, legal_ids = get_client_and_legal_ids(token_dict=token_dict)
+    token_dict, client_id, legal_id, _ = get_credentials_and_legals(client_code, legal_name_substring,
+                                                                    credential_cache)
+    return token_dict, client_id, legal_id
+
+
+def get_credentials_and_legals(client_code: str, legal_name_substring: str|None = None,
+                               credential_cache: CredentialCache|None = None) -> tuple[dict, str, str, list[dict]]:
+    """
+    Same as get_credentials, but also return the list of legals that the legal id was picked from -- e.g. to get
+    the legal code with find_legal_code without requesting the legals again.
+
+    :return: tuple of four values: token dictionary, client ID, legal ID, list of legals
+    """
+    if credential_cache is None:
+        credential_cache = get_default_credential_cache()
+
+    if credential_cache is None:
+        token_dict = get_client_credential_token(client_code=client_code)
+        client_id, legal_ids = get_client_and_legal_ids(token_dict=token_dict)
+    else:
+        token_dict, client_id, legal_ids = _get_cached_credentials(client_code, credential_cache)
+
     legal_id = get_legal_id(legal_ids=legal_ids, legal_name_substring=legal_name_substring)
 
-    return token_dict, client_id, legal_id
+    return token_dict, client_id, legal_id, legal_ids
+
+
+def _get_cached_credentials(client_code: str, credential_cache: CredentialCache) -> tuple[TokenManager, str, list[dict]]:
+    # get the token dictionary, client ID and legal IDs from the credential cache, calling the REST API only for
+    #   the values that aren't cached. If the cached access token has expired, it is refreshed on first use.
+    base_url = BASE_URL  # save refreshed tokens under the host they came from, even if set_base_url is called later
+    entry = credential_cache.load(base_url, client_code)
+
+    if entry is not None:
+        token_dict = TokenManager(entry['token_dict'], refresh_function=_get_new_token_dict)
+    else:
+        token_dict = get_client_credential_token(client_code=client_code)
+
+    token_dict.on_refresh = lambda refreshed_token_dict: credential_cache.save(base_url, client_code,
+                                                                               refreshed_token_dict)
+
+    if (entry is not None) and (entry['client_id'] is not None):
+        return token_dict, entry['client_id'], entry['legal_ids']
+
+    client_id, legal_ids = get_client_and_legal_ids(token_dict=token_dict)
+    credential_cache.save(base_url, client_code, token_dict, client_id, legal_ids)
+    return token_dict, client_id, legal_ids
+
 
+def _coalesce(key: tuple, function):
+    # call function, sharing the call with identical requests already in flight (see SingleFlight)
+    single_flight = get_default_client().single_flight
 
-def process_response(url: str, headers: dict, params: dict) -> list[dict]:
-    # process a simple (not multipage) response from the REST API endpoint
-    response = requests.get(url, headers=headers, params=params)
+    if single_flight is None:
+        return function()
+
+    return single_flight.do(key, function)
+
+
+def process_response(url: str, headers: dict, params: dict, token_dict: dict|None=None) -> list[dict]:
+    # process a simple (not multipage) response from the REST API endpoint. If token_dict is given, the access
+    #   token from it is used for the call (refreshed first if about to expire), and if the call gets a 401 the
+    #   token is refreshed and the call is retried once. Identical requests in flight at the same time share the
+    #   call.
+    return _coalesce(request_key('page', url, params, headers, token_dict),
+                     lambda: _process_response(url, headers, params, token_dict))
+
+
+def _process_response(url: str, headers: dict, params: dict, token_dict: dict|None=None) -> list[dict]:
+    retries = 0
+
+    while True:
+        if token_dict is not None:
+            access_token = get_access_token(token_dict)
+            headers = {**headers, 'Authorization': f"Bearer {access_token}"}
+
+        response = get_default_client().get(url, headers=headers, params=params)
+
+        if (token_dict is not None) and (retries < 1) and (response.status_code == 401):
+            get_default_client().metrics.record_retry(url, response.status_code)
+            refresh_access_token(token_dict, stale_access_token=access_token)
+            retries += 1
+        else:
+            break
 
     if response.status_code != 200:
         raise requests.exceptions.HTTPError(
@@ -268,26 +458,117 @@ def process_response(url: str, headers: dict, params: dict) -> list[dict]:
     return json.loads(response.content)
 
 
-def process_multipage_response(url: str, headers: dict, params: dict) -> list[dict]:
-    # process a multipage response from the REST API endpoint
-    response_list = []
+def _iter_pages_in_parallel(page_urls: list[str], headers: dict, params: dict, max_workers: int,
+                            token_dict: dict|None=None) -> Iterator[dict]:
+    # request the pages using up to max_workers threads and yield the decoded responses in page order. At most
+    #   max_workers pages are requested ahead of the consumer.
+    page_url_iter = iter(page_urls)
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="insperity_page")
+    futures = deque(executor.submit(process_response, page_url, headers, params, token_dict)
+                    for page_url in islice(page_url_iter, max_workers))
+
+    try:
+        while futures:
+            response_dict = futures.popleft().result()
+            page_url = next(page_url_iter, None)
+
+            if page_url is not None:
+                futures.append(executor.submit(process_response, page_url, headers, params, token_dict))
+
+            yield response_dict
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_multipage_response(url: str, headers: dict, params: dict, prefetch: int=0, max_workers: int=1,
+                            token_dict: dict|None=None) -> Iterator[list[dict]]:
+    # yield the results of a multipage response from the REST API endpoint one page at a time. With prefetch=0
+    #   only the current page is held in memory, and the next page is not requested until the consumer asks for it.
+    #   With prefetch > 0 a background thread fetches (and decodes) up to prefetch pages ahead of the consumer, so
+    #   the next page is on its way while the consumer is building records from the current one.
+    #
+    #   With max_workers > 1, if the first page says how many pages there are, the remaining pages are requested
+    #   concurrently (up to max_workers at a time) and yielded in order. If the paging scheme can't be worked out
+    #   the pages are read one at a time by following nextPageUrl.
+    #
+    #   If token_dict is given, each page request uses (and if needed refreshes) its access token, so the token
+    #   expiring part way through doesn't stop the pagination (see process_response).
+    if prefetch > 0:
+        yield from iter_in_background(iter_multipage_response(url, headers, params, max_workers=max_workers,
+                                                              token_dict=token_dict),
+                                      buffer_size=prefetch)
+        return
+
+    with get_default_client().metrics.track_call(url) as span:
+        response_dict = process_response(url, headers, params, token_dict=token_dict)
+        span.attributes['pages'] += 1
+        yield response_dict['results']
+
+        if (max_workers > 1) and (response_dict['nextPageUrl'] is not None):
+            page_urls = get_remaining_page_urls(response_dict)
+
+            if page_urls is not None:
+                for response_dict in _iter_pages_in_parallel(page_urls, headers, params, max_workers, token_dict):
+                    span.attributes['pages'] += 1
+                    yield response_dict['results']
+
+        # follow nextPageUrl for the rest of the pages (all of them if they weren't fetched in parallel, or any pages
+        #   added since the first page was read if they were)
+        while response_dict['nextPageUrl'] is not None:
+            url = response_dict['nextPageUrl']
+            response_dict = process_response(url, headers, params, token_dict=token_dict)
+            span.attributes['pages'] += 1
+            yield response_dict['results']
+
+
+def process_multipage_response(url: str, headers: dict, params: dict, max_workers: int=1,
+                               token_dict: dict|None=None) -> list[dict]:
+    # process a multipage response from the REST API endpoint. Identical requests in flight at the same time share
+    #   the pagination.
+    def get_all_pages() -> list[dict]:
+        response_list = []
+
+        for page_results in iter_multipage_response(url, headers, params, max_workers=max_workers,
+                                                    token_dict=token_dict):
+            response_list += page_results
+
+        return response_list
+
+    return _coalesce(request_key('multipage', url, params, headers, token_dict), get_all_pages)
+
+
+def _minimal_employee_list_request(token_dict: dict, client_id: str, legal_id: str,
+                                   employee_status_filter: str|None=None) -> tuple[str, dict, dict]:
+    # return the url, headers and params used to get the minimal employee list
+    headers = get_headers(token_dict['access_token'])
+    params = {}
 
-    while True:
-        response = requests.get(url, headers=headers, params=params)
+    url = EMPLOYEES_MIN.format(base_url=BASE_URL, client_id=client_id, legal_id=legal_id)
 
-        if response.status_code != 200:
-            raise requests.exceptions.HTTPError(
-                f"Error getting data from REST api (status={response.status_code}): {response.text}")
+    if employee_status_filter is not None:
+        params['employeeStatusFilter'] = employee_status_filter
 
-        response_dict = json.loads(response.content)
-        response_list += response_dict['results']
+    return url, headers, params
 
-        if response_dict['nextPageUrl'] is None:
-            break
 
-        url = response_dict['nextPageUrl']
+def _employee_list_request(token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None,
+                           search_text: str|None = None, with_ssn: bool=False) -> tuple[str, dict, dict]:
+    # return the url, headers and params used to get the employee list
+    headers = get_headers(token_dict['access_token'])
+    params = {}
 
-    return response_list
+    if with_ssn is True:
+        url = EMPLOYEES_W_SSN.format(base_url=BASE_URL, client_id=client_id, legal_id=legal_id)
+    else:
+        url = EMPLOYEES.format(base_url=BASE_URL, client_id=client_id, legal_id=legal_id)
+
+    if employee_status_filter is not None:
+        params['employeeStatusFilter'] = employee_status_filter
+
+    if search_text is not None:
+        params['searchText'] = search_text
+
+    return url, headers, params
 
 
 def get_minimal_employee_list_raw(token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None) -> list[dict]:
@@ -300,18 +581,20 @@ def get_minimal_employee_list_raw(token_dict: dict, client_id: str, legal_id: st
     :param employee_status_filter:
     :return: return a list of dicts of employee information with minimal employee info
     """
-    headers = get_headers(token_dict['access_token'])
-    params = {}
-
-    url = EMPLOYEES_MIN.format(base_url=BASE_URL, client_id=client_id, legal_id=legal_id)
+    url, headers, params = _minimal_employee_list_request(token_dict, client_id, legal_id, employee_status_filter)
+    fetch_function = lambda: process_multipage_response(url, headers, params, max_workers=DEFAULT_PAGE_WORKERS,
+                                                        token_dict=token_dict)
 
-    if employee_status_filter is not None:
-        params['employeeStatusFilter'] = employee_status_filter
+    response_cache = get_default_client().response_cache
+    if response_cache is None:
+        return fetch_function()
 
-    return process_multipage_response(url, headers, params)
+    key = (client_id, legal_id, employee_status_filter)
+    return response_cache.get_or_fetch(EMPLOYEES_MIN_ENDPOINT, key, fetch_function)
 
 
-def get_minimal_employee_list(token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None) -> list[MinimalEmployee]:
+def get_minimal_employee_list(token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None,
+                              lazy: bool=False) -> list[MinimalEmployee]|list[LazyMinimalEmployee]:
     """
     get a list of minimal employee records. Each item in the list is an MinimalEmployee object.
 
@@ -319,12 +602,61 @@ def get_minimal_employee_list(token_dict: dict, client_id: str, legal_id: str, e
     :param client_id:
     :param legal_id:
     :param employee_status_filter:
+    :param lazy: if True, return LazyMinimalEmployee objects (fields are converted when they are read)
     :return:
     """
-    raw_list = get_minimal_employee_list_raw(token_dict, client_id, legal_id, employee_status_filter)
+    if get_default_client().response_cache is not None:  # build the records from the cached raw list
+        raw_list = get_minimal_employee_list_raw(token_dict, client_id, legal_id, employee_status_filter)
+        make_record = LazyMinimalEmployee if lazy else fill_minimal_employee_record
+        return [make_record(raw_employee) for raw_employee in raw_list]
+
+    # the next pages are fetched in the background while the records for the current page are built
+    return list(iter_minimal_employees(token_dict, client_id, legal_id, employee_status_filter,
+                                       prefetch=DEFAULT_PREFETCH_PAGES, max_workers=DEFAULT_PAGE_WORKERS, lazy=lazy))
+
+
+def iter_minimal_employees_raw(token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None,
+                               prefetch: int=0, max_workers: int=1) -> Iterator[dict]:
+    """
+    iterate over the raw minimal employee records, one page at a time. Same as get_minimal_employee_list_raw, but
+    only one page of records is held in memory at a time.
+
+    :param token_dict:
+    :param client_id:
+    :param legal_id:
+    :param employee_status_filter:
+    :param prefetch: number of pages to fetch ahead in a background thread (0 to fetch each page when needed)
+    :param max_workers: max number of pages to request at the same time (1 to request one page at a time)
+    :return: iterator of dicts of minimal employee information
+    """
+    url, headers, params = _minimal_employee_list_request(token_dict, client_id, legal_id, employee_status_filter)
+
+    for page_results in iter_multipage_response(url, headers, params, prefetch=prefetch, max_workers=max_workers,
+                                                token_dict=token_dict):
+        yield from page_results
+
+
+def iter_minimal_employees(token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None,
+                           prefetch: int=0, max_workers: int=1,
+                           lazy: bool=False) -> Iterator[MinimalEmployee]|Iterator[LazyMinimalEmployee]:
+    """
+    iterate over the minimal employee records. Same as get_minimal_employee_list, but yields the MinimalEmployee
+    objects as each page arrives instead of returning a list once all of the pages are read.
+
+    :param token_dict:
+    :param client_id:
+    :param legal_id:
+    :param employee_status_filter:
+    :param prefetch: number of pages to fetch ahead in a background thread (0 to fetch each page when needed)
+    :param max_workers: max number of pages to request at the same time (1 to request one page at a time)
+    :param lazy: if True, yield LazyMinimalEmployee objects (fields are converted when they are read)
+    :return: iterator of MinimalEmployee objects
+    """
+    make_record = LazyMinimalEmployee if lazy else fill_minimal_employee_record
 
-    employee_list = [fill_minimal_employee_record(raw_employee) for raw_employee in raw_list]
-    return employee_list
+    for raw_employee in iter_minimal_employees_raw(token_dict, client_id, legal_id, employee_status_filter, prefetch,
+                                                   max_workers):
+        yield make_record(raw_employee)
 
 
 def get_employee_list_raw(token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None,
@@ -341,25 +673,22 @@ def get_employee_list_raw(token_dict: dict, client_id: str, legal_id: str, emplo
     :return: return a list of dicts of employee information (minimal employee info if minimal=True, full employee info
         if minimal=False)
     """
-    headers = get_headers(token_dict['access_token'])
-    params = {}
+    url, headers, params = _employee_list_request(token_dict, client_id, legal_id, employee_status_filter,
+                                                  search_text, with_ssn)
+    fetch_function = lambda: process_multipage_response(url, headers, params, max_workers=DEFAULT_PAGE_WORKERS,
+                                                        token_dict=token_dict)
 
-    if with_ssn is True:
-        url = EMPLOYEES_W_SSN.format(base_url=BASE_URL, client_id=client_id, legal_id=legal_id)
-    else:
-        url = EMPLOYEES.format(base_url=BASE_URL, client_id=client_id, legal_id=legal_id)
+    response_cache = get_default_client().response_cache
+    if response_cache is None:
+        return fetch_function()
 
-    if employee_status_filter is not None:
-        params['employeeStatusFilter'] = employee_status_filter
-
-    if search_text is not None:
-        params['searchText'] = search_text
-
-    return process_multipage_response(url, headers, params)
+    key = (client_id, legal_id, employee_status_filter, search_text, with_ssn)
+    return response_cache.get_or_fetch(EMPLOYEES_ENDPOINT, key, fetch_function, contains_ssn=with_ssn)
 
 
 def get_employee_list(token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None,
-                      search_text: str|None = None, with_ssn: bool=False) -> list[Employee]:
+                      search_text: str|None = None, with_ssn: bool=False,
+                      lazy: bool=False) -> list[Employee]|list[LazyEmployee]:
     """
     get a list of employee records. Each item in the list is an Employee object.
 
@@ -369,13 +698,71 @@ def get_employee_list(token_dict: dict, client_id: str, legal_id: str, employee_
     :param employee_status_filter:
     :param search_text:
     :param with_ssn:
+    :param lazy: if True, return LazyEmployee objects (fields are converted when they are read)
     :return: list of Employee objects
     """
-    raw_list = get_employee_list_raw(token_dict=token_dict, client_id=client_id, legal_id=legal_id,
-                                     employee_status_filter=employee_status_filter, search_text=search_text, with_ssn=with_ssn)
+    if get_default_client().response_cache is not None:  # build the records from the cached raw list
+        raw_list = get_employee_list_raw(token_dict=token_dict, client_id=client_id, legal_id=legal_id,
+                                         employee_status_filter=employee_status_filter, search_text=search_text,
+                                         with_ssn=with_ssn)
+        make_record = LazyEmployee if lazy else fill_employee_record
+        return [make_record(raw_employee) for raw_employee in raw_list]
+
+    # the next pages are fetched in the background while the records for the current page are built
+    return list(iter_employees(token_dict=token_dict, client_id=client_id, legal_id=legal_id,
+                               employee_status_filter=employee_status_filter, search_text=search_text,
+                               with_ssn=with_ssn, prefetch=DEFAULT_PREFETCH_PAGES, max_workers=DEFAULT_PAGE_WORKERS,
+                               lazy=lazy))
+
+
+def iter_employees_raw(token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None,
+                       search_text: str|None = None, with_ssn: bool=False, prefetch: int=0,
+                       max_workers: int=1) -> Iterator[dict]:
+    """
+    iterate over the raw employee records, one page at a time. Same as get_employee_list_raw, but only one page of
+    records is held in memory at a time.
 
-    employee_list = [fill_employee_record(raw_employee) for raw_employee in raw_list]
-    return employee_list
+    :param token_dict:
+    :param client_id:
+    :param legal_id:
+    :param employee_status_filter:
+    :param search_text:
+    :param with_ssn:
+    :param prefetch: number of pages to fetch ahead in a background thread (0 to fetch each page when needed)
+    :param max_workers: max number of pages to request at the same time (1 to request one page at a time)
+    :return: iterator of dicts of employee information
+    """
+    url, headers, params = _employee_list_request(token_dict, client_id, legal_id, employee_status_filter,
+                                                  search_text, with_ssn)
+
+    for page_results in iter_multipage_response(url, headers, params, prefetch=prefetch, max_workers=max_workers,
+                                                token_dict=token_dict):
+        yield from page_results
+
+
+def iter_employees(token_dict: dict, client_id: str, legal_id: str, employee_status_filter: str|None=None,
+                   search_text: str|None = None, with_ssn: bool=False, prefetch: int=0,
+                   max_workers: int=1, lazy: bool=False) -> Iterator[Employee]|Iterator[LazyEmployee]:
+    """
+    iterate over the employee records. Same as get_employee_list, but yields the Employee objects as each page
+    arrives instead of returning a list once all of the pages are read.
+
+    :param token_dict:
+    :param client_id:
+    :param legal_id:
+    :param employee_status_filter:
+    :param search_text:
+    :param with_ssn:
+    :param prefetch: number of pages to fetch ahead in a background thread (0 to fetch each page when needed)
+    :param max_workers: max number of pages to request at the same time (1 to request one page at a time)
+    :param lazy: if True, yield LazyEmployee objects (fields are converted when they are read)
+    :return: iterator of Employee objects
+    """
+    make_record = LazyEmployee if lazy else fill_employee_record
+
+    for raw_employee in iter_employees_raw(token_dict, client_id, legal_id, employee_status_filter, search_text,
+                                           with_ssn, prefetch, max_workers):
+        yield make_record(raw_employee)
 
 ####
 # Experimental end points
@@ -402,17 +789,15 @@ def get_employee_timecard_data_raw(token_dict: dict, client_id: str, legal_id: s
 
     url = EMPLOYEE_TIMECARD_DATA.format(base_url=BASE_URL, client_id=client_id, legal_id=legal_id, employee_id=employee_id)
 
-    print(f"{url=}")  # DEBUG
-
     if start_date is not None:
         start_date_str = start_date.isoformat()
         params['startDate'] = start_date_str
 
     if end_date is not None:
         end_date_str = end_date.isoformat()
-        params['startDate'] = end_date_str
+        params['endDate'] = end_date_str
 
-    return process_multipage_response(url, headers, params)
+    return process_multipage_response(url, headers, params, token_dict=token_dict)
 
 
 def get_employee_checks_raw(token_dict: dict, client_id: str, legal_id: str, employee_id: str,
@@ -434,15 +819,13 @@ def get_employee_checks_raw(token_dict: dict, client_id: str, legal_id: str, emp
 
     url = EMPLOYEE_CHECKS.format(base_url=BASE_URL, client_id=client_id, legal_id=legal_id, employee_id=employee_id)
 
-    print(f"{url=}")  # DEBUG
-
     if year_filter is not None:
         params['yearFilter'] = year_filter
 
     if include_details is not None:
         params['includeDetails'] = include_details
 
-    return process_multipage_response(url, headers, params)
+    return process_multipage_response(url, headers, params, token_dict=token_dict)
 
 
 
@@ -463,6 +846,10 @@ def get_employee_by_id(token_dict: dict, client_id: str, legal_id: str, employee
     params = {}
 
     url = EMPLOYEE_BY_ID.format(base_url=BASE_URL, client_id=client_id, legal_id=legal_id, employee_id=employee_id)
+    fetch_function = lambda: process_response(url, headers, params, token_dict=token_dict)
+
+    response_cache = get_default_client().response_cache
+    if response_cache is None:
+        return fetch_function()
 
-    print(f"{url=}")  # DEBUG
-    return process_response(url, headers, params)
+    return response_cache.get_or_fetch(EMPLOYEE_BY_ID_ENDPOINT, (client_id, legal_id, employee_id), fetch_function)
@@ -0,0 +1,471 @@
+"""
+asyncio versions of the Insperity REST API endpoint functions
+
+AsyncInsperityClient mirrors the module level functions in insperity_rest_api, but runs on a single event loop
+using a pooled httpx.AsyncClient. The number of requests in flight at once is bounded by max_concurrency, so
+hundreds of per-employee calls can be started at the same time without opening hundreds of connections:
+
+    async with AsyncInsperityClient(max_concurrency=16) as client:
+        token_dict, client_id, legal_id = await client.get_credentials(client_code=my_client_code)
+        employee_list = await client.get_minimal_employee_list(token_dict, client_id, legal_id)
+        checks = await asyncio.gather(*[client.get_employee_checks_raw(token_dict, client_id, legal_id, e.id)
+                                        for e in employee_list])
+
+Len Wanger
+2025
+"""
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from functools import partial
+import json
+
+import httpx
+import requests
+
+import insperity_rest_api as rest_api  # the urls are read from the module, so set_base_url applies to them
+from insperity_rest_api import (EMPLOYEE_CHECKS, EMPLOYEE_BY_ID, _employee_list_request, _get_new_token_dict,
+                                _minimal_employee_list_request, find_legal_code, get_legal_id)
+from insperity_rest_client import DEFAULT_POOL_MAXSIZE, DEFAULT_TIMEOUT
+from insperity_rest_coalesce import AsyncSingleFlight, request_key
+from insperity_rest_credential_cache import CredentialCache, get_default_credential_cache
+from insperity_rest_metrics import InsperityMetrics, get_default_metrics, response_size
+from insperity_rest_ratelimit import AdaptiveRateLimiter, RequestThrottle, RetryPolicy
+from insperity_rest_response_cache import (ResponseCache, EMPLOYEES_ENDPOINT, EMPLOYEES_MIN_ENDPOINT,
+                                           EMPLOYEE_BY_ID_ENDPOINT)
+from insperity_rest_token import TokenManager, get_expires_at
+from insperity_rest_utils import *
+
+
+DEFAULT_MAX_CONCURRENCY = 16  # max number of requests in flight at once
+
+
+class AsyncInsperityClient:
+    """
+    asyncio client for the Insperity REST API.
+
+    :param max_concurrency: maximum number of requests in flight at once
+    :param pool_maxsize: maximum number of connections to keep open
+    :param timeout: timeout in seconds -- a single value or a (connect, read) tuple
+    :param compress: if True, ask the server for a gzip/deflate compressed response
+    :param response_cache: ResponseCache used by the employee list endpoints (None for no caching)
+    :param rate_limiter: AdaptiveRateLimiter shared by all requests (defaults to an AdaptiveRateLimiter with the
+        default settings)
+    :param retry_policy: RetryPolicy for failed requests (defaults to RetryPolicy())
+    :param coalesce: if True, identical requests made at the same time share one call
+    :param metrics: InsperityMetrics to record the requests in (defaults to the shared default metrics)
+    """
+    def __init__(self, max_concurrency: int=DEFAULT_MAX_CONCURRENCY, pool_maxsize: int=DEFAULT_POOL_MAXSIZE,
+                 timeout: float|tuple[float, float]|None=DEFAULT_TIMEOUT, compress: bool=True,
+                 response_cache: ResponseCache|None=None, rate_limiter: AdaptiveRateLimiter|None=None,
+                 retry_policy: RetryPolicy|None=None, coalesce: bool=True, metrics: InsperityMetrics|None=None):
+        self.response_cache = response_cache
+        self.metrics = metrics if metrics is not None else get_default_metrics()
+        self.single_flight = AsyncSingleFlight() if coalesce else None
+        self.throttle = RequestThrottle(rate_limiter if rate_limiter is not None else AdaptiveRateLimiter(),
+                                        retry_policy)
+
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+            http_timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        else:
+            http_timeout = httpx.Timeout(timeout)
+
+        headers = {'Accept-Encoding': "gzip, deflate" if compress is True else "identity"}
+        limits = httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+
+        # refresh function for the TokenManagers made by this client (used if a token is refreshed by the sync API
+        #   functions) -- the refreshes are recorded in this client's metrics
+        self._refresh_function = partial(_get_new_token_dict, metrics=self.metrics)
+
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.refresh_locks: dict[str, asyncio.Lock] = {}  # client code -> lock, so each tenant refreshes on its own
+        self.session = httpx.AsyncClient(headers=headers, limits=limits, timeout=http_timeout)
+
+    async def request(self, method: str, url: str, headers: dict|None=None, params: dict|None=None,
+                      data: dict|None=None) -> httpx.Response:
+        # send a request, waiting for a free slot if max_concurrency requests are already in flight. The params are
+        #   merged into the url's query string (like requests does) so the query in a nextPageUrl is kept. Throttled
+        #   responses, transient server errors, connection errors and timeouts are retried (see RequestThrottle).
+        if params:
+            url = httpx.URL(url).copy_merge_params(params)
+
+        attempt = 0
+
+        while True:
+            delay = self.throttle.wait_time()
+            if delay > 0.0:
+                await asyncio.sleep(delay)
+
+            try:
+                async with self.semaphore:
+                    with self.metrics.track_request(method, url, attempt) as span:
+                        response = await self.session.request(method, url, headers=headers, data=data)
+                        span.attributes['status'] = response.status_code
+                        span.attributes['bytes'] = response_size(response.headers, response.content)
+            except httpx.TransportError as e:
+                delay = self.throttle.on_error(attempt)
+                if delay is None:
+                    raise
+                self.metrics.record_retry(url, type(e).__name__)
+            else:
+                delay = self.throttle.on_response(response.status_code, response.headers, attempt)
+                if delay is None:
+                    return response
+                self.metrics.record_retry(url, response.status_code)
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, url: str, headers: dict|None=None, params: dict|None=None) -> httpx.Response:
+        return await self.request("GET", url, headers=headers, params=params)
+
+    async def post(self, url: str, headers: dict|None=None, data: dict|None=None) -> httpx.Response:
+        return await self.request("POST", url, headers=headers, data=data)
+
+    async def close(self):
+        await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    ##########################################################################################################
+    # Credentials
+    ##########################################################################################################
+    async def _get_token(self, payload: dict, client_code: str) -> dict:
+        # call the token endpoint with the given grant type payload
+        headers = {
+            "Authorization": f"Basic {get_combined_key()}",
+            "Content-Type": "application/x-www-form-urlencoded"
+        }
+
+        response = await self.post(rest_api.GET_TOKEN, headers=headers, data=payload)
+
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(
+                f"Error getting client information (status={response.status_code}): {response.text}")
+
+        response_dict = json.loads(response.content)
+
+        token_dict = {
+            'access_token': response_dict['access_token'],
+            'refresh_token': response_dict['refresh_token'],
+            'client_code': client_code,
+            'expires_at': get_expires_at(response_dict),
+        }
+
+        return TokenManager(token_dict, refresh_function=self._refresh_function)
+
+    async def get_client_credential_token(self, client_code: str) -> TokenManager:
+        """
+        Get access token using client_credentials grant type.
+
+        :param client_code: Insperity customer/client code
+        :return: TokenManager (dictionary containing access_token and refresh_token)
+        """
+        payload = {
+            "grant_type": "client_credentials",
+            "clientCode": client_code,
+        }
+        return await self._get_token(payload, client_code)
+
+    async def get_refresh_token(self, token_dict: dict) -> TokenManager:
+        """
+        Get refresh token using refresh_token grant type.
+
+        :param token_dict:
+        :return: dictionary containing access_token and refresh_token
+        """
+        payload = {
+            "grant_type": "refresh_token",
+            "refresh_token": token_dict['refresh_token'],
+            "clientCode": token_dict['client_code']
+        }
+        return await self._get_token(payload, token_dict['client_code'])
+
+    async def refresh_access_token(self, token_dict: dict, stale_access_token: str|None=None) -> str:
+        # refresh the access token in token_dict and return it. Single-flight: tasks waiting on the refresh lock use
+        #   the token refreshed by the first task instead of refreshing it again. The lock is per client code, so a
+        #   slow refresh for one client doesn't hold up the refreshes of the other clients.
+        refresh_lock = self.refresh_locks.setdefault(token_dict['client_code'], asyncio.Lock())
+
+        async with refresh_lock:
+            if (stale_access_token is None) or (token_dict['access_token'] == stale_access_token):
+                try:
+                    new_token_dict = await self.get_refresh_token(token_dict)
+                except requests.exceptions.HTTPError:
+                    new_token_dict = await self.get_client_credential_token(token_dict['client_code'])
+
+                self.metrics.record_token_refresh()
+                token_dict['refresh_token'] = new_token_dict['refresh_token']
+                token_dict['expires_at'] = new_token_dict['expires_at']
+                token_dict['access_token'] = new_token_dict['access_token']
+
+                on_refresh = getattr(token_dict, 'on_refresh', None)
+                if on_refresh is not None:
+                    on_refresh(token_dict)
+
+            return token_dict['access_token']
+
+    async def get_access_token(self, token_dict: dict) -> str:
+        # return the access token to use for a call, refreshing it first if it is about to expire
+        access_token = token_dict['access_token']
+
+        if isinstance(token_dict, TokenManager) and token_dict.expires_soon():
+            access_token = await self.refresh_access_token(token_dict, stale_access_token=access_token)
+
+        return access_token
+
+    async def get_client_and_legal_ids(self, token_dict: dict) -> tuple[str, dict]:
+        # get the client id and the list of legals -- the two calls are made concurrently
+        headers = get_headers(token_dict['access_token'])
+        clients, legal_ids = await asyncio.gather(self.process_response(rest_api.CLIENTS, headers, {}, token_dict),
+                                                  self.process_response(rest_api.LEGALS, headers, {}, token_dict))
+        return clients['results'][0]['id'], legal_ids['results']
+
+    async def get_legal_code(self, token_dict: dict, legal_id: str) -> str:
+        # get the legal code of a legal (see insperity_rest_api.get_legal_code)
+        headers = get_headers(token_dict['access_token'])
+        legals = await self.process_response(rest_api.LEGALS, headers, {}, token_dict)
+        return find_legal_code(legals['results'], legal_id)
+
+    async def get_credentials(self, client_code: str, legal_name_substring: str|None = None,
+                              credential_cache: CredentialCache|None = None):
+        """
+        Get access token, client ID, and legal ID (see insperity_rest_api.get_credentials)
+
+        :param client_code:
+        :param legal_name_substring:
+        :param credential_cache: CredentialCache to use. If None, the cache named by the INSPERITY_CREDENTIAL_CACHE
+            environment variable is used (no cache if it is not set).
+        :return: tuple of three values: token dictionary, client ID, legal ID
+        """
+        token_dict, client_id, legal_id, _ = await self.get_credentials_and_legals(client_code, legal_name_substring,
+                                                                                   credential_cache)
+        return token_dict, client_id, legal_id
+
+    async def get_credentials_and_legals(self, client_code: str, legal_name_substring: str|None = None,
+                                         credential_cache: CredentialCache|None = None):
+        """
+        Same as get_credentials, but also return the list of legals (see insperity_rest_api.get_credentials_and_legals)
+
+        :return: tuple of four values: token dictionary, client ID, legal ID, list of legals
+        """
+        if credential_cache is None:
+            credential_cache = get_default_credential_cache()
+
+        base_url = rest_api.BASE_URL
+        entry = credential_cache.load(base_url, client_code) if credential_cache is not None else None
+
+        if entry is not None:
+            token_dict = TokenManager(entry['token_dict'], refresh_function=self._refresh_function)
+        else:
+            token_dict = await self.get_client_credential_token(client_code=client_code)
+
+        if credential_cache is not None:
+            token_dict.on_refresh = lambda refreshed_token_dict: credential_cache.save(base_url, client_code,
+                                                                                       refreshed_token_dict)
+
+        if (entry is not None) and (entry['client_id'] is not None):
+            client_id, legal_ids = entry['client_id'], entry['legal_ids']
+        else:
+            client_id, legal_ids = await self.get_client_and_legal_ids(token_dict=token_dict)
+
+            if credential_cache is not None:
+                credential_cache.save(base_url, client_code, token_dict, client_id, legal_ids)
+
+        legal_id = get_legal_id(legal_ids=legal_ids, legal_name_substring=legal_name_substring)
+
+        return token_dict, client_id, legal_id, legal_ids
+
+    ##########################################################################################################
+    # Pagination helpers
+    ##########################################################################################################
+    async def _coalesce(self, key: tuple, function: Callable[[], Awaitable]):
+        # await function(), sharing the call with identical requests already in flight (see AsyncSingleFlight)
+        if self.single_flight is None:
+            return await function()
+
+        return await self.single_flight.do(key, function)
+
+    async def process_response(self, url: str, headers: dict, params: dict, token_dict: dict|None=None) -> list[dict]:
+        # process a simple (not multipage) response from the REST API endpoint. If token_dict is given, its access
+        #   token is used (refreshed first if about to expire) and a 401 refreshes the token and retries once.
+        #   Identical requests in flight at the same time share the call.
+        return await self._coalesce(request_key('page', url, params, headers, token_dict),
+                                    lambda: self._process_response(url, headers, params, token_dict))
+
+    async def _process_response(self, url: str, headers: dict, params: dict,
+                                token_dict: dict|None=None) -> list[dict]:
+        retries = 0
+
+        while True:
+            if token_dict is not None:
+                access_token = await self.get_access_token(token_dict)
+                headers = {**headers, 'Authorization': f"Bearer {access_token}"}
+
+            response = await self.get(url, headers=headers, params=params)
+
+            if (token_dict is not None) and (retries < 1) and (response.status_code == 401):
+                self.metrics.record_retry(url, response.status_code)
+                await self.refresh_access_token(token_dict, stale_access_token=access_token)
+                retries += 1
+            else:
+                break
+
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(
+                f"Error getting data from REST api (status={response.status_code}): {response.text}")
+
+        return json.loads(response.content)
+
+    async def iter_multipage_response(self, url: str, headers: dict, params: dict,
+                                      token_dict: dict|None=None) -> AsyncIterator[list[dict]]:
+        # yield the results of a multipage response one page at a time
+        with self.metrics.track_call(url) as span:
+            while True:
+                response_dict = await self.process_response(url, headers, params, token_dict)
+                span.attributes['pages'] += 1
+                yield response_dict['results']
+
+                if response_dict['nextPageUrl'] is None:
+                    break
+
+                url = response_dict['nextPageUrl']
+
+    async def process_multipage_response(self, url: str, headers: dict, params: dict,
+                                         token_dict: dict|None=None) -> list[dict]:
+        # process a multipage response from the REST API endpoint. If the first page says how many pages there are,
+        #   the remaining pages are requested concurrently (bounded by max_concurrency), otherwise nextPageUrl is
+        #   followed one page at a time. Identical requests in flight at the same time share the pagination.
+        return await self._coalesce(request_key('multipage', url, params, headers, token_dict),
+                                    lambda: self._process_multipage_response(url, headers, params, token_dict))
+
+    async def _process_multipage_response(self, url: str, headers: dict, params: dict,
+                                          token_dict: dict|None=None) -> list[dict]:
+        with self.metrics.track_call(url) as span:
+            response_dict = await self.process_response(url, headers, params, token_dict)
+            response_list = list(response_dict['results'])
+            span.attributes['pages'] = 1
+            page_urls = get_remaining_page_urls(response_dict) if response_dict['nextPageUrl'] is not None else None
+
+            if page_urls is not None:
+                page_dicts = await asyncio.gather(*[self.process_response(page_url, headers, params, token_dict)
+                                                    for page_url in page_urls])
+                span.attributes['pages'] += len(page_dicts)
+                for response_dict in page_dicts:
+                    response_list += response_dict['results']
+
+            while response_dict['nextPageUrl'] is not None:
+                response_dict = await self.process_response(response_dict['nextPageUrl'], headers, params,
+                                                            token_dict)
+                span.attributes['pages'] += 1
+                response_list += response_dict['results']
+
+            return response_list
+
+    async def _get_or_fetch(self, endpoint: str, key: tuple, fetch_function: Callable[[], Awaitable],
+                            contains_ssn: bool=False):
+        # return the cached response for the endpoint and key, or await fetch_function and cache the response
+        #   (see ResponseCache.get_or_fetch)
+        if (self.response_cache is None) or (contains_ssn and not self.response_cache.cache_ssn):
+            return await fetch_function()
+
+        hit, value = self.response_cache.get(endpoint, key)
+
+        if not hit:
+            value = await fetch_function()
+            self.response_cache.put(endpoint, key, value)
+            value = self.response_cache.copy(value)  # the cache keeps the fetched value
+
+        return value
+
+    ##########################################################################################################
+    # Endpoints
+    ##########################################################################################################
+    async def get_minimal_employee_list_raw(self, token_dict: dict, client_id: str, legal_id: str,
+                                            employee_status_filter: str|None=None) -> list[dict]:
+        # get a raw list of minimal employee records (see insperity_rest_api.get_minimal_employee_list_raw)
+        url, headers, params = _minimal_employee_list_request(token_dict, client_id, legal_id, employee_status_filter)
+        fetch_function = lambda: self.process_multipage_response(url, headers, params, token_dict)
+        key = (client_id, legal_id, employee_status_filter)
+        return await self._get_or_fetch(EMPLOYEES_MIN_ENDPOINT, key, fetch_function)
+
+    async def get_minimal_employee_list(self, token_dict: dict, client_id: str, legal_id: str,
+                                        employee_status_filter: str|None=None,
+                                        lazy: bool=False) -> list[MinimalEmployee]|list[LazyMinimalEmployee]:
+        # get a list of MinimalEmployee objects (see insperity_rest_api.get_minimal_employee_list)
+        raw_list = await self.get_minimal_employee_list_raw(token_dict, client_id, legal_id, employee_status_filter)
+        make_record = LazyMinimalEmployee if lazy else fill_minimal_employee_record
+        return [make_record(raw_employee) for raw_employee in raw_list]
+
+    async def get_employee_list_raw(self, token_dict: dict, client_id: str, legal_id: str,
+                                    employee_status_filter: str|None=None, search_text: str|None = None,
+                                    with_ssn: bool=False) -> list[dict]:
+        # get a raw list of employee records (see insperity_rest_api.get_employee_list_raw)
+        url, headers, params = _employee_list_request(token_dict, client_id, legal_id, employee_status_filter,
+                                                      search_text, with_ssn)
+        fetch_function = lambda: self.process_multipage_response(url, headers, params, token_dict)
+        key = (client_id, legal_id, employee_status_filter, search_text, with_ssn)
+        return await self._get_or_fetch(EMPLOYEES_ENDPOINT, key, fetch_function, contains_ssn=with_ssn)
+
+    async def get_employee_list(self, token_dict: dict, client_id: str, legal_id: str,
+                                employee_status_filter: str|None=None, search_text: str|None = None,
+                                with_ssn: bool=False, lazy: bool=False) -> list[Employee]|list[LazyEmployee]:
+        # get a list of Employee objects (see insperity_rest_api.get_employee_list)
+        raw_list = await self.get_employee_list_raw(token_dict=token_dict, client_id=client_id, legal_id=legal_id,
+                                                    employee_status_filter=employee_status_filter,
+                                                    search_text=search_text, with_ssn=with_ssn)
+        make_record = LazyEmployee if lazy else fill_employee_record
+        return [make_record(raw_employee) for raw_employee in raw_list]
+
+    async def iter_minimal_employees(self, token_dict: dict, client_id: str, legal_id: str,
+                                     employee_status_filter: str|None=None,
+                                     lazy: bool=False) -> AsyncIterator[MinimalEmployee]:
+        # yield MinimalEmployee objects one page at a time (see insperity_rest_api.iter_minimal_employees)
+        url, headers, params = _minimal_employee_list_request(token_dict, client_id, legal_id, employee_status_filter)
+        make_record = LazyMinimalEmployee if lazy else fill_minimal_employee_record
+
+        async for page_results in self.iter_multipage_response(url, headers, params, token_dict):
+            for raw_employee in page_results:
+                yield make_record(raw_employee)
+
+    async def iter_employees(self, token_dict: dict, client_id: str, legal_id: str,
+                             employee_status_filter: str|None=None, search_text: str|None = None,
+                             with_ssn: bool=False, lazy: bool=False) -> AsyncIterator[Employee]:
+        # yield Employee objects one page at a time (see insperity_rest_api.iter_employees)
+        url, headers, params = _employee_list_request(token_dict, client_id, legal_id, employee_status_filter,
+                                                      search_text, with_ssn)
+        make_record = LazyEmployee if lazy else fill_employee_record
+
+        async for page_results in self.iter_multipage_response(url, headers, params, token_dict):
+            for raw_employee in page_results:
+                yield make_record(raw_employee)
+
+    async def get_employee_checks_raw(self, token_dict: dict, client_id: str, legal_id: str, employee_id: str,
+                                      year_filter: int | None = None, include_details: bool | None = None) -> list[dict]:
+        # get a raw list of employee checks (see insperity_rest_api.get_employee_checks_raw)
+        headers = get_headers(token_dict['access_token'])
+        params = {}
+
+        url = EMPLOYEE_CHECKS.format(base_url=rest_api.BASE_URL, client_id=client_id, legal_id=legal_id,
+                                    employee_id=employee_id)
+
+        if year_filter is not None:
+            params['yearFilter'] = year_filter
+
+        if include_details is not None:
+            params['includeDetails'] = include_details
+
+        return await self.process_multipage_response(url, headers, params, token_dict)
+
+    async def get_employee_by_id(self, token_dict: dict, client_id: str, legal_id: str, employee_id: str) -> list[dict]:
+        # get employee by id (see insperity_rest_api.get_employee_by_id)
+        headers = get_headers(token_dict['access_token'])
+        url = EMPLOYEE_BY_ID.format(base_url=rest_api.BASE_URL, client_id=client_id, legal_id=legal_id,
+                                   employee_id=employee_id)
+        fetch_function = lambda: self.process_response(url, headers, {}, token_dict)
+        return await self._get_or_fetch(EMPLOYEE_BY_ID_ENDPOINT, (client_id, legal_id, employee_id), fetch_function)
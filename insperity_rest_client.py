@@ -0,0 +1,151 @@
+"""
+HTTP client used to call the Insperity REST API endpoints
+
+The client owns a pooled, keep-alive requests.Session, so repeated calls (e.g. every page of a multipage
+response) reuse the same TCP/TLS connection instead of doing a new handshake for each request.
+
+All of the module level functions in insperity_rest_api use the default client. To change the pool size, timeouts
+or compression, create a client and make it the default:
+
+    client = InsperityClient(pool_maxsize=32, timeout=(5.0, 120.0))
+    set_default_client(client)
+
+Throttled responses (429/503), transient server errors, connection errors and timeouts are retried with backoff, and
+the request rate is adapted to the rate the API allows (see insperity_rest_ratelimit). Identical requests made at the
+same time by several threads share one call (see insperity_rest_coalesce). Every request is recorded in the client's
+metrics (see insperity_rest_metrics).
+
+Len Wanger
+2025
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from insperity_rest_coalesce import SingleFlight
+from insperity_rest_metrics import InsperityMetrics, get_default_metrics, response_size
+from insperity_rest_ratelimit import AdaptiveRateLimiter, RequestThrottle, RetryPolicy
+from insperity_rest_response_cache import ResponseCache
+
+
+DEFAULT_POOL_CONNECTIONS = 4    # number of host connection pools to cache
+DEFAULT_POOL_MAXSIZE = 16       # max number of connections to keep open per host
+DEFAULT_TIMEOUT = (10.0, 60.0)  # (connect timeout, read timeout) in seconds
+
+
+class InsperityClient:
+    """
+    Pooled HTTP client for the Insperity REST API.
+
+    :param pool_connections: number of host connection pools to cache
+    :param pool_maxsize: maximum number of connections to keep open per host
+    :param timeout: timeout in seconds -- a single value or a (connect, read) tuple
+    :param compress: if True, ask the server for a gzip/deflate compressed response
+    :param response_cache: ResponseCache used by the employee list endpoints (None for no caching)
+    :param rate_limiter: AdaptiveRateLimiter shared by all requests (defaults to an AdaptiveRateLimiter with the
+        default settings)
+    :param retry_policy: RetryPolicy for failed requests (defaults to RetryPolicy(), use RetryPolicy(max_retries=0)
+        to not retry)
+    :param coalesce: if True, identical requests made at the same time share one call
+    :param metrics: InsperityMetrics to record the requests in (defaults to the shared default metrics)
+    """
+    def __init__(self, pool_connections: int=DEFAULT_POOL_CONNECTIONS, pool_maxsize: int=DEFAULT_POOL_MAXSIZE,
+                 timeout: float|tuple[float, float]|None=DEFAULT_TIMEOUT, compress: bool=True,
+                 response_cache: ResponseCache|None=None, rate_limiter: AdaptiveRateLimiter|None=None,
+                 retry_policy: RetryPolicy|None=None, coalesce: bool=True, metrics: InsperityMetrics|None=None):
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.metrics = metrics if metrics is not None else get_default_metrics()
+        self.single_flight = SingleFlight() if coalesce else None
+        self.response_cache = response_cache
+        self.throttle = RequestThrottle(rate_limiter if rate_limiter is not None else AdaptiveRateLimiter(),
+                                        retry_policy)
+        self.session = requests.Session()
+
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        if compress is True:
+            self.session.headers['Accept-Encoding'] = "gzip, deflate"
+        else:
+            self.session.headers['Accept-Encoding'] = "identity"
+
+    def request(self, method: str, url: str, headers: dict|None=None, params: dict|None=None,
+                data: dict|None=None) -> requests.Response:
+        # send a request using the pooled session, waiting for the rate limiter and retrying throttled responses,
+        #   transient server errors, connection errors and timeouts (see RequestThrottle)
+        attempt = 0
+
+        while True:
+            delay = self.throttle.wait_time()
+            if delay > 0.0:
+                time.sleep(delay)
+
+            try:
+                with self.metrics.track_request(method, url, attempt) as span:
+                    response = self.session.request(method, url, headers=headers, params=params, data=data,
+                                                    timeout=self.timeout)
+                    span.attributes['status'] = response.status_code
+                    span.attributes['bytes'] = response_size(response.headers, response.content)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                delay = self.throttle.on_error(attempt)
+                if delay is None:
+                    raise
+                self.metrics.record_retry(url, type(e).__name__)
+            else:
+                delay = self.throttle.on_response(response.status_code, response.headers, attempt)
+                if delay is None:
+                    return response
+                self.metrics.record_retry(url, response.status_code)
+
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, headers: dict|None=None, params: dict|None=None) -> requests.Response:
+        return self.request("GET", url, headers=headers, params=params)
+
+    def post(self, url: str, headers: dict|None=None, data: dict|None=None) -> requests.Response:
+        return self.request("POST", url, headers=headers, data=data)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+##############################################################################################################
+# Default client -- shared by all of the module level endpoint functions
+##############################################################################################################
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> InsperityClient:
+    # return the shared client, creating it the first time it is needed
+    global _default_client
+
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = InsperityClient()
+
+    return _default_client
+
+
+def set_default_client(client: InsperityClient|None) -> InsperityClient|None:
+    # replace the shared client (None to create a new default client on next use). Returns the old client.
+    global _default_client
+
+    with _default_client_lock:
+        old_client = _default_client
+        _default_client = client
+
+    return old_client
@@ -0,0 +1,144 @@
+"""
+Single-flight coalescing of identical in-flight REST API requests
+
+When several threads (or asyncio tasks) make the same request at the same time -- e.g. a burst of MCP tool calls
+that all ask for the employee list -- only the first one (the leader) calls the REST API. The others wait for the
+leader's call and get its decoded result (or its exception). Once the call is done the key is forgotten, so this is
+not a cache: a request made after the call finishes goes to the REST API again (see ResponseCache for caching).
+
+Requests are identical if they have the same normalized url and params (the query string merged with params, in
+sorted order), the same credentials scope (client code, or Authorization header if there is no token_dict) and the
+same essScope header.
+
+Each waiter gets its own deep copy of the leader's result (decoded JSON: dicts, lists and scalars), so a caller that
+changes its result (e.g. an employee dict from get_employee_by_id) doesn't change what the other callers got.
+
+Len Wanger
+2025
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+import threading
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+from insperity_rest_utils import copy_json
+
+
+def request_key(kind: str, url: str, params: dict|None, headers: dict|None=None,
+                token_dict: dict|None=None) -> tuple:
+    # return the coalescing key for a request. kind separates the different kinds of result (e.g. a single page vs.
+    #   all of the pages of a multipage response).
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query += [(str(name), str(value)) for name, value in (params or {}).items() if value is not None]
+    normalized_url = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, "", ""))
+
+    headers = headers or {}
+    scope = token_dict.get('client_code') if token_dict is not None else headers.get('Authorization')
+
+    return kind, normalized_url, tuple(sorted(query)), scope, headers.get('essScope')
+
+
+def _share(result):
+    # give each waiter its own deep copy of a decoded JSON result, so one caller changing it doesn't change the
+    #   others'
+    return copy_json(result)
+
+
+class _LeaderCancelled(Exception):
+    # set on a coalesced call's future when the leader task is cancelled -- the waiters retry the call
+    pass
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # coalesce identical calls made from several threads at the same time
+    def __init__(self):
+        self.coalesced = 0  # number of calls that waited for another call instead of running
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, function: Callable[[], object]) -> object:
+        """
+        Call function, unless a call with the same key is already running -- then wait for it and return its result.
+
+        :param key: hashable key of the call (see request_key)
+        :param function: function called with no arguments
+        :return: the result of function (or of the running call with the same key)
+        """
+        with self._lock:
+            call = self._calls.get(key, None)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+
+            if call.error is not None:
+                raise call.error
+            return _share(call.result)
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    # coalesce identical calls made from several asyncio tasks at the same time
+    def __init__(self):
+        self.coalesced = 0
+        self._futures = {}
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable]) -> object:
+        # await function(), unless a call with the same key is already running -- then wait for it and return its
+        #   result. Cancelling a waiter doesn't cancel the leader's call, and if the leader is cancelled the waiters
+        #   aren't: one of them makes the call again as the new leader.
+        waited = False
+
+        while (future := self._futures.get(key, None)) is not None:
+            if not waited:
+                self.coalesced += 1
+                waited = True
+
+            try:
+                return _share(await asyncio.shield(future))
+            except _LeaderCancelled:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._futures[key] = future
+
+        try:
+            result = await function()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()  # mark the exception as retrieved, in case nobody was waiting for it
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark the exception as retrieved, in case nobody was waiting for it
+            raise
+        finally:
+            del self._futures[key]
@@ -0,0 +1,137 @@
+"""
+On-disk cache of Insperity REST API credentials
+
+get_credentials needs three round trips (token, clients, legals) before any useful work can be done. The
+CredentialCache saves the token dictionary, client id and list of legals for each client code to a JSON file, so a
+script or MCP server that starts again while the token is still good can skip all three calls. Entries are kept per
+REST API base url, so credentials for one host (e.g. the mock server) are never sent to another.
+
+The cache file holds access and refresh tokens, so it is only readable by the user that wrote it: the directory is
+created with 0o700 permissions and the file with 0o600, and a cache file that other users can read is ignored.
+
+The cache is used by get_credentials when a CredentialCache is passed to it, or when the INSPERITY_CREDENTIAL_CACHE
+environment variable is set to the path of the cache file (e.g. in the .env file):
+
+    INSPERITY_CREDENTIAL_CACHE = ~/.cache/insperity_mcp/credentials.json
+
+Len Wanger
+2025
+"""
+
+import json
+import os
+from pathlib import Path
+import stat
+import tempfile
+import threading
+import time
+
+
+CREDENTIAL_CACHE_ENV = 'INSPERITY_CREDENTIAL_CACHE'  # environment variable with the path of the cache file
+DEFAULT_CREDENTIAL_CACHE_PATH = Path.home() / ".cache" / "insperity_mcp" / "credentials.json"
+DEFAULT_BOOTSTRAP_TTL = 24 * 60 * 60.0  # seconds to reuse the cached client id and legal ids
+
+
+class CredentialCache:
+    """
+    Permission-restricted JSON file cache of tokens, client ids and legal ids, keyed by base url and client code.
+
+    :param path: path of the cache file
+    :param bootstrap_ttl: number of seconds the cached client id and legal ids are reused for
+    """
+    def __init__(self, path: str|Path=DEFAULT_CREDENTIAL_CACHE_PATH, bootstrap_ttl: float=DEFAULT_BOOTSTRAP_TTL):
+        self.path = Path(path).expanduser()
+        self.bootstrap_ttl = bootstrap_ttl
+        self.lock = threading.Lock()
+
+    def _read(self) -> dict:
+        # read the cache file -- returns an empty cache if it doesn't exist, can't be read, or is readable by others
+        try:
+            if self.path.stat().st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+                return {}
+
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, cache_dict: dict):
+        # write the cache file atomically, readable only by the current user
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".credentials-")
+
+        try:
+            os.chmod(temp_path, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(cache_dict, f)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def load(self, base_url: str, client_code: str) -> dict|None:
+        """
+        Get the cached credentials for a client code.
+
+        :param base_url: base url of the REST API the credentials are for
+        :param client_code: Insperity customer/client code
+        :return: dictionary with token_dict, client_id and legal_ids (client_id and legal_ids are None if older than
+            bootstrap_ttl), or None if nothing is cached for the base url and client code
+        """
+        with self.lock:
+            entry = self._read().get(base_url, {}).get(client_code, None)
+
+        if entry is None:
+            return None
+
+        if time.time() - entry.get('bootstrap_time', 0.0) > self.bootstrap_ttl:
+            entry['client_id'] = entry['legal_ids'] = None
+
+        return entry
+
+    def save(self, base_url: str, client_code: str, token_dict: dict, client_id: str|None=None,
+             legal_ids: list[dict]|None=None):
+        """
+        Save the credentials for a client code. If client_id and legal_ids are None, only the token is updated.
+
+        :param base_url: base url of the REST API the credentials are for
+        :param client_code: Insperity customer/client code
+        :param token_dict: token dictionary (or TokenManager)
+        :param client_id: client id returned by get_client_and_legal_ids
+        :param legal_ids: list of legals returned by get_client_and_legal_ids
+        """
+        with self.lock:
+            cache_dict = self._read()
+            entry = cache_dict.setdefault(base_url, {}).setdefault(client_code, {})
+            entry['token_dict'] = dict(token_dict)
+
+            if (client_id is not None) and (legal_ids is not None):
+                entry['client_id'] = client_id
+                entry['legal_ids'] = legal_ids
+                entry['bootstrap_time'] = time.time()
+
+            self._write(cache_dict)
+
+    def clear(self, base_url: str|None=None, client_code: str|None=None):
+        # remove the cached credentials for a client code (or all client codes if None) of a base url (or of all
+        #   base urls if None)
+        with self.lock:
+            cache_dict = self._read()
+
+            for url in ([base_url] if base_url is not None else list(cache_dict)):
+                if client_code is None:
+                    cache_dict.pop(url, None)
+                elif isinstance(cache_dict.get(url), dict):
+                    cache_dict[url].pop(client_code, None)
+
+            self._write(cache_dict)
+
+
+def get_default_credential_cache() -> CredentialCache|None:
+    # return a CredentialCache for the file named by INSPERITY_CREDENTIAL_CACHE, or None if it is not set
+    path = os.getenv(CREDENTIAL_CACHE_ENV)
+
+    if not path:
+        return None
+
+    return CredentialCache(path)
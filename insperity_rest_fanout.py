@@ -0,0 +1,130 @@
+"""
+Run a per-employee REST API call for a list of employees
+
+Endpoints like get_employee_checks_raw, get_employee_timecard_data_raw and get_employee_by_id return the data for one
+employee, so getting the data for a whole workforce means one call per employee. fan_out runs those calls in a worker
+pool with a limit on the number of concurrent calls (kept at or below the client's pool_maxsize, so every call gets a
+pooled connection):
+
+    results = get_checks_for_employees(token_dict, client_id, legal_id, employees, year_filter=2025,
+                                       progress=lambda done, total: print(f"{done}/{total}"))
+    for result in results:
+        if result.error is None:
+            print(result.employee_id, len(result.value))
+
+The results are returned in the same order as the employees. An exception from one call doesn't stop the others --
+it is stored in that employee's result.
+
+Len Wanger
+2025
+"""
+
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date
+
+from insperity_rest_api import get_employee_by_id, get_employee_checks_raw, get_employee_timecard_data_raw
+from insperity_rest_client import get_default_client
+
+
+DEFAULT_FANOUT_WORKERS = 8
+
+
+@dataclass
+class FanOutResult:
+    employee_id: str
+    value: object = None
+    error: Exception|None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def get_employee_id(employee) -> str:
+    # return the employee id of an Employee/MinimalEmployee, a raw employee dict or an employee id string
+    if isinstance(employee, str):
+        return employee
+
+    if isinstance(employee, dict):
+        return employee['id']
+
+    return employee.id
+
+
+def fan_out(function: Callable[..., object], employees: Iterable, max_workers: int=DEFAULT_FANOUT_WORKERS,
+            progress: Callable[[int, int], None]|None=None, **kwargs) -> list[FanOutResult]:
+    """
+    Call function(employee_id=..., **kwargs) for each employee in a worker pool.
+
+    :param function: per-employee endpoint function (e.g. get_employee_checks_raw)
+    :param employees: Employee/MinimalEmployee objects, raw employee dicts or employee id strings
+    :param max_workers: maximum number of calls to run at the same time (capped at the default client's pool_maxsize)
+    :param progress: if not None, called with (number of calls done, total number of calls) as each call finishes
+    :param kwargs: other arguments passed to function (e.g. token_dict, client_id and legal_id)
+    :return: list of FanOutResult, in the same order as employees
+    """
+    results = [FanOutResult(employee_id=get_employee_id(employee)) for employee in employees]
+
+    if len(results) == 0:
+        return results
+
+    # more workers than pooled connections would open (and throw away) extra connections
+    max_workers = max(1, min(max_workers, get_default_client().pool_maxsize, len(results)))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(function, employee_id=result.employee_id, **kwargs): result for result in results}
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = futures[future]
+
+            try:
+                result.value = future.result()
+            except Exception as e:
+                result.error = e
+
+            if progress is not None:
+                progress(done, len(results))
+
+    return results
+
+
+def get_checks_for_employees(token_dict: dict, client_id: str, legal_id: str, employees: Iterable,
+                             year_filter: int|None=None, include_details: bool|None=None,
+                             max_workers: int=DEFAULT_FANOUT_WORKERS,
+                             progress: Callable[[int, int], None]|None=None) -> list[FanOutResult]:
+    """
+    get the raw checks for a list of employees (see get_employee_checks_raw)
+
+    :return: list of FanOutResult with the list of check dicts for each employee as the value
+    """
+    return fan_out(get_employee_checks_raw, employees, max_workers=max_workers, progress=progress,
+                   token_dict=token_dict, client_id=client_id, legal_id=legal_id, year_filter=year_filter,
+                   include_details=include_details)
+
+
+def get_timecards_for_employees(token_dict: dict, client_id: str, legal_id: str, employees: Iterable,
+                                start_date: date|None=None, end_date: date|None=None,
+                                max_workers: int=DEFAULT_FANOUT_WORKERS,
+                                progress: Callable[[int, int], None]|None=None) -> list[FanOutResult]:
+    """
+    get the raw timecard data for a list of employees (see get_employee_timecard_data_raw)
+
+    :return: list of FanOutResult with the list of timecard dicts for each employee as the value
+    """
+    return fan_out(get_employee_timecard_data_raw, employees, max_workers=max_workers, progress=progress,
+                   token_dict=token_dict, client_id=client_id, legal_id=legal_id, start_date=start_date,
+                   end_date=end_date)
+
+
+def get_employees_by_id(token_dict: dict, client_id: str, legal_id: str, employees: Iterable,
+                        max_workers: int=DEFAULT_FANOUT_WORKERS,
+                        progress: Callable[[int, int], None]|None=None) -> list[FanOutResult]:
+    """
+    get the employee data for a list of employees (see get_employee_by_id)
+
+    :return: list of FanOutResult with the employee data as the value
+    """
+    return fan_out(get_employee_by_id, employees, max_workers=max_workers, progress=progress,
+                   token_dict=token_dict, client_id=client_id, legal_id=legal_id)
@@ -0,0 +1,429 @@
+"""
+Per-endpoint metrics and tracing hooks for the Insperity REST API calls
+
+Every HTTP call made by InsperityClient (and AsyncInsperityClient) is recorded in an in-process MetricsRegistry:
+the endpoint name (e.g. "employees", "checks" or "token"), latency, status, bytes received and retries. Each logical
+multipage call records how many pages it read, and each token refresh is counted. The metrics are exported in the
+Prometheus text format:
+
+    metrics = get_default_metrics()
+    print(metrics.to_prometheus())
+    serve_prometheus(9464)                  # or serve them at http://localhost:9464/metrics
+
+Span listeners can be added to send the calls to a tracing system. on_start is called with a Span when an HTTP
+request (kind 'http') or a multipage call (kind 'call') starts, and on_end when it is done -- span.context is a
+dictionary the listener can keep its own state in, e.g. for OpenTelemetry:
+
+    def on_start(span):
+        span.context['otel'] = tracer.start_span(span.name, attributes=span.attributes)
+
+    def on_end(span):
+        otel_span = span.context['otel']
+        otel_span.set_attributes(span.attributes)
+        otel_span.end()
+
+    get_default_metrics().add_span_listener(on_start, on_end)
+
+Len Wanger
+2025
+"""
+
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import math
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+DEFAULT_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # seconds
+DEFAULT_PAGE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (pattern, endpoint name) -- the first pattern that matches the end of the url path names the endpoint
+_ENDPOINT_PATTERNS = [
+    (re.compile(r"/token/?$"), 'token'),
+    (re.compile(r"/clients/?$"), 'clients'),
+    (re.compile(r"/legals/?$"), 'legals'),
+    (re.compile(r"/employeesMinimal$"), 'employeesMinimal'),
+    (re.compile(r"/employeesWithSSN$"), 'employeesWithSSN'),
+    (re.compile(r"/employees$"), 'employees'),
+    (re.compile(r"/employees/[^/]+/checks$"), 'checks'),
+    (re.compile(r"/employees/[^/]+/timecardData$"), 'timecardData'),
+    (re.compile(r"/employees/[^/]+/payroll$"), 'payroll'),
+    (re.compile(r"/employees/[^/]+$"), 'employeeById'),
+]
+
+
+@lru_cache(maxsize=4096)
+def endpoint_name(url: str) -> str:
+    # return the name of the REST API endpoint of a url (without the ids, so it can be used as a metric label)
+    path = urlsplit(str(url)).path.rstrip('/')
+
+    for pattern, name in _ENDPOINT_PATTERNS:
+        if pattern.search(path):
+            return name
+
+    segments = [segment for segment in path.split('/') if segment and not segment.isdigit()]
+    return segments[-1] if segments else 'unknown'
+
+
+##############################################################################################################
+# Metrics registry
+##############################################################################################################
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_names: tuple[str, ...], label_values: tuple, extra: str="") -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    # monotonically increasing value per combination of label values
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...]=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values = {}  # label values -> value
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float=1.0):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def get(self, *label_values) -> float:
+        return self.values.get(label_values, 0.0)
+
+    def to_prometheus(self) -> list[str]:
+        with self.lock:
+            values = sorted(self.values.items())
+
+        return [f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}"
+                for label_values, value in values]
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.values)
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+
+
+class Histogram:
+    # distribution of observed values (e.g. latencies) per combination of label values, in cumulative buckets
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...]=(),
+                 buckets: tuple[float, ...]=DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self.lock:
+            counts = self.values.get(label_values, None)
+            if counts is None:
+                counts = self.values[label_values] = [0] * len(self.buckets) + [0.0, 0]
+
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    counts[i] += 1
+
+            counts[-2] += value
+            counts[-1] += 1
+
+    def get(self, *label_values) -> tuple[float, int]:
+        # return the (sum, count) of the observed values
+        counts = self.values.get(label_values, None)
+        return (counts[-2], counts[-1]) if counts is not None else (0.0, 0)
+
+    def to_prometheus(self) -> list[str]:
+        with self.lock:
+            values = sorted((label_values, list(counts)) for label_values, counts in self.values.items())
+
+        lines = []
+        for label_values, counts in values:
+            bucket_counts = counts[:len(self.buckets)] + [counts[-1]]  # the +Inf bucket is the total count
+            for upper_bound, bucket_count in zip(self.buckets + (math.inf,), bucket_counts):
+                labels = _format_labels(self.label_names, label_values, f'le="{_format_value(upper_bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(counts[-2])}")
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+
+        return lines
+
+    def snapshot(self) -> dict:
+        # return a dictionary of label values -> {'sum': ..., 'count': ...}
+        with self.lock:
+            return {label_values: {'sum': counts[-2], 'count': counts[-1]}
+                    for label_values, counts in self.values.items()}
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+
+
+class MetricsRegistry:
+    # named counters and histograms, exported together in the Prometheus text format
+    def __init__(self):
+        self.metrics = {}  # name -> Counter or Histogram
+        self.lock = threading.Lock()
+
+    def _add(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, label_names: tuple[str, ...]=()) -> Counter:
+        return self._add(Counter(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: tuple[str, ...]=(),
+                  buckets: tuple[float, ...]=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, label_names, buckets))
+
+    def to_prometheus(self) -> str:
+        lines = []
+
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.to_prometheus())
+
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        # return the current values of all of the metrics, as a dictionary of name -> {label values: value}
+        return {name: metric.snapshot() for name, metric in list(self.metrics.items())}
+
+    def reset(self):
+        for metric in list(self.metrics.values()):
+            metric.reset()
+
+
+##############################################################################################################
+# Spans and the instrumentation used by the clients
+##############################################################################################################
+@dataclass
+class Span:
+    name: str                   # e.g. "GET employees" for an HTTP request, or "employees" for a multipage call
+    kind: str                   # 'http' or 'call'
+    attributes: dict            # endpoint, method, url, status, bytes, attempt, pages...
+    start_time: float           # time.time() when the span started
+    end_time: float|None = None
+    error: BaseException|None = None
+    context: dict = field(default_factory=dict)  # for the span listeners' own state
+    _start_counter: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def duration(self) -> float|None:
+        return self.end_time - self.start_time if self.end_time is not None else None
+
+
+class InsperityMetrics:
+    """
+    Metrics and span listeners for the REST API calls.
+
+    :param registry: MetricsRegistry to record the metrics in (defaults to a new MetricsRegistry)
+    :param latency_buckets: histogram buckets (seconds) for the request and call latencies
+    """
+    def __init__(self, registry: MetricsRegistry|None=None,
+                 latency_buckets: tuple[float, ...]=DEFAULT_LATENCY_BUCKETS):
+        self.registry = registry if registry is not None else MetricsRegistry()
+        self.span_listeners = []  # (on_start, on_end) tuples
+
+        self.requests = self.registry.counter(
+            "insperity_http_requests_total", "HTTP requests made to the REST API, by endpoint and status (or error)",
+            ('endpoint', 'method', 'status'))
+        self.request_latency = self.registry.histogram(
+            "insperity_http_request_duration_seconds", "Latency of the HTTP requests made to the REST API",
+            ('endpoint', 'method'), latency_buckets)
+        self.bytes_received = self.registry.counter(
+            "insperity_http_response_bytes_total", "Bytes received from the REST API", ('endpoint',))
+        self.retries = self.registry.counter(
+            "insperity_http_retries_total", "HTTP requests retried, by endpoint and reason (status or error)",
+            ('endpoint', 'reason'))
+        self.token_refreshes = self.registry.counter(
+            "insperity_token_refreshes_total", "Access tokens refreshed")
+        self.calls = self.registry.counter(
+            "insperity_calls_total", "Logical (multipage) calls, by endpoint and outcome", ('endpoint', 'outcome'))
+        self.call_latency = self.registry.histogram(
+            "insperity_call_duration_seconds", "Latency of the logical (multipage) calls", ('endpoint',),
+            latency_buckets)
+        self.pages = self.registry.histogram(
+            "insperity_pages_per_call", "Pages read per logical (multipage) call", ('endpoint',),
+            DEFAULT_PAGE_BUCKETS)
+
+    def add_span_listener(self, on_start: Callable[[Span], None]|None=None,
+                          on_end: Callable[[Span], None]|None=None):
+        # add functions called with each Span when it starts and when it ends
+        self.span_listeners.append((on_start, on_end))
+
+    def remove_span_listener(self, on_start: Callable[[Span], None]|None=None,
+                             on_end: Callable[[Span], None]|None=None):
+        self.span_listeners.remove((on_start, on_end))
+
+    def _notify(self, span: Span, position: int):
+        for listener in list(self.span_listeners):
+            if listener[position] is not None:
+                try:
+                    listener[position](span)
+                except Exception:  # a broken listener mustn't break the REST API call
+                    pass
+
+    def start_span(self, name: str, kind: str, attributes: dict) -> Span:
+        span = Span(name, kind, attributes, time.time())
+        self._notify(span, 0)
+        return span
+
+    def end_span(self, span: Span, error: BaseException|None=None):
+        # finish a span, record its metrics and call the span listeners
+        duration = time.perf_counter() - span._start_counter
+        span.end_time = span.start_time + duration
+        span.error = error if error is not None else span.error
+        attributes = span.attributes
+        endpoint = attributes.get('endpoint', 'unknown')
+
+        if span.kind == 'http':
+            status = attributes.get('status', type(span.error).__name__ if span.error is not None else 'unknown')
+            self.requests.inc(endpoint, attributes.get('method', 'GET'), str(status))
+            self.request_latency.observe(duration, endpoint, attributes.get('method', 'GET'))
+            if attributes.get('bytes'):
+                self.bytes_received.inc(endpoint, amount=attributes['bytes'])
+        else:
+            self.calls.inc(endpoint, 'error' if span.error is not None else 'ok')
+            self.call_latency.observe(duration, endpoint)
+            self.pages.observe(attributes.get('pages', 0), endpoint)
+
+        self._notify(span, 1)
+
+    @contextmanager
+    def track_request(self, method: str, url, attempt: int=0) -> Iterator[Span]:
+        # span for one HTTP request -- the caller sets span.attributes['status'] and ['bytes'] from the response
+        endpoint = endpoint_name(str(url))
+        span = self.start_span(f"{method} {endpoint}", 'http',
+                               {'endpoint': endpoint, 'method': method, 'url': str(url), 'attempt': attempt})
+        try:
+            yield span
+        except BaseException as e:
+            span.error = e
+            raise
+        finally:
+            self.end_span(span)
+
+    @contextmanager
+    def track_call(self, url: str) -> Iterator[Span]:
+        # span for a logical multipage call -- the caller counts the pages read in span.attributes['pages']. A
+        #   generator closed before the last page is not an error.
+        endpoint = endpoint_name(url)
+        span = self.start_span(endpoint, 'call', {'endpoint': endpoint, 'url': url, 'pages': 0})
+        try:
+            yield span
+        except GeneratorExit:
+            span.attributes['closed'] = True
+            raise
+        except BaseException as e:
+            span.error = e
+            raise
+        finally:
+            self.end_span(span)
+
+    def record_retry(self, url, reason):
+        self.retries.inc(endpoint_name(str(url)), str(reason))
+
+    def record_token_refresh(self):
+        self.token_refreshes.inc()
+
+    def to_prometheus(self) -> str:
+        return self.registry.to_prometheus()
+
+
+def response_size(headers, content: bytes) -> int:
+    # return the number of bytes received for a response (Content-Length, which is the compressed size for a
+    #   compressed response, or the length of the body)
+    content_length = headers.get('Content-Length', None)
+    return int(content_length) if (content_length is not None) and content_length.isdigit() else len(content)
+
+
+##############################################################################################################
+# Default metrics -- shared by all of the clients
+##############################################################################################################
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+
+def get_default_metrics() -> InsperityMetrics:
+    # return the shared metrics, creating them the first time they are needed
+    global _default_metrics
+
+    if _default_metrics is None:
+        with _default_metrics_lock:
+            if _default_metrics is None:
+                _default_metrics = InsperityMetrics()
+
+    return _default_metrics
+
+
+def set_default_metrics(metrics: InsperityMetrics|None) -> InsperityMetrics|None:
+    # replace the shared metrics (None to create new default metrics on next use). Returns the old metrics.
+    global _default_metrics
+
+    with _default_metrics_lock:
+        old_metrics = _default_metrics
+        _default_metrics = metrics
+
+    return old_metrics
+
+
+def serve_prometheus(port: int, host: str="127.0.0.1", metrics: InsperityMetrics|None=None) -> ThreadingHTTPServer:
+    """
+    Serve the metrics in the Prometheus text format at http://host:port/metrics, from a background thread.
+
+    The endpoint has no authentication and shows the traffic per endpoint, so by default it only listens on the
+    loopback interface. Use host="0.0.0.0" to let a Prometheus server on another host scrape it.
+
+    :param port: port to listen on
+    :param host: host (interface address) to listen on
+    :param metrics: InsperityMetrics to serve (defaults to the default metrics at the time of each scrape)
+    :return: the HTTP server (call shutdown() to stop it)
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if urlsplit(self.path).path != "/metrics":
+                self.send_error(404)
+                return
+
+            content = (metrics if metrics is not None else get_default_metrics()).to_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="insperity_metrics", daemon=True).start()
+    return server
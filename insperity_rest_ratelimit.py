@@ -0,0 +1,246 @@
+"""
+Rate limiting and retries for the Insperity REST API clients
+
+Each client (InsperityClient and AsyncInsperityClient) owns a RequestThrottle, which decides how long to wait before
+sending a request and whether a failed request is retried:
+
+    - AdaptiveRateLimiter is a token bucket whose rate is adjusted by AIMD (additive increase, multiplicative
+      decrease). Each successful request raises the rate a little (about `increase` requests/second per second), and
+      each throttled response (429 or 503) halves it, so concurrent workloads settle just under the rate the API
+      allows.
+    - A Retry-After header on a throttled response pauses all of the client's requests until that time, not just
+      the request that got it.
+    - Throttled responses, transient server errors (500, 502, 503, 504), connection errors and timeouts are retried
+      with exponential backoff and full jitter (RetryPolicy).
+    - A retry budget limits the retries to a fraction of the recent successful requests (plus a small reserve), so a
+      server that is down isn't hit with max_retries times the normal traffic.
+
+To change the defaults, give the client a RetryPolicy and/or an AdaptiveRateLimiter:
+
+    set_default_client(InsperityClient(rate_limiter=AdaptiveRateLimiter(rate=10.0, max_rate=20.0),
+                                       retry_policy=RetryPolicy(max_retries=8)))
+
+Len Wanger
+2025
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+
+
+DEFAULT_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+THROTTLE_STATUSES = frozenset({429, 503})  # responses that mean the client is sending too fast
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_retries: int = 4                # maximum number of retries for one request
+    base_delay: float = 0.5             # seconds -- backoff for the first retry (doubled for each retry after that)
+    max_delay: float = 30.0             # seconds -- maximum backoff for a retry
+    max_retry_after: float = 300.0      # seconds -- longest Retry-After to honor (longer ones are not retried)
+    retry_statuses: frozenset = DEFAULT_RETRY_STATUSES
+    budget_ratio: float = 0.2           # retries allowed per successful request
+    budget_reserve: float = 10.0        # retries allowed before there are any successful requests
+    budget_window: int = 1000           # successful requests the retry budget can be saved up from
+
+    def backoff_delay(self, attempt: int) -> float:
+        # return the delay before retry number attempt (0 for the first retry): exponential backoff with full jitter
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def parse_retry_after(value: str|None) -> float|None:
+    # return the number of seconds to wait from a Retry-After header (delay in seconds or an HTTP date), or None if
+    #   the header is missing or can't be parsed
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_time = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_time.tzinfo is None:
+        retry_time = retry_time.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (retry_time - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryBudget:
+    """
+    Token bucket of retries -- each successful request adds ratio tokens and each retry takes one. The bucket holds
+    up to the retries earned by the last window successful requests (and at least reserve), so a burst of failures
+    after a long run of successes can retry about ratio of the recent traffic, but not an unbounded backlog.
+
+    :param ratio: retries allowed per successful request
+    :param reserve: number of tokens the bucket starts with
+    :param window: number of successful requests the tokens can be saved up from (max_tokens is the larger of
+        reserve and ratio * window)
+    """
+    def __init__(self, ratio: float, reserve: float, window: int=RetryPolicy.budget_window):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.max_tokens = max(reserve, ratio * window)
+        self.tokens = reserve
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        # take a token for a retry, returns False if the budget is used up
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+
+            return False
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket rate limiter with an AIMD adjusted rate.
+
+    :param rate: starting rate in requests per second
+    :param min_rate: the rate is never decreased below min_rate
+    :param max_rate: the rate is never increased above max_rate
+    :param burst: number of requests that can be sent at once after being idle (defaults to rate)
+    :param increase: requests/second added to the rate per second of successful requests
+    :param decrease: multiply the rate by decrease when a request is throttled
+    :param cooldown: seconds after a decrease during which other throttled responses don't decrease the rate again
+        (so a batch of concurrent 429s only counts once)
+    """
+    def __init__(self, rate: float=50.0, min_rate: float=1.0, max_rate: float=500.0, burst: float|None=None,
+                 increase: float=5.0, decrease: float=0.5, cooldown: float=1.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._tokens = self._capacity()
+        self._last_time = time.monotonic()
+        self._last_decrease = float('-inf')
+        self._lock = threading.Lock()
+
+    def _capacity(self) -> float:
+        return self.burst if self.burst is not None else max(1.0, self.rate)
+
+    def reserve(self) -> float:
+        # reserve a slot for a request and return the number of seconds to wait before sending it
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity(), self._tokens + (now - self._last_time) * self.rate)
+            self._last_time = now
+            self._tokens -= 1.0
+
+            return 0.0 if self._tokens >= 0.0 else -self._tokens / self.rate
+
+    def on_success(self):
+        # additive increase -- about self.increase requests/second per second at the current rate
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttle(self):
+        # multiplicative decrease
+        with self._lock:
+            now = time.monotonic()
+
+            if now - self._last_decrease >= self.cooldown:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._tokens = min(self._tokens, self._capacity())
+                self._last_decrease = now
+
+
+class RequestThrottle:
+    """
+    Rate limiter, retry policy and retry budget shared by all of the requests of a client.
+
+    :param rate_limiter: AdaptiveRateLimiter to use (None to not limit the request rate)
+    :param retry_policy: RetryPolicy to use (None for the default RetryPolicy)
+    """
+    def __init__(self, rate_limiter: AdaptiveRateLimiter|None=None, retry_policy: RetryPolicy|None=None):
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.retry_budget = RetryBudget(self.retry_policy.budget_ratio, self.retry_policy.budget_reserve,
+                                        self.retry_policy.budget_window)
+        self.retries = 0
+        self.throttled = 0
+        self._paused_until = 0.0  # time.monotonic() time set from Retry-After headers
+        self._lock = threading.Lock()
+
+    def wait_time(self) -> float:
+        # return the number of seconds to wait before sending a request
+        delay = self.rate_limiter.reserve() if self.rate_limiter is not None else 0.0
+
+        with self._lock:
+            return max(delay, self._paused_until - time.monotonic())
+
+    def _retry_delay(self, attempt: int, retry_after: float|None=None) -> float|None:
+        # return the delay before retrying, or None if the request shouldn't be retried
+        if attempt >= self.retry_policy.max_retries:
+            return None
+
+        if (retry_after is not None) and (retry_after > self.retry_policy.max_retry_after):
+            return None
+
+        if not self.retry_budget.withdraw():
+            return None
+
+        with self._lock:
+            self.retries += 1
+
+        return max(self.retry_policy.backoff_delay(attempt), retry_after or 0.0)
+
+    def on_response(self, status_code: int, headers, attempt: int) -> float|None:
+        """
+        Record the response to a request.
+
+        :param status_code: HTTP status code of the response
+        :param headers: response headers
+        :param attempt: number of times the request has already been retried
+        :return: seconds to wait before retrying the request, or None to use the response
+        """
+        if status_code not in self.retry_policy.retry_statuses:
+            if status_code < 400:
+                self.retry_budget.deposit()
+
+                if self.rate_limiter is not None:
+                    self.rate_limiter.on_success()
+
+            return None
+
+        retry_after = parse_retry_after(headers.get('Retry-After')) if status_code in THROTTLE_STATUSES else None
+
+        if status_code in THROTTLE_STATUSES:
+            with self._lock:
+                self.throttled += 1
+
+                if retry_after is not None:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+            if self.rate_limiter is not None:
+                self.rate_limiter.on_throttle()
+
+        return self._retry_delay(attempt, retry_after)
+
+    def on_error(self, attempt: int) -> float|None:
+        # record a connection error or timeout -- return seconds to wait before retrying, or None to raise the error
+        return self._retry_delay(attempt)
+
+    def stats(self) -> dict:
+        # return the throttle counters
+        with self._lock:
+            return {'retries': self.retries, 'throttled': self.throttled,
+                    'rate': self.rate_limiter.rate if self.rate_limiter is not None else None,
+                    'retry_budget': self.retry_budget.tokens}
@@ -0,0 +1,153 @@
+"""
+In-memory cache of Insperity REST API responses
+
+A ResponseCache keeps the decoded responses of the employee list endpoints (employees, employeesMinimal and employee
+by id) for a short time, so repeating the same query (e.g. from an MCP agent loop) doesn't call the REST API again.
+Entries expire after a per-endpoint time to live, and the least recently used entries are evicted when the cache is
+full. Responses that contain SSNs are not cached unless cache_ssn is True.
+
+Each caller gets its own deep copy of a cached response, so changing a returned list or employee dictionary doesn't
+change what later callers get.
+
+To use the cache, give it to the client:
+
+    set_default_client(InsperityClient(response_cache=ResponseCache(max_entries=128)))
+
+Len Wanger
+2025
+"""
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+import threading
+import time
+
+from insperity_rest_utils import copy_json
+
+
+EMPLOYEES_ENDPOINT = 'employees'
+EMPLOYEES_MIN_ENDPOINT = 'employeesMinimal'
+EMPLOYEE_BY_ID_ENDPOINT = 'employeeById'
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 60.0  # seconds, for endpoints not in DEFAULT_ENDPOINT_TTLS
+DEFAULT_ENDPOINT_TTLS = {
+    EMPLOYEES_ENDPOINT: 300.0,
+    EMPLOYEES_MIN_ENDPOINT: 300.0,
+    EMPLOYEE_BY_ID_ENDPOINT: 60.0,
+}
+
+
+class ResponseCache:
+    """
+    Thread-safe TTL/LRU cache of decoded REST API responses.
+
+    :param max_entries: maximum number of responses to keep -- the least recently used is evicted when full
+    :param ttls: dictionary of endpoint name to time to live in seconds (defaults to DEFAULT_ENDPOINT_TTLS)
+    :param default_ttl: time to live in seconds for endpoints not in ttls
+    :param cache_ssn: if False, responses that include SSNs are never cached
+    :param copy_values: if True, get and get_or_fetch return a deep copy of the cached value (set to False only if
+        the callers never change the values)
+    """
+    def __init__(self, max_entries: int=DEFAULT_MAX_ENTRIES, ttls: dict[str, float]|None=None,
+                 default_ttl: float=DEFAULT_TTL, cache_ssn: bool=False, copy_values: bool=True):
+        self.max_entries = max_entries
+        self.copy_values = copy_values
+        self.ttls = dict(DEFAULT_ENDPOINT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.cache_ssn = cache_ssn
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # (endpoint, key) -> (expire time, value)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def copy(self, value: object) -> object:
+        # return the value to give a caller -- a deep copy of it if copy_values is True
+        return copy_json(value) if self.copy_values else value
+
+    def get(self, endpoint: str, key: Hashable) -> tuple[bool, object]:
+        # return (True, value) if a live entry is cached for the endpoint and key, otherwise (False, None)
+        with self._lock:
+            entry = self._entries.get((endpoint, key), None)
+
+            if (entry is not None) and (entry[0] > time.monotonic()):
+                self._entries.move_to_end((endpoint, key))
+                self.hits += 1
+                value = entry[1]
+            else:
+                if entry is not None:  # expired
+                    del self._entries[(endpoint, key)]
+
+                self.misses += 1
+                return False, None
+
+        return True, self.copy(value)  # copied outside of the lock
+
+    def put(self, endpoint: str, key: Hashable, value: object):
+        # add a value to the cache, evicting the least recently used entries if the cache is full
+        ttl = self.ttls.get(endpoint, self.default_ttl)
+
+        with self._lock:
+            self._entries[(endpoint, key)] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end((endpoint, key))
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_fetch(self, endpoint: str, key: Hashable, fetch_function: Callable[[], object],
+                     contains_ssn: bool=False) -> object:
+        """
+        Return the cached value for the endpoint and key, calling fetch_function and caching its result on a miss.
+
+        :param endpoint: endpoint name (e.g. EMPLOYEES_ENDPOINT)
+        :param key: hashable key for the query (e.g. tuple of client_id, legal_id and the filters)
+        :param fetch_function: function called with no arguments to get the value on a miss
+        :param contains_ssn: True if the value includes SSNs (not cached unless cache_ssn is True)
+        :return: the cached or fetched value (a copy of it if copy_values is True)
+        """
+        if contains_ssn and not self.cache_ssn:
+            return fetch_function()
+
+        hit, value = self.get(endpoint, key)
+
+        if not hit:
+            value = fetch_function()
+            self.put(endpoint, key, value)
+            value = self.copy(value)  # the cache keeps the fetched value
+
+        return value
+
+    def invalidate(self, endpoint: str|None=None, client_id: str|None=None, legal_id: str|None=None) -> int:
+        """
+        Remove entries from the cache. With no arguments the whole cache is cleared.
+
+        :param endpoint: only remove entries for this endpoint
+        :param client_id: only remove entries for this client id (the first item of the key)
+        :param legal_id: only remove entries for this legal id (the second item of the key)
+        :return: number of entries removed
+        """
+        def matches(cache_key) -> bool:
+            entry_endpoint, key = cache_key
+            key = key if isinstance(key, tuple) else (key,)
+            return ((endpoint is None or entry_endpoint == endpoint) and
+                    (client_id is None or (len(key) > 0 and key[0] == client_id)) and
+                    (legal_id is None or (len(key) > 1 and key[1] == legal_id)))
+
+        with self._lock:
+            remove_keys = [cache_key for cache_key in self._entries if matches(cache_key)]
+
+            for cache_key in remove_keys:
+                del self._entries[cache_key]
+
+        return len(remove_keys)
+
+    def stats(self) -> dict:
+        # return the cache counters
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries)}
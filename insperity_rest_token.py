@@ -0,0 +1,102 @@
+"""
+Token manager for the Insperity REST API
+
+A TokenManager is the token dictionary (access_token, refresh_token, client_code) returned by
+get_client_credential_token, so it can be passed anywhere a token_dict is used. It also knows when the access token
+expires, and refreshes it shortly before it does. The refresh is thread-safe and single-flight: when several threads
+find the token expired (or get a 401) at the same time, one of them refreshes it and the others wait for and use the
+new token instead of each calling the /token endpoint.
+
+Len Wanger
+2025
+"""
+
+from collections.abc import Callable
+import threading
+import time
+
+
+DEFAULT_REFRESH_MARGIN = 60.0  # refresh the access token this many seconds before it expires
+
+_shared_refresh_lock = threading.Lock()  # used to refresh plain token dictionaries (not TokenManagers)
+
+
+def get_expires_at(response_dict: dict) -> float|None:
+    # return the time (time.time() seconds) the access token in a token endpoint response expires, or None if unknown
+    expires_in = response_dict.get('expires_in', None)
+
+    if expires_in is None:
+        return None
+
+    return time.time() + float(expires_in)
+
+
+def refresh_token_dict(token_dict: dict, stale_access_token: str|None, refresh_function: Callable[[dict], dict]) -> str:
+    """
+    Refresh the access token in token_dict (in place) and return the new access token.
+
+    Single-flight: if the access token in token_dict is no longer stale_access_token, another thread has already
+    refreshed it while this one was waiting for the lock, so the current token is returned without calling
+    refresh_function again.
+
+    :param token_dict: token dictionary (or TokenManager) to refresh
+    :param stale_access_token: the access token the caller found expired (None to always refresh)
+    :param refresh_function: function called with token_dict that returns a new token dictionary
+    :return: the current access token
+    """
+    lock = token_dict.lock if isinstance(token_dict, TokenManager) else _shared_refresh_lock
+
+    with lock:
+        if (stale_access_token is None) or (token_dict['access_token'] == stale_access_token):
+            new_token_dict = refresh_function(token_dict)
+            token_dict['refresh_token'] = new_token_dict['refresh_token']
+            token_dict['expires_at'] = new_token_dict.get('expires_at', None)
+            token_dict['access_token'] = new_token_dict['access_token']  # set last -- used for the stale check
+
+            on_refresh = getattr(token_dict, 'on_refresh', None)
+            if on_refresh is not None:
+                on_refresh(token_dict)
+
+        return token_dict['access_token']
+
+
+class TokenManager(dict):
+    """
+    Token dictionary that refreshes its access token before it expires.
+
+    :param token_dict: dictionary with access_token, refresh_token, client_code and (optionally) expires_at
+    :param refresh_function: function called with the token dictionary that returns a new token dictionary
+    :param refresh_margin: refresh the access token this many seconds before it expires
+
+    on_refresh can be set to a function that is called with the TokenManager each time the token is refreshed (e.g.
+    to save the new token in the credential cache).
+    """
+    def __init__(self, token_dict: dict, refresh_function: Callable[[dict], dict]|None=None,
+                 refresh_margin: float=DEFAULT_REFRESH_MARGIN):
+        super().__init__(token_dict)
+        self.setdefault('expires_at', None)
+        self.refresh_function = refresh_function
+        self.refresh_margin = refresh_margin
+        self.lock = threading.Lock()
+        self.on_refresh = None
+
+    def expires_soon(self) -> bool:
+        # return True if the access token expires within refresh_margin seconds (False if the expiry is unknown)
+        expires_at = self.get('expires_at', None)
+        return (expires_at is not None) and (time.time() >= expires_at - self.refresh_margin)
+
+    def refresh(self, stale_access_token: str|None=None) -> str:
+        # refresh the access token (single-flight, see refresh_token_dict) and return the new access token
+        if self.refresh_function is None:
+            raise ValueError("TokenManager has no refresh_function")
+
+        return refresh_token_dict(self, stale_access_token, self.refresh_function)
+
+    def get_access_token(self) -> str:
+        # return the access token, refreshing it first if it is about to expire
+        access_token = self['access_token']
+
+        if self.expires_soon() and (self.refresh_function is not None):
+            access_token = self.refresh(stale_access_token=access_token)
+
+        return access_token
@@ -1,15 +1,46 @@
 """
 Types/Classes used for calling the Insperity REST API endpoints
 
+Employee and MinimalEmployee are slotted dataclasses (no per-instance __dict__). LazyEmployee and LazyMinimalEmployee
+have the same fields, but wrap the raw dictionary returned by the REST API and only look up (and convert) a field when
+it is read -- for large employee lists where most of the fields are never used:
+
+    employee = LazyEmployee(raw_employee_dict)
+    print(employee.hire_date)  # hireDate is parsed to a date here, the first time it is read
+
 Len Wanger
 2025
 """
 
-from dataclasses import dataclass
-from datetime import date, timedelta
+from dataclasses import dataclass, fields
+from datetime import datetime, date, timedelta
+
+
+def string_to_date(date_str: str) -> date:
+    try:
+        return datetime.fromisoformat(date_str).date()
+    except TypeError:
+        return None
+
+
+class _EmployeeMethods:
+    # methods shared by Employee and LazyEmployee
+    __slots__ = ()
+
+    def age(self) -> float:
+        # return age in years
+        return (date.today() - self.birth_date) / timedelta(days=365.25)
+
+    def older_than(self, years_old: int) -> bool:
+        # return true if employee is older than given age
+        return self.age() >= years_old
+
+    def tenure(self) -> int:
+        # return days since hire
+        return (date.today() - self.hire_date).days
 
 
-@dataclass
+@dataclass(slots=True)
 class MinimalEmployee:
     id: str
     time_clock_id: str
@@ -29,8 +60,8 @@ class MinimalEmployee:
     job_title: str
 
 
-@dataclass
-class Employee:
+@dataclass(slots=True)
+class Employee(_EmployeeMethods):
     id: str
     time_clock_id: str
     employee_number: str
@@ -62,17 +93,132 @@ class Employee:
     annual_salary: float = 0.0
     ssn: str = None
 
-    def age(self) -> float:
-        # return age in years
-        return (date.today() - self.birth_date) / timedelta(days=365.25)
 
-    def older_than(self, years_old: int) -> bool:
-        # return true if employee is older than given age
-        return self.age() >= years_old
+##############################################################################################################
+# Lazy employee records -- fields are read from the raw REST API dictionary when they are used
+##############################################################################################################
+class _RawField:
+    # descriptor for a field of a lazy record. The value is looked up in the raw dictionary by a path of keys
+    #   (default if a key is missing or the value is None). Converted values are cached on the record, so the
+    #   conversion is only done once.
+    __slots__ = ('path', 'convert', 'default', 'name')
 
-    def tenure(self) -> int:
-        # return days since hire
-        return (date.today() - self.hire_date).days
+    def __init__(self, *path: str, convert=None, default=None):
+        self.path = path
+        self.convert = convert
+        self.default = default
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, record, owner=None):
+        if record is None:
+            return self
+
+        if (self.convert is not None) and (record._values is not None) and (self.name in record._values):
+            return record._values[self.name]
+
+        value = record._raw
+        for key in self.path:
+            value = value.get(key, None)
+            if value is None:
+                return self.default
+
+        if self.convert is not None:
+            value = self.convert(value)
+
+            if record._values is None:
+                record._values = {}
+            record._values[self.name] = value
+
+        return value
+
+
+class _LazyRecord:
+    # base class of the lazy records -- wraps the raw dictionary from the REST API
+    __slots__ = ('_raw', '_values')
+    record_class = None  # dataclass built by materialize
+
+    def __init__(self, raw: dict):
+        self._raw = raw
+        self._values = None  # converted field values, created when the first converted field is read
+
+    @property
+    def raw(self) -> dict:
+        return self._raw
+
+    def materialize(self):
+        # return the eager record (Employee or MinimalEmployee) with all of the fields read
+        return self.record_class(**{field.name: getattr(self, field.name) for field in fields(self.record_class)})
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._raw == other._raw
+
+    def __repr__(self) -> str:
+        field_strs = ", ".join(f"{field.name}={getattr(self, field.name)!r}" for field in fields(self.record_class))
+        return f"{type(self).__name__}({field_strs})"
+
+
+class LazyMinimalEmployee(_LazyRecord):
+    # MinimalEmployee that reads its fields from the raw employeesMinimal dictionary when they are used
+    __slots__ = ()
+    record_class = MinimalEmployee
+
+    id = _RawField('id')
+    time_clock_id = _RawField('timeclockId')
+    employee_number = _RawField('employeeNumber')
+    formal_name = _RawField('formalName')
+    first_name = _RawField('firstName')
+    last_name = _RawField('lastName')
+    middle_initial = _RawField('middleInitial')
+    city = _RawField('city')
+    state = _RawField('state')
+    email = _RawField('selfServiceEmail')
+    hire_date = _RawField('hireDate', convert=string_to_date)
+    employment_status = _RawField('employmentStatus')
+    is_manager = _RawField('isManager')
+    is_supervisor = _RawField('isSupervisor')
+    job_code = _RawField('job_code')
+    job_title = _RawField('jobTitle')
+
+
+class LazyEmployee(_EmployeeMethods, _LazyRecord):
+    # Employee that reads its fields from the raw employees dictionary when they are used
+    __slots__ = ()
+    record_class = Employee
+
+    id = _RawField('id')
+    time_clock_id = _RawField('timeclockId')
+    employee_number = _RawField('employeeNumber')
+    first_name = _RawField('nameAddress', 'firstName')
+    last_name = _RawField('nameAddress', 'lastName')
+    middle_name = _RawField('nameAddress', 'middleName')
+    birth_date = _RawField('birthDate', convert=string_to_date)
+    gender = _RawField('gender')
+    marital_status = _RawField('maritalStatus')
+    address1 = _RawField('nameAddress', 'address1')
+    address2 = _RawField('nameAddress', 'address2')
+    city = _RawField('nameAddress', 'city')
+    state = _RawField('nameAddress', 'state')
+    zip_code = _RawField('nameAddress', 'zipCode')
+    email = _RawField('emailAddress')
+    phone_number = _RawField('personal', 'homePhone')
+    hire_date = _RawField('hireDate', convert=string_to_date)
+    employment_status = _RawField('employmentStatus')
+    employment_category_code = _RawField('employmentCategoryCode')
+    employment_category_fulltime_equivalent = _RawField('employmentCategoryFullTimeEquivalent')
+    pay_type = _RawField('payType')
+    assigned_manager_name = _RawField('assignedManager', 'employeeName')
+    assigned_manager_id = _RawField('assignedManager', 'id')
+    job_id = _RawField('jobId')
+    job_title = _RawField('jobTitle')
+    work_location = _RawField('workLocation')
+    legal_code = _RawField('legalCode')
+    hourly_rate = _RawField('hourlyRate', convert=float, default=0.0)
+    annual_salary = _RawField('annualSalary', convert=float, default=0.0)
+    ssn = _RawField('ssn')
 
 
 if __name__ == '__main__':
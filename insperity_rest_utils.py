@@ -8,10 +8,24 @@ Len Wanger
 """
 
 import base64
+from collections.abc import Iterable, Iterator
 from datetime import datetime, date
+import hashlib
+import json
+import math
 import os
+import queue
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
-from insperity_rest_types import Employee, MinimalEmployee
+# string_to_date moved to insperity_rest_types -- it is imported here so existing imports keep working
+from insperity_rest_types import Employee, MinimalEmployee, LazyEmployee, LazyMinimalEmployee, string_to_date
+
+
+PAGE_NUMBER_PARAMS = ('pageNumber', 'page', 'pageIndex', 'currentPage')  # query params holding a page number
+PAGE_OFFSET_PARAMS = ('offset', 'skip', 'start')  # query params holding a record offset
+TOTAL_PAGES_KEYS = ('totalPages', 'pageCount')  # response keys holding the number of pages
+TOTAL_RECORDS_KEYS = ('totalCount', 'totalRecords', 'totalRecordCount', 'totalItems')  # response keys w/ # of records
 
 ##############################################################################################################
 # Utility routines used by endpoints
@@ -36,12 +50,140 @@ def get_headers(access_token: str, essScope: str="Employee") -> dict:
     }
 
 
-def string_to_date(date_str: str) -> date:
+_END_OF_ITERATION = object()  # sentinel put on the queue by iter_in_background when the iterable is done
+
+
+def iter_in_background(iterable: Iterable, buffer_size: int=2) -> Iterator:
+    """
+    Iterate over an iterable in a background thread, so the next items are produced while the consumer works on the
+    current one. At most buffer_size items are produced ahead of the consumer (back-pressure). Exceptions raised by
+    the iterable are re-raised in the consumer. Closing the returned generator (or breaking out of a for loop over it)
+    tells the background thread to stop and returns right away -- the consumer doesn't wait for it. The (daemon)
+    thread finishes the item it is producing (e.g. an in-flight page request), drops it, and closes the iterable.
+
+    :param iterable: iterable to run in the background (e.g. an iterator of pages from a multipage response)
+    :param buffer_size: maximum number of items produced ahead of the consumer
+    :return: iterator over the items of iterable
+    """
+    item_queue = queue.Queue(maxsize=max(1, buffer_size))
+    stop_event = threading.Event()
+
+    def put(item) -> bool:
+        # put an item on the queue, giving up if the consumer has stopped. Returns True if the item was queued.
+        while not stop_event.is_set():
+            try:
+                item_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_END_OF_ITERATION, None))
+        except BaseException as e:
+            put((_END_OF_ITERATION, e))
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=producer, name="iter_in_background", daemon=True)
+    thread.start()
+
     try:
-        return datetime.fromisoformat(date_str).date()
-    except TypeError:
+        while True:
+            item, exception = item_queue.get()
+
+            if item is _END_OF_ITERATION:
+                if exception is not None:
+                    raise exception
+                break
+
+            yield item
+    finally:
+        # don't join the thread: it may be in the middle of a request that can take up to the request timeout
+        stop_event.set()
+
+
+def _set_query_param(url: str, name: str, value: int) -> str:
+    # return the url with the value of the query parameter name replaced
+    parts = urlsplit(url)
+    query = [(k, str(value) if k == name else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def get_remaining_page_urls(first_page: dict) -> list[str]|None:
+    """
+    Use the first page of a multipage response to build the urls for all of the remaining pages, so they can be
+    requested at the same time instead of following nextPageUrl one page at a time.
+
+    This only works if the response says how many pages (or records) there are, and nextPageUrl uses a page number
+    or record offset query parameter. If the paging scheme can't be worked out (e.g. nextPageUrl is an opaque
+    cursor) None is returned and the caller should follow nextPageUrl.
+
+    :param first_page: decoded response dictionary for the first page
+    :return: list of urls for pages 2..n, or None if the urls can't be built
+    """
+    next_page_url = first_page.get('nextPageUrl')
+    page_size = first_page.get('pageSize') or len(first_page.get('results', []))
+
+    if next_page_url is None or page_size == 0:
         return None
 
+    total_pages = next((first_page[k] for k in TOTAL_PAGES_KEYS if isinstance(first_page.get(k), int)), None)
+
+    if total_pages is None:
+        total_records = next((first_page[k] for k in TOTAL_RECORDS_KEYS if isinstance(first_page.get(k), int)), None)
+
+        if total_records is None:
+            return None
+
+        total_pages = math.ceil(total_records / page_size)
+
+    query = dict(parse_qsl(urlsplit(next_page_url).query))
+
+    if total_pages < 2:  # the response says there is only one page, but has a nextPageUrl
+        return None
+
+    # the value in nextPageUrl must look like the second page (page 1 or 2, or an offset of one page), otherwise
+    #   the parameter isn't the page counter and the urls are treated as opaque
+    for name in PAGE_NUMBER_PARAMS:
+        if query.get(name, '').isdigit() and int(query[name]) in (1, 2):
+            second_page = int(query[name])  # page numbers may start at 0 or 1
+            page_values = [second_page + i for i in range(total_pages - 1)]
+            break
+    else:
+        for name in PAGE_OFFSET_PARAMS:
+            if query.get(name, '').isdigit() and int(query[name]) == page_size:
+                page_values = [page_size * (i + 1) for i in range(total_pages - 1)]
+                break
+        else:
+            return None
+
+    return [_set_query_param(next_page_url, name, value) for value in page_values]
+
+
+def copy_json(value):
+    # return a deep copy of a decoded JSON value (faster than copy.deepcopy, since only dicts and lists need to be
+    #   copied)
+    if isinstance(value, dict):
+        return {key: copy_json(item) for key, item in value.items()}
+
+    if isinstance(value, list):
+        return [copy_json(item) for item in value]
+
+    return value
+
+
+def employee_content_hash(employee_dict: dict) -> str:
+    # return a hash of the contents of a raw employee record -- used to tell if a record has changed
+    encoded = json.dumps(employee_dict, sort_keys=True, separators=(',', ':')).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
 
 def fill_employee_record(employee_dict: dict) -> Employee:
     # create an Employee object from dictionary returned by get_employees
@@ -83,9 +225,10 @@ def fill_employee_record(employee_dict: dict) -> Employee:
     if annual_salary is not None:
         new_dict['annual_salary'] = float(annual_salary)
 
+    # note: the manager name and id were 1-tuples (e.g. ('400123',)) before the slotted records
     if 'assignedManager' in employee_dict:
-        new_dict['assigned_manager_name'] = employee_dict['assignedManager']['employeeName'],
-        new_dict['assigned_manager_id'] = employee_dict['assignedManager']['id'],
+        new_dict['assigned_manager_name'] = employee_dict['assignedManager']['employeeName']
+        new_dict['assigned_manager_id'] = employee_dict['assignedManager']['id']
     else:
         new_dict['assigned_manager_name'] = new_dict['assigned_manager_id'] = None
 
@@ -99,7 +242,7 @@ def fill_minimal_employee_record(employee_dict: dict) -> Employee:
         'formal_name': employee_dict['formalName'],
         'first_name': employee_dict['firstName'],
         'last_name': employee_dict['lastName'],
-        'middle_initial': ['middleInitial'],
+        'middle_initial': employee_dict.get('middleInitial', None),  # note: was the list ['middleInitial']
         'city': employee_dict['city'],
         'state': employee_dict['state'],
         'employee_number': employee_dict['employeeNumber'],
@@ -0,0 +1,308 @@
+"""
+Weekly hours from timecard data, for many employees at once
+
+get_weekly_hours pulls the timecard data for a list of employees over a date range and adds up the hours each
+employee worked in each ISO week (Monday to Sunday):
+
+    weekly_hours = get_weekly_hours(token_dict, client_id, legal_id, employees, start_date, end_date,
+                                    cache=TimecardWeekCache("timecard_weeks.db"))
+    averages = weekly_hours.average_per_week()         # array, one average per employee
+    hours_worked = weekly_hours.hours_by_employee()     # {employee id: total hours}, e.g. for AverageHoursRule
+
+Long date ranges are split into windows of whole weeks, and the (employee, window) requests are made in parallel.
+The result is a NumPy array with a row per employee and a column per week. Weeks that are over (ended before today)
+don't change, so if a TimecardWeekCache is given their hours are saved and are not requested again.
+
+The timecardData record format isn't documented. Each record is read from one date key and one hours key (workDate
+and hours, as served by insperity_mock_server -- pass date_key and hours_key if the live API uses other names). A
+record without a valid date or hours is an error for its employee rather than 0 hours: the employee is put in
+errors and its row of hours is NaN. Records with a day outside of the requested weeks are counted in
+skipped_records.
+
+Len Wanger
+2025
+"""
+
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+import sqlite3
+import threading
+
+import numpy as np
+
+from insperity_rest_api import get_employee_timecard_data_raw
+from insperity_rest_client import get_default_client
+from insperity_rest_fanout import DEFAULT_FANOUT_WORKERS, get_employee_id
+from insperity_rest_types import string_to_date
+
+
+DEFAULT_WINDOW_WEEKS = 4  # number of weeks of timecard data to request at a time
+DEFAULT_TIMECARD_DATE_KEY = 'workDate'  # key of the day of a timecard record
+DEFAULT_TIMECARD_HOURS_KEY = 'hours'  # key of the hours of a timecard record (all of the hours, including overtime)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS weekly_hours (
+    legal_id TEXT NOT NULL,
+    employee_id TEXT NOT NULL,
+    week_start TEXT NOT NULL,
+    hours REAL NOT NULL,
+    PRIMARY KEY (legal_id, employee_id, week_start)
+);
+"""
+
+
+def week_start(day: date) -> date:
+    # return the Monday of the ISO week of a day
+    return day - timedelta(days=day.weekday())
+
+
+def split_into_windows(start_date: date, end_date: date, window_weeks: int=DEFAULT_WINDOW_WEEKS) -> list[tuple[date, date]]:
+    # split a date range into (start, end) windows of whole ISO weeks, window_weeks weeks long (the last may be
+    #   shorter). The first window starts on the Monday of start_date's week.
+    windows = []
+    window_start = week_start(start_date)
+
+    while window_start <= end_date:
+        window_end = window_start + timedelta(weeks=window_weeks, days=-1)
+        windows.append((window_start, min(window_end, end_date)))
+        window_start = window_end + timedelta(days=1)
+
+    return windows
+
+
+def timecard_day_hours(record: dict, date_key: str=DEFAULT_TIMECARD_DATE_KEY,
+                       hours_key: str=DEFAULT_TIMECARD_HOURS_KEY) -> tuple[date, float]:
+    # return the (day, hours) of a raw timecard record -- raises ValueError if either can't be read
+    day = record.get(date_key, None)
+    hours = record.get(hours_key, None)
+
+    if isinstance(day, str):
+        day = string_to_date(day)
+
+    if not isinstance(day, date):
+        raise ValueError(f"timecard record has no valid {date_key}: {record}")
+
+    if isinstance(hours, bool) or not isinstance(hours, (int, float, str)):
+        raise ValueError(f"timecard record has no valid {hours_key}: {record}")
+
+    try:
+        return day, float(hours)
+    except ValueError:
+        raise ValueError(f"timecard record has no valid {hours_key}: {record}") from None
+
+
+@dataclass
+class WeeklyHours:
+    employee_ids: list[str]
+    week_starts: list[date]
+    hours: np.ndarray  # float32 array, hours[employee row, week column] (NaN for the employees in errors)
+    errors: dict[str, Exception] = field(default_factory=dict)  # employee id -> error getting or reading the timecards
+    skipped_records: dict[str, int] = field(default_factory=dict)  # employee id -> records with a day out of range
+
+    def row(self, employee_id: str) -> np.ndarray:
+        # return the weekly hours of one employee
+        return self.hours[self.employee_ids.index(employee_id)]
+
+    def total_per_employee(self) -> np.ndarray:
+        return self.hours.sum(axis=1, dtype=np.float64)
+
+    def average_per_week(self) -> np.ndarray:
+        # return the average hours per week of each employee over all of the weeks
+        return self.total_per_employee() / max(1, len(self.week_starts))
+
+    def hours_by_employee(self) -> dict[str, float]:
+        # return a dictionary of employee id to total hours (e.g. hours_worked for the eligibility AverageHoursRule).
+        #   The employees in errors are left out.
+        return {employee_id: total for employee_id, total in zip(self.employee_ids, self.total_per_employee().tolist())
+                if employee_id not in self.errors}
+
+
+class TimecardWeekCache:
+    """
+    SQLite cache of the hours worked per employee per finished week.
+
+    :param db_path: path of the SQLite database file (":memory:" for an in-memory cache)
+    """
+    def __init__(self, db_path: str=":memory:"):
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+        with self.lock, self.connection:
+            self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def load(self, legal_id: str, employee_ids: list[str], first_week: date,
+             last_week: date) -> dict[tuple[str, date], float]:
+        # return the cached hours for the employees and weeks, as a dictionary of (employee id, week start) to hours
+        cached = {}
+        employee_id_set = set(employee_ids)
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT employee_id, week_start, hours FROM weekly_hours "
+                "WHERE legal_id = ? AND week_start BETWEEN ? AND ?",
+                (legal_id, first_week.isoformat(), last_week.isoformat())).fetchall()
+
+        for employee_id, week_start_str, hours in rows:
+            if employee_id in employee_id_set:
+                cached[(employee_id, date.fromisoformat(week_start_str))] = hours
+
+        return cached
+
+    def save(self, legal_id: str, week_hours: Iterable[tuple[str, date, float]]):
+        # save (employee id, week start, hours) values
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO weekly_hours (legal_id, employee_id, week_start, hours) VALUES (?, ?, ?, ?)",
+                [(legal_id, employee_id, week.isoformat(), hours) for employee_id, week, hours in week_hours])
+
+
+def _uncached_windows(weeks: list[date], cached_weeks: set[date], window_weeks: int) -> list[tuple[date, date]]:
+    # group the consecutive weeks that aren't cached into (start, end) windows of at most window_weeks weeks
+    windows = []
+    run = []
+
+    for week in weeks + [None]:
+        if (week is not None) and (week not in cached_weeks) and (len(run) < window_weeks):
+            run.append(week)
+            continue
+
+        if run:
+            windows.append((run[0], run[-1] + timedelta(days=6)))
+
+        run = [week] if (week is not None) and (week not in cached_weeks) else []
+
+    return windows
+
+
+def get_weekly_hours(token_dict: dict, client_id: str, legal_id: str, employees: Iterable, start_date: date,
+                     end_date: date, cache: TimecardWeekCache|None=None, window_weeks: int=DEFAULT_WINDOW_WEEKS,
+                     max_workers: int=DEFAULT_FANOUT_WORKERS,
+                     fetch_function: Callable[..., list[dict]]=get_employee_timecard_data_raw,
+                     date_key: str=DEFAULT_TIMECARD_DATE_KEY, hours_key: str=DEFAULT_TIMECARD_HOURS_KEY) -> WeeklyHours:
+    """
+    Get the hours each employee worked in each ISO week from start_date to end_date.
+
+    :param token_dict:
+    :param client_id:
+    :param legal_id:
+    :param employees: Employee/MinimalEmployee objects, raw employee dicts or employee id strings
+    :param start_date: first day of the range (the whole week it is in is included)
+    :param end_date: last day of the range
+    :param cache: TimecardWeekCache to read and save the hours of finished weeks (None for no caching)
+    :param window_weeks: number of weeks of timecard data to request at a time
+    :param max_workers: maximum number of requests to run at the same time (capped at the default client's
+        pool_maxsize)
+    :param fetch_function: function to get the raw timecard records for an employee and date range
+    :param date_key: key of the day of a timecard record
+    :param hours_key: key of the hours of a timecard record
+    :return: WeeklyHours (employees whose timecards couldn't be read are in errors, with NaN hours)
+    """
+    employee_ids = [get_employee_id(employee) for employee in employees]
+    weeks = [window[0] for window in split_into_windows(start_date, end_date, window_weeks=1)]
+    week_columns = {week: column for column, week in enumerate(weeks)}
+    employee_rows = {employee_id: row for row, employee_id in enumerate(employee_ids)}
+    hours = np.zeros((len(employee_ids), len(weeks)), dtype=np.float32)
+    errors = {}
+    skipped_records = {}
+
+    if len(weeks) == 0:
+        return WeeklyHours(employee_ids, weeks, hours, errors, skipped_records)
+
+    # fill in the cached weeks and make a list of the (employee, window) requests for the rest
+    cached = cache.load(legal_id, employee_ids, weeks[0], weeks[-1]) if cache is not None else {}
+    cached_weeks = {employee_id: set() for employee_id in employee_ids}
+
+    for (employee_id, week), week_hours in cached.items():
+        hours[employee_rows[employee_id], week_columns[week]] = week_hours
+        cached_weeks[employee_id].add(week)
+
+    tasks = [(employee_id, window_start, window_end) for employee_id in employee_ids
+             for window_start, window_end in _uncached_windows(weeks, cached_weeks[employee_id], window_weeks)]
+
+    def fetch(task: tuple[str, date, date]) -> list[dict]|Exception:
+        employee_id, window_start, window_end = task
+        try:
+            return fetch_function(token_dict=token_dict, client_id=client_id, legal_id=legal_id,
+                                  employee_id=employee_id, start_date=window_start, end_date=min(window_end, end_date))
+        except Exception as e:
+            return e
+
+    finished_week_hours = []
+    today = date.today()
+
+    # more workers than pooled connections would open (and throw away) extra connections (see fan_out)
+    max_workers = max(1, min(max_workers, get_default_client().pool_maxsize, len(tasks)))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for (employee_id, window_start, window_end), records in zip(tasks, executor.map(fetch, tasks)):
+            if isinstance(records, Exception):
+                errors[employee_id] = records
+                continue
+
+            if employee_id in errors:
+                continue
+
+            row = employee_rows[employee_id]
+            try:
+                for record in records:
+                    day, day_hours = timecard_day_hours(record, date_key, hours_key)
+                    column = week_columns.get(week_start(day), None)
+
+                    if column is not None:
+                        hours[row, column] += day_hours
+                    else:
+                        skipped_records[employee_id] = skipped_records.get(employee_id, 0) + 1
+            except ValueError as e:
+                errors[employee_id] = e
+                continue
+
+            # only finished weeks (all of the week is in the range and before today) are cached
+            week = window_start
+            while week <= window_end:
+                if (week + timedelta(days=6) < today) and (week + timedelta(days=6) <= end_date):
+                    finished_week_hours.append((employee_id, week, float(hours[row, week_columns[week]])))
+                week += timedelta(weeks=1)
+
+    if (cache is not None) and finished_week_hours:
+        cache.save(legal_id, [week_hours for week_hours in finished_week_hours if week_hours[0] not in errors])
+
+    for employee_id in errors:  # the hours of these employees aren't known
+        hours[employee_rows[employee_id]] = np.nan
+
+    return WeeklyHours(employee_ids, weeks, hours, errors, skipped_records)
+
+
+def get_hours_worked(token_dict: dict, client_id: str, legal_id: str, employees: Iterable, lookback_weeks: int,
+                     as_of: date|None=None, cache: TimecardWeekCache|None=None,
+                     max_workers: int=DEFAULT_FANOUT_WORKERS, ignore_errors: bool=False) -> dict[str, float]:
+    """
+    Get the total hours each employee worked in the lookback_weeks full weeks before as_of (e.g. for the
+    AverageHoursRule of the benefits eligibility rules).
+
+    :param ignore_errors: if False, raise ValueError if the timecards of any employee couldn't be read. If True,
+        those employees are left out of the result.
+    :return: dictionary of employee id to hours worked
+    """
+    as_of = as_of if as_of is not None else date.today()
+    end_date = week_start(as_of) - timedelta(days=1)  # end of the last full week
+    start_date = end_date - timedelta(weeks=lookback_weeks, days=-1)
+    weekly_hours = get_weekly_hours(token_dict, client_id, legal_id, employees, start_date, end_date, cache=cache,
+                                    max_workers=max_workers)
+
+    if weekly_hours.errors and not ignore_errors:
+        employee_id, error = next(iter(weekly_hours.errors.items()))
+        raise ValueError(f"couldn't get the hours of {len(weekly_hours.errors)} employee(s) (e.g. {employee_id}: "
+                         f"{error})")
+
+    return weekly_hours.hours_by_employee()
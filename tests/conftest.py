@@ -0,0 +1,75 @@
+"""
+Shared pytest fixtures for the offline tests -- each test that asks for server gets its own MockInsperityServer,
+with the REST API functions pointed at it and a new default client, so the tests need no credentials or network.
+
+Len Wanger
+2025
+"""
+
+import pytest
+
+from insperity_mock_server import MockInsperityServer, MockServerConfig
+import insperity_rest_api as api
+from insperity_rest_client import InsperityClient, set_default_client
+from insperity_rest_metrics import InsperityMetrics
+from insperity_rest_ratelimit import RetryPolicy
+
+
+collect_ignore = ["test_fastmcp.py"]  # needs a running MCP server (see the file)
+
+CLIENT_CODE = "MOCK"
+FAST_RETRY_POLICY = RetryPolicy(base_delay=0.01, max_delay=0.05)
+
+
+@pytest.fixture(autouse=True)
+def mock_environment(monkeypatch):
+    # credentials for the mock server, and no credential cache file
+    monkeypatch.setenv('INSPERITY_CLIENT_ID', "mock_client_id")
+    monkeypatch.setenv('INSPERITY_SECRET', "mock_secret")
+    monkeypatch.delenv('INSPERITY_CREDENTIAL_CACHE', raising=False)
+
+
+@pytest.fixture
+def client():
+    # a new default client for each test (with its own metrics and short retry delays)
+    test_client = InsperityClient(retry_policy=FAST_RETRY_POLICY, metrics=InsperityMetrics())
+    old_client = set_default_client(test_client)
+    yield test_client
+    set_default_client(old_client)
+    test_client.close()
+
+
+@pytest.fixture
+def make_server(client):
+    # function to start a mock server (closed at the end of the test) with the REST API functions pointed at it
+    servers = []
+
+    def start(**config) -> MockInsperityServer:
+        config.setdefault('retry_after', 0.01)
+        mock_server = MockInsperityServer(MockServerConfig(**config)).start()
+        servers.append(mock_server)
+        api.set_base_url(mock_server.base_url)
+        return mock_server
+
+    yield start
+
+    for mock_server in servers:
+        mock_server.stop()
+    api.set_base_url(None)
+
+
+@pytest.fixture
+def server(make_server):
+    return make_server(employees=500, legals=2, page_size=50)
+
+
+@pytest.fixture
+def credentials(server):
+    return api.get_credentials(client_code=CLIENT_CODE)
+
+
+@pytest.fixture
+def legal_employee_ids(server, credentials) -> list[str]:
+    # ids of the employees of the credentials' legal, in order
+    workforce = server.workforce
+    return [workforce.employee_id(index) for index in workforce.legal_indexes(credentials[2])]
@@ -0,0 +1,95 @@
+"""
+Tests of the benefits eligibility rules engine
+
+Len Wanger
+2025
+"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from insperity_benefits_eligibility import (DEFAULT_RULES, AllOf, AnyOf, AverageHoursRule, FteRule, PayTypeRule,
+                                            StatusRule, TenureRule, evaluate_eligibility, evaluate_legals,
+                                            pay_type_mask)
+from insperity_employee_table import EmployeeTable
+
+
+AS_OF = date(2025, 6, 1)
+
+
+def raw_employee(employee_id: str, status="Active", pay_type="Salary", fte="1.0", hire_date="2020-01-01T00:00:00"):
+    return {'id': employee_id, 'employmentStatus': status, 'payType': pay_type,
+            'employmentCategoryFullTimeEquivalent': fte, 'hireDate': hire_date}
+
+
+@pytest.fixture
+def table() -> EmployeeTable:
+    return EmployeeTable.from_raw([
+        raw_employee("salaried"),
+        raw_employee("auto_salary_lower_case", pay_type="auto salary"),
+        raw_employee("hourly_full_time", pay_type="Hourly"),
+        raw_employee("hourly_part_time", pay_type="Hourly", fte="0.5"),
+        raw_employee("terminated", status="Terminated"),
+        raw_employee("new_hire", hire_date="2025-05-01T00:00:00"),
+        raw_employee("no_fte", fte=None),
+    ])
+
+
+def test_default_rules(table):
+    # hourly employees need to average 30 hours a week over the 12 week lookback
+    hours_worked = {"hourly_full_time": 12 * 40.0, "hourly_part_time": 12 * 20.0}
+    result = evaluate_eligibility(table, DEFAULT_RULES, hours_worked=hours_worked, as_of=AS_OF)
+
+    assert result.eligible_ids() == {"salaried", "auto_salary_lower_case", "hourly_full_time", "new_hire", "no_fte"}
+    ineligible = result.ineligible()
+    assert set(ineligible) == {"hourly_part_time", "terminated"}
+    assert ineligible["terminated"] == "employment status not in Active"
+    assert "pay type not in" in ineligible["hourly_part_time"] and "hours/week" in ineligible["hourly_part_time"]
+
+
+def test_rule_reasons(table):
+    # AllOf reports each of its rules that failed
+    rules = AllOf(StatusRule(), FteRule(0.75), TenureRule(90))
+    result = evaluate_eligibility(table, rules, as_of=AS_OF)
+
+    assert result.ineligible() == {"hourly_part_time": "FTE below 0.75", "terminated": "employment status not in Active",
+                                   "new_hire": "employed less than 90 days", "no_fte": "FTE below 0.75"}
+    assert len(result.eligible()) == 3
+
+
+def test_pay_types_are_case_insensitive(table):
+    assert pay_type_mask(table).tolist() == [True, True, False, False, True, True, True]
+    assert np.array_equal(pay_type_mask(table, ("HOURLY",)), ~pay_type_mask(table))
+
+    result = evaluate_eligibility(table, AnyOf(PayTypeRule(("salary", "AUTO SALARY"))))
+    assert result.eligible_ids() == set(table.id[pay_type_mask(table)].tolist())
+
+
+def test_average_hours_without_hours(table):
+    # employees without hours are treated as averaging 0 hours a week
+    result = evaluate_eligibility(table, AllOf(AverageHoursRule(30.0)), hours_worked={"salaried": 12 * 30.0})
+    assert result.eligible_ids() == {"salaried"}
+
+
+def test_empty_rule_lists_are_rejected():
+    with pytest.raises(ValueError):
+        AllOf()
+
+    with pytest.raises(ValueError):
+        AnyOf()
+
+
+def test_evaluate_legals(server, credentials):
+    token_dict, client_id, _ = credentials
+    workforce = server.workforce
+
+    results = evaluate_legals(token_dict, client_id, workforce.legal_ids, AllOf(StatusRule(("Active", "Terminated"))))
+
+    assert list(results) == [str(legal_id) for legal_id in workforce.legal_ids]
+    for legal_id, result in results.items():
+        assert len(result.table) == len(workforce.legal_indexes(legal_id))
+
+    with pytest.raises(ValueError):
+        evaluate_legals(token_dict, client_id, ["no_such_legal"])
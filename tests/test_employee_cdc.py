@@ -0,0 +1,49 @@
+"""
+Tests of the change data capture between employee snapshots
+
+Len Wanger
+2025
+"""
+
+import copy
+
+from insperity_employee_cdc import EmployeeChangeTracker, FIELD_CHANGE, HIRE, REHIRE, REMOVED, TERMINATION
+from insperity_mock_server import SyntheticWorkforce
+
+
+def test_change_events():
+    workforce = SyntheticWorkforce(50, ['1'], seed=3)
+    day_1 = [workforce.employee(index) for index in range(50)]
+    day_2 = copy.deepcopy(day_1)
+
+    terminated = next(raw for raw in day_2 if raw['employmentStatus'] == "Active")
+    terminated['employmentStatus'] = "Terminated"
+    rehired = next(raw for raw in day_2 if raw['employmentStatus'] == "Terminated" and raw is not terminated)
+    rehired['employmentStatus'] = "Active"
+    email_changed = next(raw for raw in day_2 if raw not in (terminated, rehired))
+    email_changed['emailAddress'] = "new@example.com"
+    address_changed = next(raw for raw in day_2 if raw not in (terminated, rehired, email_changed))
+    address_changed['nameAddress']['city'] = "Elsewhere"  # not a tracked field
+    removed = day_2.pop()
+    hired = workforce.employee(50)
+    day_2.append(hired)
+
+    tracker = EmployeeChangeTracker()
+    change_set = tracker.detect_changes('legal', iter(day_1))
+    assert change_set.first_snapshot and not change_set.events
+
+    change_set = tracker.detect_changes('legal', iter(day_2))
+    events = {(event.change_type, event.employee_id) for event in change_set.events}
+
+    assert events == {(TERMINATION, terminated['id']), (REHIRE, rehired['id']),
+                      (FIELD_CHANGE, email_changed['id']), (HIRE, hired['id']), (REMOVED, removed['id'])}
+    assert change_set.of_type(FIELD_CHANGE)[0].field_changes['email'][1] == "new@example.com"
+    assert change_set.changed == 4
+    assert not tracker.detect_changes('legal', iter(day_2)).events
+
+
+def test_pull_changes_keeps_only_the_legal(credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+    change_set = EmployeeChangeTracker().pull_changes(token_dict, client_id, legal_id)
+    assert change_set.first_snapshot
+    assert change_set.seen == len(legal_employee_ids)
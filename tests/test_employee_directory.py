@@ -0,0 +1,113 @@
+"""
+Tests of the in-memory fuzzy employee directory
+
+Len Wanger
+2025
+"""
+
+from dataclasses import fields
+import threading
+
+import pytest
+
+from insperity_employee_directory import EmployeeDirectory, _edit_distance
+from insperity_rest_types import Employee
+
+
+NAMES = [("John", "Smith"), ("Jose", "Smith"), ("Jon", "Smyth"), ("Mary", "Johnson"), ("Maria", "Lopez"),
+         ("Ann", "Lee"), ("Anne", "Leigh"), ("Robert", "Brown")]
+
+
+def make_employee(index: int, first_name: str, last_name: str) -> Employee:
+    values = {field.name: "" for field in fields(Employee)}
+    values.update(id=f"E{index}", first_name=first_name, last_name=last_name, employee_number=f"{1000 + index}",
+                  time_clock_id=f"TC{index}", email=f"{first_name[0]}{last_name}@example.com".lower())
+    return Employee(**values)
+
+
+@pytest.fixture
+def directory() -> EmployeeDirectory:
+    return EmployeeDirectory([make_employee(index, *name) for index, name in enumerate(NAMES)])
+
+
+def names(matches) -> list[str]:
+    return [f"{employee.first_name} {employee.last_name}" for employee, _ in matches]
+
+
+def test_edit_distance():
+    assert _edit_distance("smith", "smyth") == 1
+    assert _edit_distance("jon", "john") == 1
+    assert _edit_distance("", "abc") == 3
+
+
+def test_search_names(directory):
+    assert names(directory.search("john smith", limit=1)) == ["John Smith"]
+    assert names(directory.search("smith", limit=2)) == ["John Smith", "Jose Smith"]
+
+    # misspelled and partial names still match
+    assert names(directory.search("jon smth", limit=1)) == ["Jon Smyth"]
+    assert names(directory.search("lope", limit=1)) == ["Maria Lopez"]
+    assert "Robert Brown" in names(directory.search("robret"))
+
+    # the scores are in order, and the limit is respected
+    matches = directory.search("ann", limit=3)
+    assert len(matches) <= 3
+    assert [score for _, score in matches] == sorted((score for _, score in matches), reverse=True)
+    assert names(matches)[0] == "Ann Lee"
+
+
+def test_search_identifiers(directory):
+    assert names(directory.search("mjohnson@example.com"))[0] == "Mary Johnson"
+    assert names(directory.search("1004", limit=1)) == ["Maria Lopez"]
+    assert names(directory.search("tc7", limit=1)) == ["Robert Brown"]
+
+
+def test_search_nothing(directory):
+    assert directory.search("") == []
+    assert directory.search("smith", limit=0) == []
+    assert directory.search("zzzzzz") == []
+
+
+def test_set_employees(directory):
+    directory.set_employees([make_employee(0, "Zelda", "Quinn")])
+    assert len(directory) == 1
+    assert names(directory.search("zelda")) == ["Zelda Quinn"]
+    assert directory.search("smith") == []
+
+    with pytest.raises(ValueError):
+        directory.refresh()  # no loader
+
+
+def test_background_refresh():
+    loads = []
+    reloaded = threading.Event()
+
+    def loader():
+        loads.append(1)
+        if len(loads) > 1:
+            reloaded.set()
+        return [make_employee(len(loads), "Load", f"Number{len(loads)}")]
+
+    directory = EmployeeDirectory(loader=loader, refresh_interval=0.01)
+    try:
+        assert reloaded.wait(5.0)
+    finally:
+        directory.stop()
+
+    assert directory.employees[0].last_name != "Number1"
+
+
+def test_directory_from_api(server, credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+    directory = EmployeeDirectory.from_api(token_dict, client_id, legal_id)
+
+    assert [employee.id for employee in directory.employees] == legal_employee_ids
+
+    employee = directory.employees[10]
+    matches = directory.search(f"{employee.first_name} {employee.last_name}", limit=50)
+    assert employee.id in [match.id for match, _ in matches]
+    assert directory.search(employee.email, limit=1)[0][0].id == employee.id
+
+    server.reset_counts()
+    directory.refresh()
+    assert server.request_counts['employees'] > 0
@@ -0,0 +1,50 @@
+"""
+Tests of the SQLite employee mirror, run against insperity_mock_server
+
+Len Wanger
+2025
+"""
+
+from insperity_employee_mirror import EmployeeMirror
+
+
+def test_mirror_incremental_sync(server, credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+
+    with EmployeeMirror() as mirror:
+        counts = mirror.sync(token_dict, client_id, legal_id)
+        assert (counts['added'], counts['changed'], counts['removed']) == (len(legal_employee_ids), 0, 0)
+        assert mirror.count(legal_id) == len(legal_employee_ids)
+
+        counts = mirror.sync(token_dict, client_id, legal_id)
+        assert (counts['added'], counts['changed'], counts['unchanged']) == (0, 0, len(legal_employee_ids))
+
+        # employees that drop out of the list are flagged as removed, and restored when they come back
+        counts = mirror.sync(token_dict, client_id, legal_id, employee_status_filter="Active")
+        assert counts['removed'] == len(legal_employee_ids) - counts['seen'] > 0
+        assert mirror.count(legal_id) == counts['seen']
+        assert not mirror.with_status("Terminated", legal_id)
+
+        counts = mirror.sync(token_dict, client_id, legal_id)
+        assert (counts['added'], counts['removed']) == (0, 0)
+        assert mirror.count(legal_id) == len(legal_employee_ids)
+
+        # only the changed records are rewritten
+        raw_employees = [server.workforce.employee(index) for index in server.workforce.legal_indexes(legal_id)]
+        raw_employees[0]['emailAddress'] = "changed@example.com"
+        counts = mirror.apply_records(legal_id, iter(raw_employees))
+        assert (counts['changed'], counts['unchanged']) == (1, len(legal_employee_ids) - 1)
+        assert mirror.get(raw_employees[0]['id'], legal_id).email == "changed@example.com"
+
+
+def test_mirror_keeps_each_legal_apart(server, credentials):
+    token_dict, client_id, _ = credentials
+    legal_ids = server.workforce.legal_ids
+
+    with EmployeeMirror() as mirror:
+        for legal_id in legal_ids:
+            mirror.sync(token_dict, client_id, legal_id)
+
+        assert [mirror.count(legal_id) for legal_id in legal_ids] == [
+            len(server.workforce.legal_indexes(legal_id)) for legal_id in legal_ids]
+        assert mirror.count() == server.config.employees
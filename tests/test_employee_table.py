@@ -0,0 +1,87 @@
+"""
+Tests of the columnar NumPy employee table
+
+Len Wanger
+2025
+"""
+
+from datetime import date
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import insperity_rest_api as api
+from insperity_employee_table import EmployeeTable
+
+
+AS_OF = date(2025, 1, 1)
+
+RAW_EMPLOYEES = [
+    {'id': "1", 'nameAddress': {'firstName': "Ann", 'lastName': "Lee", 'state': "TX"}, 'payType': "Hourly",
+     'birthDate': "1985-01-01T00:00:00", 'hireDate': "2024-01-01T00:00:00",
+     'employmentCategoryFullTimeEquivalent': "0.5", 'hourlyRate': "25.50", 'legalCode': "A"},
+    {'id': "2", 'nameAddress': {'firstName': "Bob", 'lastName': "Ray"}, 'payType': "Salary",
+     'birthDate': "1960-07-01T00:00:00", 'hireDate': "2000-01-01T00:00:00",
+     'employmentCategoryFullTimeEquivalent': 1.0, 'annualSalary': "90000", 'legalCode': "B"},
+    {'id': "3", 'nameAddress': None, 'employmentCategoryFullTimeEquivalent': "n/a", 'legalCode': "A"},
+]
+
+
+@pytest.fixture
+def table() -> EmployeeTable:
+    return EmployeeTable.from_raw(RAW_EMPLOYEES)
+
+
+def test_from_raw(table):
+    assert len(table) == 3
+    assert table.id.tolist() == ["1", "2", "3"]
+    assert table.first_name.tolist() == ["Ann", "Bob", ""]
+    assert table["state"].tolist() == ["TX", "", ""]
+    assert table.hire_date[0] == np.datetime64("2024-01-01")
+    assert np.isnat(table.hire_date[2])
+
+    # numbers are converted, and missing or bad values are NaN
+    assert table.fte[:2].tolist() == [0.5, 1.0] and np.isnan(table.fte[2])
+    assert table.hourly_rate[0] == 25.5 and np.isnan(table.hourly_rate[1])
+    assert table.annual_salary[1] == 90000.0
+
+    with pytest.raises(AttributeError):
+        table.no_such_column
+
+
+def test_age_and_tenure(table):
+    assert table.age(AS_OF)[:2] == pytest.approx([40.0, 64.5], abs=0.01)
+    assert np.isnan(table.age(AS_OF)[2])
+    assert table.older_than(50, AS_OF).tolist() == [False, True, False]
+
+    assert table.tenure(AS_OF)[0] == 366.0
+    assert table.tenure_years(AS_OF)[1] == pytest.approx(25.0, abs=0.01)
+    assert np.isnan(table.tenure(AS_OF)[2])
+
+
+def test_filter(table):
+    legal_a = table.filter(table.legal_code == "A")
+    assert legal_a.id.tolist() == ["1", "3"]
+    assert [employee.id for employee in legal_a.employees()] == ["1", "3"]
+
+    assert table[np.array([1])].first_name.tolist() == ["Bob"]
+    assert len(table[table.fte > 2.0]) == 0
+
+
+def test_table_from_api(server, credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+    table = EmployeeTable.from_api(token_dict, client_id, legal_id)
+    assert table.id.tolist() == legal_employee_ids
+
+    # the vectorized methods give the same values as the Employee methods
+    legal_code = api.get_legal_code(token_dict, legal_id)
+    employees = [employee for employee in api.get_employee_list(token_dict, client_id, legal_id)
+                 if employee.legal_code == legal_code]
+    assert [employee.id for employee in employees] == legal_employee_ids
+    assert table.tenure().tolist() == [employee.tenure() for employee in employees]
+    assert table.age() == pytest.approx([employee.age() for employee in employees])
+
+    all_legals = EmployeeTable.from_api(token_dict, client_id, legal_id, all_legals=True)
+    assert len(all_legals) == server.config.employees
+    assert set(all_legals.legal_code.tolist()) == set(str(legal_id) for legal_id in server.workforce.legal_ids)
@@ -0,0 +1,93 @@
+"""
+Tests of the CSV, JSONL and Parquet exports, run against insperity_mock_server
+
+Len Wanger
+2025
+"""
+
+import csv
+import gzip
+import json
+
+import pytest
+
+from insperity_export import export_checks, export_employees, export_minimal_employees, export_records
+import insperity_rest_api as api
+
+
+def test_export_round_trip(credentials, legal_employee_ids, tmp_path):
+    token_dict, client_id, legal_id = credentials
+    legal_code = api.get_legal_code(token_dict, legal_id)
+    employees = [employee for employee in api.get_employee_list(token_dict, client_id, legal_id)
+                 if employee.legal_code == legal_code]
+
+    result = export_employees(tmp_path / "employees.csv.gz", token_dict, client_id, legal_id,
+                              fields=['id', 'last_name', 'hire_date', 'hourly_rate'])
+    with gzip.open(result.path, "rt", newline="") as file:
+        rows = list(csv.DictReader(file))
+
+    assert result.rows == len(rows) == len(employees)
+    assert [(row['id'], row['last_name'], row['hire_date']) for row in rows] == [
+        (employee.id, employee.last_name, employee.hire_date.isoformat() if employee.hire_date else "")
+        for employee in employees]
+
+    result = export_minimal_employees(tmp_path / "employees.jsonl", token_dict, client_id, legal_id)
+    with open(result.path) as file:
+        records = [json.loads(line) for line in file]
+
+    assert [record['id'] for record in records] == legal_employee_ids
+    assert 'ssn' not in records[0]
+
+    employee_ids = [employee.id for employee in employees[:5]]
+    result = export_checks(tmp_path / "checks.csv", token_dict, client_id, legal_id, employees=employee_ids + ["1"],
+                           year_filter=2025)
+    assert list(result.errors) == ["1"]
+    with open(result.path, newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert {row['employee_id'] for row in rows} == set(employee_ids)
+
+
+def test_parquet_export_round_trip(credentials, legal_employee_ids, tmp_path):
+    pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+    token_dict, client_id, legal_id = credentials
+
+    result = export_employees(tmp_path / "employees.parquet", token_dict, client_id, legal_id)
+    table = pyarrow_parquet.read_table(result.path)
+
+    assert table.num_rows == result.rows == len(legal_employee_ids)
+    assert table.column('id').to_pylist() == legal_employee_ids
+    assert str(table.schema.field('hire_date').type) == "date32[day]"
+    assert str(table.schema.field('hourly_rate').type) == "double"
+    assert 'ssn' not in table.column_names
+
+
+def test_parquet_column_that_starts_null(tmp_path):
+    pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+    rows = [{'id': str(i), 'rate': None} for i in range(1500)] + [{'id': "last", 'rate': 12.5, 'extra': 1}]
+
+    result = export_records(tmp_path / "typed.parquet", iter(rows), column_types={'id': str, 'rate': float})
+    assert pyarrow_parquet.read_table(result.path).column('rate').to_pylist()[-1] == 12.5
+    assert result.extra_columns == ['extra']
+
+    result = export_records(tmp_path / "inferred.parquet", iter(rows))
+    assert pyarrow_parquet.read_table(result.path).column('rate').to_pylist()[-1] == "12.5"
+
+
+def test_check_export_workers_are_capped_at_the_pool_size(client, credentials, legal_employee_ids, tmp_path,
+                                                          monkeypatch):
+    import insperity_export
+
+    token_dict, client_id, legal_id = credentials
+    pool_sizes = []
+
+    class RecordingExecutor(insperity_export.ThreadPoolExecutor):
+        def __init__(self, max_workers: int):
+            pool_sizes.append(max_workers)
+            super().__init__(max_workers=max_workers)
+
+    monkeypatch.setattr(insperity_export, 'ThreadPoolExecutor', RecordingExecutor)
+    result = export_checks(tmp_path / "checks.jsonl", token_dict, client_id, legal_id,
+                           employees=legal_employee_ids[:20], year_filter=2025, max_workers=1000)
+
+    assert pool_sizes == [client.pool_maxsize]
+    assert not result.errors and result.rows > 0
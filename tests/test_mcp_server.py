@@ -0,0 +1,81 @@
+"""
+Tests of the MCP server tools (called directly), run against insperity_mock_server
+
+Len Wanger
+2025
+"""
+
+import asyncio
+
+import pytest
+
+from conftest import CLIENT_CODE
+
+
+@pytest.fixture
+def mcp_server(server, monkeypatch):
+    # the insperity_mcp_server module, with a new server state
+    mcp_server = pytest.importorskip('insperity_mcp_server')
+    monkeypatch.setattr(mcp_server, '_state', mcp_server.InsperityServerState(CLIENT_CODE, directory_refresh=None))
+    return mcp_server
+
+
+def run_tools(mcp_server, test_coroutine):
+    # run a test coroutine, closing the server state in the same event loop
+    async def run_and_close():
+        try:
+            await test_coroutine
+        finally:
+            await mcp_server.get_state().close()
+
+    asyncio.run(run_and_close())
+
+
+async def read_all(list_function, page_size: int=30, **kwds) -> tuple[list[dict], int]:
+    # read every page of a paged tool
+    page = await list_function(page_size=page_size, **kwds)
+    results = page['results']
+
+    while page['next_cursor'] is not None:
+        page = await list_function(page_size=page_size, cursor=page['next_cursor'], **kwds)
+        results += page['results']
+
+    return results, page['total']
+
+
+def test_mcp_cursor_paging(mcp_server, legal_employee_ids):
+    async def run():
+        employees, total = await read_all(mcp_server.list_employees, fields=['id', 'email'])
+        assert [employee['id'] for employee in employees] == legal_employee_ids
+        assert total == len(employees)
+        assert all(set(employee) == {'id', 'email'} for employee in employees)
+
+        employee_id = employees[0]['id']
+        checks, total = await read_all(mcp_server.get_employee_checks, employee_id=employee_id,
+                                       fields=['checkDate', 'netPay'])
+        assert len(checks) == total > 30
+        assert all(set(check) == {'checkDate', 'netPay'} for check in checks)
+
+        employee = await mcp_server.get_employee(employee_id)
+        assert employee['id'] == employee_id and 'ssn' not in employee
+
+    run_tools(mcp_server, run())
+
+
+def test_mcp_search_limit(mcp_server, monkeypatch, legal_employee_ids):
+    # the search limit is clamped to 1..MAX_PAGE_SIZE
+    monkeypatch.setattr(mcp_server, 'MAX_PAGE_SIZE', 5)
+
+    async def run():
+        employee = await mcp_server.get_employee(legal_employee_ids[0])
+        query = employee['email']
+
+        matches = await mcp_server.search_employees(query, limit=1000)
+        assert len(matches) == 5
+        assert matches[0]['id'] == employee['id']
+
+        for limit in (0, -10):
+            matches = await mcp_server.search_employees(query, limit=limit)
+            assert [match['id'] for match in matches] == [employee['id']]
+
+    run_tools(mcp_server, run())
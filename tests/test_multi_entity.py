@@ -0,0 +1,79 @@
+"""
+Tests of the multi-entity employee lists, run against insperity_mock_server
+
+Len Wanger
+2025
+"""
+
+import asyncio
+
+import pytest
+
+from insperity_multi_entity import Entity, get_multi_entity_employees, get_multi_entity_employees_async
+import insperity_rest_api as api
+from insperity_rest_async import AsyncInsperityClient
+
+from conftest import CLIENT_CODE
+
+
+ENTITIES = [Entity(CLIENT_CODE, legal_name_substring="Mock Legal 1", name="first"),
+            Entity(CLIENT_CODE, legal_name_substring="Mock Legal 2", name="second"),
+            Entity(CLIENT_CODE, legal_name_substring="No Such Legal", name="missing")]
+
+
+def check_result(server, result):
+    # each entity has only its own legal's employees, and the missing legal is an error
+    workforce = server.workforce
+    assert result.headcount() == {'first': len(workforce.legal_indexes(workforce.legal_ids[0])),
+                                  'second': len(workforce.legal_indexes(workforce.legal_ids[1]))}
+    assert list(result.errors) == ['missing'] and isinstance(result.errors['missing'], ValueError)
+
+    for entity_result in result.results:
+        assert {raw_employee['legalCode'] for raw_employee in entity_result.raw_employees} == {entity_result.legal_code}
+
+
+@pytest.fixture
+def no_legal_code_requests(monkeypatch):
+    # the legal codes come from the legals read with the credentials, so get_legal_code should never be called
+    def fail(*args, **kwargs):
+        raise AssertionError("get_legal_code requested the legals again")
+
+    monkeypatch.setattr(api, 'get_legal_code', fail)
+    monkeypatch.setattr(AsyncInsperityClient, 'get_legal_code', fail)
+
+
+def test_multi_entity_employees(server, no_legal_code_requests):
+    result = get_multi_entity_employees(ENTITIES)
+    check_result(server, result)
+
+    labels = [label for label, _ in result.employees(lazy=True)]
+    assert labels == ['first'] * result.headcount()['first'] + ['second'] * result.headcount()['second']
+
+
+def test_multi_entity_employees_async(server, no_legal_code_requests):
+    async def run():
+        async with AsyncInsperityClient() as client:
+            return await get_multi_entity_employees_async(client, ENTITIES)
+
+    check_result(server, asyncio.run(run()))
+
+
+def test_multi_entity_table(server):
+    pytest.importorskip('numpy')
+    result = get_multi_entity_employees(ENTITIES[:2], employee_status_filter="Active")
+    table = result.to_table()
+
+    assert len(table) == sum(result.headcount().values())
+    assert (table.entity == 'first').sum() == result.headcount()['first']
+
+
+def test_duplicate_labels_are_rejected(server):
+    entities = [Entity(CLIENT_CODE, legal_name_substring="Mock Legal 1"), Entity(CLIENT_CODE, name="Mock Legal 1")]
+
+    with pytest.raises(ValueError):
+        get_multi_entity_employees(entities)
+
+    with pytest.raises(ValueError):
+        asyncio.run(get_multi_entity_employees_async(None, entities))
+
+    assert server.request_counts['token'] == 0
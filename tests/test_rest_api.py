@@ -0,0 +1,64 @@
+"""
+Tests of the REST API endpoint functions (paging, token refresh, retries and the response cache), run against
+insperity_mock_server
+
+Len Wanger
+2025
+"""
+
+import random
+
+import insperity_rest_api as api
+
+from conftest import CLIENT_CODE
+
+
+def test_multipage_employee_list(server, credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+
+    for max_workers in (1, 4):
+        server.reset_counts()
+        raw_employees = list(api.iter_employees_raw(token_dict, client_id, legal_id, max_workers=max_workers))
+
+        # the employees endpoint returns every legal of the client, in order
+        assert [raw_employee['id'] for raw_employee in raw_employees] == [
+            server.workforce.employee_id(index) for index in range(server.config.employees)]
+        assert server.request_counts['employees'] == server.config.employees // server.config.page_size
+
+        legal_code = api.get_legal_code(token_dict, legal_id)
+        legal_employees = list(api.filter_legal_employees(raw_employees, legal_code))
+        assert [raw_employee['id'] for raw_employee in legal_employees] == legal_employee_ids
+
+
+def test_minimal_employee_list_in_parallel(credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+    raw_employees = api.iter_minimal_employees_raw(token_dict, client_id, legal_id, prefetch=2, max_workers=4)
+    assert [raw_employee['id'] for raw_employee in raw_employees] == legal_employee_ids
+
+
+def test_expired_token_is_refreshed(client, server, credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+    old_access_token = token_dict['access_token']
+    server.expire_tokens()
+
+    employees = api.get_minimal_employee_list_raw(token_dict, client_id, legal_id)
+
+    assert len(employees) == len(legal_employee_ids)
+    assert token_dict['access_token'] != old_access_token
+    assert server.is_valid_token(token_dict['access_token'])
+    assert server.status_counts[401] == 1
+    assert client.metrics.token_refreshes.get() == 1
+
+
+def test_throttled_and_failed_requests_are_retried(client, make_server):
+    random.seed(12)  # the mock server injects the errors with the random module
+    server = make_server(employees=400, legals=1, page_size=20, throttle_rate=0.1, server_error_rate=0.1)
+    token_dict, client_id, legal_id = api.get_credentials(client_code=CLIENT_CODE)
+    employees = api.get_employee_list_raw(token_dict, client_id, legal_id)
+
+    assert len(employees) == server.config.employees
+    assert server.status_counts[429] > 0
+    assert sum(server.status_counts[status] for status in (500, 502, 503, 504)) > 0
+
+    retries = client.metrics.retries.snapshot()
+    assert sum(retries.values()) == sum(count for status, count in server.status_counts.items() if status != 200)
@@ -0,0 +1,72 @@
+"""
+Tests of the asyncio REST API client, run against insperity_mock_server
+
+Len Wanger
+2025
+"""
+
+import asyncio
+
+from insperity_rest_async import AsyncInsperityClient
+from insperity_rest_metrics import InsperityMetrics
+
+from conftest import CLIENT_CODE, FAST_RETRY_POLICY
+
+
+def make_client(**kwargs) -> AsyncInsperityClient:
+    return AsyncInsperityClient(retry_policy=FAST_RETRY_POLICY, metrics=InsperityMetrics(), **kwargs)
+
+
+def test_async_employee_list(server, legal_employee_ids):
+    async def run():
+        async with make_client() as client:
+            token_dict, client_id, legal_id = await client.get_credentials(client_code=CLIENT_CODE)
+            return await client.get_minimal_employee_list_raw(token_dict, client_id, legal_id)
+
+    raw_employees = asyncio.run(run())
+    assert [raw_employee['id'] for raw_employee in raw_employees] == legal_employee_ids
+
+
+def test_expired_token_is_refreshed_once(server, legal_employee_ids):
+    # every call gets a 401 with the expired token, but only the first one refreshes it
+    employee_ids = legal_employee_ids[:8]
+
+    async def run():
+        async with make_client(coalesce=False) as client:
+            token_dict, client_id, legal_id = await client.get_credentials(client_code=CLIENT_CODE)
+            old_access_token = token_dict['access_token']
+            server.expire_tokens()
+
+            results = await asyncio.gather(*(client.get_employee_by_id(token_dict, client_id, legal_id, employee_id)
+                                             for employee_id in employee_ids))
+            return client, token_dict, old_access_token, results
+
+    client, token_dict, old_access_token, results = asyncio.run(run())
+
+    assert len(results) == len(employee_ids)
+    assert token_dict['access_token'] != old_access_token and server.is_valid_token(token_dict['access_token'])
+    assert client.metrics.token_refreshes.get() == 1
+    assert server.request_counts['employee_by_id'] == 2 * len(employee_ids)
+
+
+def test_refresh_locks_are_per_client_code():
+    # the refresh for client A waits for the refresh for client B to start, which would never happen if the two
+    #   clients shared one refresh lock
+    b_refreshing = asyncio.Event()
+
+    async def get_refresh_token(token_dict: dict) -> dict:
+        if token_dict['client_code'] == "A":
+            await b_refreshing.wait()
+        else:
+            b_refreshing.set()
+        return {'access_token': f"new_{token_dict['client_code']}", 'refresh_token': "refresh", 'expires_at': None}
+
+    async def run():
+        async with make_client() as client:
+            client.get_refresh_token = get_refresh_token
+            token_dicts = [{'access_token': "old", 'refresh_token': "refresh", 'client_code': client_code}
+                           for client_code in ("A", "B")]
+            refreshes = [client.refresh_access_token(token_dict, stale_access_token="old") for token_dict in token_dicts]
+            return await asyncio.wait_for(asyncio.gather(*refreshes), timeout=5.0)
+
+    assert asyncio.run(run()) == ["new_A", "new_B"]
@@ -0,0 +1,122 @@
+"""
+Tests of the single-flight coalescing of identical in-flight requests
+
+Len Wanger
+2025
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+
+from insperity_rest_coalesce import AsyncSingleFlight, SingleFlight, request_key
+
+
+def test_request_key():
+    token_dict = {'client_code': "MOCK", 'access_token': "token"}
+
+    # the query string and params are merged and sorted, and the scheme and host are case insensitive
+    assert request_key('page', "HTTP://Example.com/rest/employees?b=2", {'a': 1, 'c': None}, token_dict=token_dict) == \
+        request_key('page', "http://example.com/rest/employees?a=1", {'b': "2"}, token_dict=token_dict)
+
+    assert request_key('page', "http://example.com/x", {}, token_dict=token_dict) != \
+        request_key('all_pages', "http://example.com/x", {}, token_dict=token_dict)
+    assert request_key('page', "http://example.com/x", {}, token_dict=token_dict) != \
+        request_key('page', "http://example.com/x", {}, token_dict={'client_code': "OTHER"})
+    assert request_key('page', "http://example.com/x", {}, headers={'Authorization': "Bearer a"}) != \
+        request_key('page', "http://example.com/x", {}, headers={'Authorization': "Bearer b"})
+    assert request_key('page', "http://example.com/x", {}, {'essScope': "1"}, token_dict) != \
+        request_key('page', "http://example.com/x", {}, {'essScope': "2"}, token_dict)
+
+
+def test_single_flight_threads():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def function():
+        calls.append(1)
+        release.wait(5.0)
+        return {'employees': [{'id': "1"}]}
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(single_flight.do, "key", function) for _ in range(4)]
+        while single_flight.coalesced < 3:
+            release.wait(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result == {'employees': [{'id': "1"}]} for result in results)
+
+    # each caller gets its own copy
+    results[0]['employees'][0]['id'] = "changed"
+    assert all(result['employees'][0]['id'] == "1" for result in results[1:])
+
+    # the key is forgotten once the call is done
+    assert single_flight.do("key", lambda: "again") == "again"
+
+
+def test_single_flight_error_is_shared():
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def function():
+        release.wait(5.0)
+        raise ValueError("failed")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(single_flight.do, "key", function) for _ in range(2)]
+        while single_flight.coalesced < 1:
+            release.wait(0.01)
+        release.set()
+
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_async_single_flight():
+    single_flight = AsyncSingleFlight()
+    calls = []
+
+    async def function():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return [{'id': "1"}]
+
+    async def run():
+        return await asyncio.gather(*(single_flight.do("key", function) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1 and single_flight.coalesced == 4
+    assert results == [[{'id': "1"}]] * 5
+    assert len({id(result) for result in results}) == 5
+
+
+def test_async_leader_cancelled():
+    # if the leader is cancelled, a waiter makes the call again
+    single_flight = AsyncSingleFlight()
+    calls = []
+
+    async def function():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        leader = asyncio.create_task(single_flight.do("key", function))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(single_flight.do("key", function))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == "result"
+    assert len(calls) == 2
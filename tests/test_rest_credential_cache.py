@@ -0,0 +1,81 @@
+"""
+Tests of the on-disk credential cache, with get_credentials run against insperity_mock_server
+
+Len Wanger
+2025
+"""
+
+import os
+import stat
+
+import insperity_rest_api as api
+from insperity_rest_credential_cache import CredentialCache
+
+from conftest import CLIENT_CODE
+
+
+TOKEN_DICT = {'access_token': "access", 'refresh_token': "refresh", 'client_code': CLIENT_CODE, 'expires_at': None}
+LEGAL_IDS = [{'id': "1", 'legalName': "Legal", 'legalCode': "1"}]
+
+
+def test_save_and_load(tmp_path):
+    cache = CredentialCache(tmp_path / "cache" / "credentials.json")
+    assert cache.load("http://host", CLIENT_CODE) is None
+
+    cache.save("http://host", CLIENT_CODE, TOKEN_DICT, "client", LEGAL_IDS)
+    entry = cache.load("http://host", CLIENT_CODE)
+    assert (entry['token_dict'], entry['client_id'], entry['legal_ids']) == (TOKEN_DICT, "client", LEGAL_IDS)
+
+    # entries are per base url and client code
+    assert cache.load("http://other_host", CLIENT_CODE) is None
+    assert cache.load("http://host", "OTHER") is None
+
+    # saving only the token keeps the client id and legal ids
+    cache.save("http://host", CLIENT_CODE, {**TOKEN_DICT, 'access_token': "new"})
+    entry = cache.load("http://host", CLIENT_CODE)
+    assert entry['token_dict']['access_token'] == "new" and entry['client_id'] == "client"
+
+    cache.clear("http://host", CLIENT_CODE)
+    assert cache.load("http://host", CLIENT_CODE) is None
+
+
+def test_file_permissions(tmp_path):
+    cache = CredentialCache(tmp_path / "cache" / "credentials.json")
+    cache.save("http://host", CLIENT_CODE, TOKEN_DICT, "client", LEGAL_IDS)
+
+    assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(cache.path.parent).st_mode) == 0o700
+
+    # a cache file other users can read is ignored
+    os.chmod(cache.path, 0o644)
+    assert cache.load("http://host", CLIENT_CODE) is None
+
+
+def test_bootstrap_ttl(tmp_path):
+    cache = CredentialCache(tmp_path / "credentials.json", bootstrap_ttl=-1.0)
+    cache.save("http://host", CLIENT_CODE, TOKEN_DICT, "client", LEGAL_IDS)
+
+    # the token is still used, but the client id and legal ids are too old
+    entry = cache.load("http://host", CLIENT_CODE)
+    assert entry['token_dict'] == TOKEN_DICT
+    assert entry['client_id'] is None and entry['legal_ids'] is None
+
+
+def test_get_credentials_uses_cache(server, tmp_path, monkeypatch):
+    monkeypatch.setenv('INSPERITY_CREDENTIAL_CACHE', str(tmp_path / "credentials.json"))
+    token_dict, client_id, legal_id = api.get_credentials(client_code=CLIENT_CODE)
+    assert {name: server.request_counts[name] for name in ('token', 'clients', 'legals')} == \
+        {'token': 1, 'clients': 1, 'legals': 1}
+
+    # the next start doesn't call the REST API at all
+    server.reset_counts()
+    assert api.get_credentials(client_code=CLIENT_CODE) == (token_dict, client_id, legal_id)
+    assert sum(server.request_counts.values()) == 0
+
+    # a refreshed token is saved back to the cache
+    server.expire_tokens()
+    cached_token_dict, _, _ = api.get_credentials(client_code=CLIENT_CODE)
+    api.get_employee_by_id(cached_token_dict, client_id, legal_id, server.workforce.employee_id(0))
+
+    entry = CredentialCache(tmp_path / "credentials.json").load(api.BASE_URL, CLIENT_CODE)
+    assert entry['token_dict']['access_token'] == cached_token_dict['access_token'] != token_dict['access_token']
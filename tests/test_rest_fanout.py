@@ -0,0 +1,79 @@
+"""
+Tests of the per-employee fan-out, run against insperity_mock_server
+
+Len Wanger
+2025
+"""
+
+import threading
+import time
+
+import insperity_rest_api as api
+from insperity_rest_fanout import fan_out, get_checks_for_employees, get_employee_id, get_employees_by_id
+from insperity_rest_types import MinimalEmployee
+
+
+def test_get_employee_id():
+    assert get_employee_id("1") == "1"
+    assert get_employee_id({'id': "2"}) == "2"
+    assert get_employee_id(MinimalEmployee(*(["3"] + [None] * 15))) == "3"
+
+
+def test_fan_out_results_and_errors(client):
+    progress = []
+
+    def function(employee_id: str, suffix: str) -> str:
+        time.sleep(0.001 * (10 - int(employee_id)))  # finish out of order
+        if employee_id == "3":
+            raise ValueError("bad employee")
+        return employee_id + suffix
+
+    results = fan_out(function, [str(i) for i in range(10)], max_workers=4,
+                      progress=lambda done, total: progress.append((done, total)), suffix="!")
+
+    # results are in the employees' order, and one failure doesn't stop the other calls
+    assert [result.employee_id for result in results] == [str(i) for i in range(10)]
+    assert [result.value for result in results if result.ok] == [f"{i}!" for i in range(10) if i != 3]
+    assert isinstance(results[3].error, ValueError) and not results[3].ok
+    assert progress == [(done, 10) for done in range(1, 11)]
+
+    assert fan_out(function, [], suffix="!") == []
+
+
+def test_fan_out_workers_are_capped(client):
+    # no more calls run at once than max_workers or the client's pool_maxsize
+    lock = threading.Lock()
+    running = [0, 0]  # running, maximum running
+
+    def function(employee_id: str):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+
+    fan_out(function, [str(i) for i in range(20)], max_workers=3)
+    assert running[1] <= 3
+
+    running[1] = 0
+    client.pool_maxsize = 2
+    fan_out(function, [str(i) for i in range(20)], max_workers=100)
+    assert running[1] <= 2
+
+    # max_workers below 1 still runs the calls
+    assert all(result.ok for result in fan_out(function, ["1", "2"], max_workers=0))
+
+
+def test_fan_out_endpoints(server, credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+    employee_ids = legal_employee_ids[:5]
+
+    results = get_employees_by_id(token_dict, client_id, legal_id, employee_ids)
+    assert all(result.ok for result in results)
+    assert server.request_counts['employee_by_id'] == len(employee_ids)
+
+    results = get_checks_for_employees(token_dict, client_id, legal_id, [{'id': employee_id} for employee_id in
+                                                                         employee_ids])
+    for employee_id, result in zip(employee_ids, results):
+        assert result.value == api.get_employee_checks_raw(token_dict, client_id, legal_id, employee_id)
@@ -0,0 +1,122 @@
+"""
+Tests of the per-endpoint metrics, the Prometheus exporter and the span listeners
+
+Len Wanger
+2025
+"""
+
+import urllib.error
+import urllib.request
+
+import pytest
+
+import insperity_rest_api as api
+from insperity_rest_metrics import (PROMETHEUS_CONTENT_TYPE, InsperityMetrics, MetricsRegistry, endpoint_name,
+                                    serve_prometheus)
+
+
+BASE = "https://example.com/rest/api/clients/123/legals/456"
+
+
+def test_endpoint_name():
+    assert endpoint_name("https://example.com/rest/api/token") == 'token'
+    assert endpoint_name(f"{BASE}/employees?page=2") == 'employees'
+    assert endpoint_name(f"{BASE}/employeesMinimal") == 'employeesMinimal'
+    assert endpoint_name(f"{BASE}/employees/789/checks") == 'checks'
+    assert endpoint_name(f"{BASE}/employees/789") == 'employeeById'
+    assert endpoint_name("https://example.com/rest/api/other/42") == 'other'
+
+
+def test_prometheus_format():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_total", "Test counter", ('endpoint',))
+    histogram = registry.histogram("test_seconds", "Test histogram", buckets=(0.1, 1.0))
+    assert registry.counter("test_total", "Test counter", ('endpoint',)) is counter
+
+    counter.inc('a "quoted" name')
+    counter.inc('b', amount=2.5)
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert histogram.get() == (5.55, 3)
+    assert registry.to_prometheus().splitlines() == [
+        "# HELP test_total Test counter",
+        "# TYPE test_total counter",
+        'test_total{endpoint="a \\"quoted\\" name"} 1',
+        'test_total{endpoint="b"} 2.5',
+        "# HELP test_seconds Test histogram",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{le="0.1"} 1',
+        'test_seconds_bucket{le="1"} 2',
+        'test_seconds_bucket{le="+Inf"} 3',
+        "test_seconds_sum 5.55",
+        "test_seconds_count 3",
+    ]
+
+    registry.reset()
+    assert registry.snapshot() == {'test_total': {}, 'test_seconds': {}}
+
+
+def test_span_listeners():
+    metrics = InsperityMetrics()
+    started, ended = [], []
+
+    def broken_listener(span):
+        raise RuntimeError("broken listener")
+
+    metrics.add_span_listener(started.append, ended.append)
+    metrics.add_span_listener(broken_listener, broken_listener)
+
+    with metrics.track_request("GET", f"{BASE}/employees") as span:
+        span.attributes.update(status=200, bytes=100)
+
+    with pytest.raises(ValueError):
+        with metrics.track_call(f"{BASE}/employees") as span:
+            span.attributes['pages'] = 3
+            raise ValueError("failed call")
+
+    assert [(span.name, span.kind) for span in started] == [("GET employees", 'http'), ("employees", 'call')]
+    assert ended == started
+    assert ended[0].duration >= 0.0 and isinstance(ended[1].error, ValueError)
+
+    assert metrics.requests.get('employees', 'GET', '200') == 1
+    assert metrics.bytes_received.get('employees') == 100
+    assert metrics.calls.get('employees', 'error') == 1
+    assert metrics.pages.get('employees') == (3, 1)
+
+    metrics.remove_span_listener(started.append, ended.append)
+    with metrics.track_request("GET", f"{BASE}/employees"):
+        pass
+    assert len(started) == 2
+
+
+def test_client_requests_are_recorded(client, server, credentials):
+    token_dict, client_id, legal_id = credentials
+    api.get_employee_list_raw(token_dict, client_id, legal_id)
+
+    metrics = client.metrics
+    pages = server.config.employees // server.config.page_size
+    assert metrics.requests.get('employees', 'GET', '200') == server.request_counts['employees'] == pages
+    assert metrics.requests.get('token', 'POST', '200') == 1
+    assert metrics.calls.get('employees', 'ok') == 1
+    assert metrics.pages.get('employees') == (pages, 1)
+    assert metrics.bytes_received.get('employees') > 0
+    assert metrics.request_latency.get('employees', 'GET')[1] == pages
+
+
+def test_serve_prometheus():
+    metrics = InsperityMetrics()
+    metrics.record_token_refresh()
+    server = serve_prometheus(0, metrics=metrics)
+
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            assert response.headers['Content-Type'] == PROMETHEUS_CONTENT_TYPE
+            assert "insperity_token_refreshes_total 1" in response.read().decode().splitlines()
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other")
+    finally:
+        server.shutdown()
+        server.server_close()
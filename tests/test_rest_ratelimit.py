@@ -0,0 +1,116 @@
+"""
+Tests of the rate limiter, retry policy and retry budget
+
+Len Wanger
+2025
+"""
+
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from insperity_rest_ratelimit import AdaptiveRateLimiter, RequestThrottle, RetryBudget, RetryPolicy, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after("soon") is None
+
+    retry_time = datetime.now(timezone.utc) + timedelta(seconds=60)
+    assert 50.0 < parse_retry_after(format_datetime(retry_time, usegmt=True)) <= 60.0
+
+
+def test_backoff_delay():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    for attempt in range(8):
+        assert 0.0 <= policy.backoff_delay(attempt) <= min(5.0, 2 ** attempt)
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, reserve=2.0, window=100)
+    assert budget.max_tokens == 50.0
+
+    # the bucket starts with the reserve
+    assert [budget.withdraw() for _ in range(3)] == [True, True, False]
+
+    # each success earns ratio retries
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw() and not budget.withdraw()
+
+    # a long run of successes is capped at ratio * window retries (not at the reserve)
+    for _ in range(1000):
+        budget.deposit()
+    assert budget.tokens == 50.0
+    assert sum(budget.withdraw() for _ in range(100)) == 50
+
+
+def test_retry_budget_cap_is_at_least_the_reserve():
+    budget = RetryBudget(ratio=0.1, reserve=10.0, window=10)
+    for _ in range(100):
+        budget.deposit()
+    assert budget.max_tokens == budget.tokens == 10.0
+
+
+def test_rate_limiter_aimd(monkeypatch):
+    limiter = AdaptiveRateLimiter(rate=10.0, min_rate=2.0, max_rate=11.0, increase=5.0, cooldown=60.0)
+
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(10.5)
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == 11.0
+
+    # throttled responses halve the rate, but only once per cooldown
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.rate == 5.5
+
+    limiter._last_decrease -= 60.0
+    limiter.on_throttle()
+    assert limiter.rate == 2.75
+
+    limiter._last_decrease -= 60.0
+    limiter.on_throttle()
+    assert limiter.rate == 2.0
+
+
+def test_rate_limiter_wait():
+    limiter = AdaptiveRateLimiter(rate=10.0, burst=2.0)
+    assert limiter.reserve() == limiter.reserve() == 0.0
+    assert limiter.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+def test_throttle_retries():
+    throttle = RequestThrottle(retry_policy=RetryPolicy(max_retries=2, base_delay=0.0, max_retry_after=30.0,
+                                                        budget_reserve=10.0))
+
+    assert throttle.on_response(200, {}, 0) is None
+    assert throttle.on_response(404, {}, 0) is None  # not retried
+
+    # a Retry-After is waited for, and pauses the other requests too
+    assert throttle.on_response(429, {'Retry-After': "5"}, 0) == 5.0
+    assert throttle.wait_time() > 4.0
+    assert throttle.on_response(500, {}, 1) == 0.0
+
+    # no more than max_retries, and no Retry-After longer than max_retry_after
+    assert throttle.on_response(500, {}, 2) is None
+    assert throttle.on_response(429, {'Retry-After': "60"}, 0) is None
+    assert throttle.on_error(0) == 0.0
+
+    stats = throttle.stats()
+    assert stats['retries'] == 3 and stats['throttled'] == 2
+
+
+def test_throttle_retry_budget():
+    # with no reserve and no successes, nothing is retried
+    throttle = RequestThrottle(retry_policy=RetryPolicy(base_delay=0.0, budget_ratio=0.5, budget_reserve=0.0))
+    assert throttle.on_response(503, {}, 0) is None
+
+    throttle.on_response(200, {}, 0)
+    throttle.on_response(200, {}, 0)
+    assert throttle.on_response(503, {}, 0) == 0.0
+    assert throttle.on_response(503, {}, 0) is None
@@ -0,0 +1,110 @@
+"""
+Tests of the response cache, on its own and used by the REST API functions and the asyncio client
+
+Len Wanger
+2025
+"""
+
+import asyncio
+import time
+
+import insperity_rest_api as api
+from insperity_rest_async import AsyncInsperityClient
+from insperity_rest_response_cache import EMPLOYEE_BY_ID_ENDPOINT, EMPLOYEES_ENDPOINT, ResponseCache
+
+
+def test_cached_values_are_copies():
+    cache = ResponseCache()
+    fetched = [{'id': "1", 'nameAddress': {'firstName': "Ann"}}]
+    value = cache.get_or_fetch(EMPLOYEES_ENDPOINT, ('client', 'legal'), lambda: fetched)
+    value[0]['nameAddress']['firstName'] = "Changed"
+    value.append({'id': "2"})
+
+    hit, cached = cache.get(EMPLOYEES_ENDPOINT, ('client', 'legal'))
+    assert hit and cached == [{'id': "1", 'nameAddress': {'firstName': "Ann"}}]
+    assert cached is not fetched
+
+    uncopied_cache = ResponseCache(copy_values=False)
+    uncopied_cache.put(EMPLOYEES_ENDPOINT, 'key', fetched)
+    assert uncopied_cache.get(EMPLOYEES_ENDPOINT, 'key')[1] is fetched
+
+
+def test_expiry_eviction_and_invalidate():
+    cache = ResponseCache(max_entries=2, ttls={EMPLOYEES_ENDPOINT: 0.05})
+    cache.put(EMPLOYEES_ENDPOINT, ('client', 'legal_1'), [1])
+    cache.put(EMPLOYEE_BY_ID_ENDPOINT, ('client', 'legal_1', "1"), {'id': "1"})
+    cache.put(EMPLOYEE_BY_ID_ENDPOINT, ('client', 'legal_2', "2"), {'id': "2"})
+
+    assert len(cache) == 2 and cache.evictions == 1  # the least recently used entry was evicted
+    assert cache.get(EMPLOYEES_ENDPOINT, ('client', 'legal_1')) == (False, None)
+
+    cache.put(EMPLOYEES_ENDPOINT, ('client', 'legal_1'), [1])
+    time.sleep(0.06)
+    assert cache.get(EMPLOYEES_ENDPOINT, ('client', 'legal_1')) == (False, None)  # expired
+
+    assert cache.invalidate(legal_id='legal_2') == 1
+    assert cache.get(EMPLOYEE_BY_ID_ENDPOINT, ('client', 'legal_2', "2")) == (False, None)
+
+
+def test_ssn_responses_are_not_cached():
+    cache = ResponseCache()
+    calls = []
+    fetch_function = lambda: calls.append(1) or [{'ssn': "123-45-6789"}]
+
+    cache.get_or_fetch(EMPLOYEES_ENDPOINT, 'key', fetch_function, contains_ssn=True)
+    cache.get_or_fetch(EMPLOYEES_ENDPOINT, 'key', fetch_function, contains_ssn=True)
+    assert len(calls) == 2 and len(cache) == 0
+
+
+def test_employee_list_cache(client, server, credentials):
+    token_dict, client_id, legal_id = credentials
+    client.response_cache = ResponseCache()
+
+    first = api.get_employee_list_raw(token_dict, client_id, legal_id)
+    request_count = server.request_counts['employees']
+    first[0]['nameAddress']['firstName'] = "Changed"  # changing a returned list doesn't change the cached list
+    first.clear()
+    second = api.get_employee_list_raw(token_dict, client_id, legal_id)
+
+    assert server.request_counts['employees'] == request_count
+    assert len(second) == server.config.employees
+    assert second[0]['nameAddress']['firstName'] != "Changed"
+    assert client.response_cache.stats()['hits'] == 1
+
+    client.response_cache.invalidate(client_id=client_id)
+    api.get_employee_list_raw(token_dict, client_id, legal_id)
+    assert server.request_counts['employees'] == 2 * request_count
+
+
+def test_employee_by_id_cache(client, server, credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+    client.response_cache = ResponseCache()
+    employee_id = legal_employee_ids[0]
+
+    first = api.get_employee_by_id(token_dict, client_id, legal_id, employee_id)
+    first['nameAddress']['firstName'] = "Changed"
+    second = api.get_employee_by_id(token_dict, client_id, legal_id, employee_id)
+
+    assert server.request_counts['employee_by_id'] == 1
+    assert second['nameAddress']['firstName'] != "Changed"
+
+
+def test_async_client_cache(server, credentials, legal_employee_ids):
+    async def run():
+        async with AsyncInsperityClient(response_cache=ResponseCache()) as async_client:
+            token_dict, client_id, legal_id = await async_client.get_credentials(client_code="MOCK")
+            employee_id = legal_employee_ids[0]
+
+            first = await async_client.get_employee_by_id(token_dict, client_id, legal_id, employee_id)
+            first['nameAddress']['firstName'] = "Changed"
+            second = await async_client.get_employee_by_id(token_dict, client_id, legal_id, employee_id)
+            assert second['nameAddress']['firstName'] != "Changed"
+
+            employees = await async_client.get_employee_list_raw(token_dict, client_id, legal_id)
+            employees[0]['id'] = "changed"
+            employees = await async_client.get_employee_list_raw(token_dict, client_id, legal_id)
+            assert employees[0]['id'] != "changed"
+
+    asyncio.run(run())
+    assert server.request_counts['employee_by_id'] == 1
+    assert server.request_counts['employees'] == server.config.employees // server.config.page_size
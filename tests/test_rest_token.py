@@ -0,0 +1,82 @@
+"""
+Tests of the TokenManager's proactive, single-flight token refresh
+
+Len Wanger
+2025
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+import insperity_rest_api as api
+from insperity_rest_token import TokenManager, get_expires_at
+
+
+def make_token_manager(refresh_function=None, expires_in: float|None=3600.0) -> TokenManager:
+    expires_at = time.time() + expires_in if expires_in is not None else None
+    return TokenManager({'access_token': "old", 'refresh_token': "refresh", 'client_code': "MOCK",
+                         'expires_at': expires_at}, refresh_function=refresh_function)
+
+
+def test_get_expires_at():
+    assert get_expires_at({}) is None
+    assert time.time() + 99.0 < get_expires_at({'expires_in': "100"}) <= time.time() + 100.0
+
+
+def test_expires_soon():
+    assert not make_token_manager(expires_in=3600.0).expires_soon()
+    assert make_token_manager(expires_in=30.0).expires_soon()  # inside the refresh margin
+    assert not make_token_manager(expires_in=None).expires_soon()
+
+
+def test_single_flight_refresh():
+    # threads that all find the token expired share one refresh
+    calls = []
+    start = threading.Barrier(8)
+
+    def refresh_function(token_dict: dict) -> dict:
+        calls.append(1)
+        time.sleep(0.05)
+        return {'access_token': "new", 'refresh_token': "new_refresh", 'expires_at': time.time() + 3600.0}
+
+    token_manager = make_token_manager(refresh_function, expires_in=0.0)
+    refreshed = []
+    token_manager.on_refresh = refreshed.append
+
+    def get_access_token():
+        start.wait()
+        return token_manager.get_access_token()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        access_tokens = list(executor.map(lambda _: get_access_token(), range(8)))
+
+    assert access_tokens == ["new"] * 8
+    assert len(calls) == 1 and refreshed == [token_manager]
+    assert token_manager['refresh_token'] == "new_refresh" and not token_manager.expires_soon()
+
+    # a refresh for a token that was already replaced is skipped
+    assert token_manager.refresh(stale_access_token="old") == "new" and len(calls) == 1
+
+
+def test_no_refresh_function():
+    token_manager = make_token_manager(expires_in=0.0)
+    assert token_manager.get_access_token() == "old"
+
+    with pytest.raises(ValueError):
+        token_manager.refresh()
+
+
+def test_token_is_refreshed_before_it_expires(client, server, credentials):
+    token_dict, client_id, legal_id = credentials
+    old_access_token = token_dict['access_token']
+    token_dict['expires_at'] = time.time()
+
+    api.get_minimal_employee_list_raw(token_dict, client_id, legal_id)
+
+    # refreshed before the call, so the server never answered with a 401
+    assert token_dict['access_token'] != old_access_token
+    assert server.status_counts[401] == 0
+    assert client.metrics.token_refreshes.get() == 1
@@ -0,0 +1,58 @@
+"""
+Tests of the slotted and lazy employee records, run against insperity_mock_server
+
+Len Wanger
+2025
+"""
+
+from datetime import date
+
+import pytest
+
+import insperity_rest_api as api
+from insperity_rest_types import Employee, LazyEmployee, LazyMinimalEmployee, MinimalEmployee
+
+
+def test_records_are_slotted(server, credentials):
+    token_dict, client_id, legal_id = credentials
+    employee = api.get_employee_list(token_dict, client_id, legal_id)[0]
+
+    assert type(employee) is Employee
+    with pytest.raises(AttributeError):
+        employee.not_a_field = 1
+
+
+def test_lazy_employees_match_eager_employees(server, credentials):
+    token_dict, client_id, legal_id = credentials
+    employees = api.get_employee_list(token_dict, client_id, legal_id)
+    lazy_employees = api.get_employee_list(token_dict, client_id, legal_id, lazy=True)
+
+    assert all(type(lazy_employee) is LazyEmployee for lazy_employee in lazy_employees)
+    assert [lazy_employee.materialize() for lazy_employee in lazy_employees] == employees
+    assert lazy_employees[0].tenure() == employees[0].tenure()
+    assert lazy_employees[0].older_than(18) == employees[0].older_than(18)
+
+    minimal_employees = api.get_minimal_employee_list(token_dict, client_id, legal_id)
+    lazy_minimal_employees = api.get_minimal_employee_list(token_dict, client_id, legal_id, lazy=True)
+
+    assert all(type(employee) is MinimalEmployee for employee in minimal_employees)
+    assert all(type(lazy_employee) is LazyMinimalEmployee for lazy_employee in lazy_minimal_employees)
+    assert [lazy_employee.materialize() for lazy_employee in lazy_minimal_employees] == minimal_employees
+
+
+def test_lazy_fields():
+    raw = {'id': "1", 'nameAddress': {'firstName': "Ann"}, 'hireDate': "2020-03-01T00:00:00", 'hourlyRate': "12.5",
+           'assignedManager': None}
+    employee = LazyEmployee(raw)
+
+    assert employee.raw is raw
+    assert employee.first_name == "Ann"
+    assert employee.hire_date == date(2020, 3, 1)
+    assert employee.hourly_rate == 12.5
+
+    # missing values are None (or the field's default)
+    assert employee.last_name is None and employee.assigned_manager_id is None
+    assert employee.annual_salary == 0.0
+
+    assert employee == LazyEmployee(dict(raw)) and employee != LazyEmployee({'id': "2"})
+    assert repr(employee).startswith("LazyEmployee(id='1', ")
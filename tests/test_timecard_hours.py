@@ -0,0 +1,118 @@
+"""
+Tests of the weekly hours pipeline, run against insperity_mock_server
+
+Len Wanger
+2025
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from insperity_timecard_hours import (TimecardWeekCache, get_hours_worked, get_weekly_hours, split_into_windows,
+                                      timecard_day_hours)
+
+
+START_DATE = date(2025, 1, 6)  # a Monday
+END_DATE = date(2025, 2, 2)  # the Sunday 4 weeks later
+
+
+def expected_week_hours(server, employee_id: str) -> list[float]:
+    # hours of each week from START_DATE to END_DATE, added up from the mock server's timecards
+    records = server.workforce.timecards(server.workforce.index(employee_id), START_DATE, END_DATE)
+    week_hours = [0.0] * 4
+
+    for record in records:
+        day = date.fromisoformat(record['workDate'][:10])
+        week_hours[(day - START_DATE).days // 7] += record['hours']
+
+    return week_hours
+
+
+def test_split_into_windows():
+    assert split_into_windows(date(2025, 1, 8), date(2025, 2, 20), window_weeks=4) == [
+        (date(2025, 1, 6), date(2025, 2, 2)), (date(2025, 2, 3), date(2025, 2, 20))]
+
+
+def test_weekly_hours(server, credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+    employee_ids = legal_employee_ids[:6]
+
+    weekly_hours = get_weekly_hours(token_dict, client_id, legal_id, employee_ids, START_DATE, END_DATE,
+                                    window_weeks=2)
+
+    assert weekly_hours.week_starts == [START_DATE + timedelta(weeks=week) for week in range(4)]
+    assert not weekly_hours.errors and not weekly_hours.skipped_records
+    for employee_id in employee_ids:
+        assert weekly_hours.row(employee_id) == pytest.approx(expected_week_hours(server, employee_id), rel=1e-5)
+
+    assert server.request_counts['timecard_data'] == len(employee_ids) * 2  # two 2 week windows per employee
+
+
+def test_finished_weeks_are_cached(server, credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+    employee_ids = legal_employee_ids[:3]
+
+    with TimecardWeekCache() as cache:
+        first = get_weekly_hours(token_dict, client_id, legal_id, employee_ids, START_DATE, END_DATE, cache=cache)
+        server.reset_counts()
+        second = get_weekly_hours(token_dict, client_id, legal_id, employee_ids, START_DATE, END_DATE, cache=cache)
+
+    assert server.request_counts['timecard_data'] == 0
+    assert np.allclose(first.hours, second.hours)
+
+
+def test_unreadable_records_are_errors():
+    records = {
+        "1": [{'workDate': "2025-01-06T00:00:00", 'hours': 8.0}, {'workDate': "2025-01-07T00:00:00", 'hours': 7.5}],
+        "2": [{'workDate': "2025-01-06T00:00:00", 'hours': 8.0}, {'workDate': "2025-01-07T00:00:00"}],
+        "3": [{'date': "2025-01-06T00:00:00", 'hours': 8.0}],
+        "4": [{'workDate': "2025-01-06T00:00:00", 'hours': 8.0}, {'workDate': "2024-12-01T00:00:00", 'hours': 8.0}],
+    }
+    fetch_function = lambda employee_id, **kwds: records[employee_id]
+
+    weekly_hours = get_weekly_hours(None, "client", "legal", list(records), START_DATE, date(2025, 1, 12),
+                                    fetch_function=fetch_function)
+
+    assert sorted(weekly_hours.errors) == ["2", "3"]
+    assert all(isinstance(error, ValueError) for error in weekly_hours.errors.values())
+    assert np.isnan(weekly_hours.row("2")).all()
+    assert weekly_hours.skipped_records == {"4": 1}
+    assert weekly_hours.hours_by_employee() == {"1": 15.5, "4": 8.0}
+
+    with pytest.raises(ValueError):
+        timecard_day_hours({'workDate': "2025-01-06T00:00:00", 'hours': "eight"})
+
+    assert timecard_day_hours({'day': "2025-01-06", 'total': "7.5"}, date_key='day', hours_key='total') == (
+        date(2025, 1, 6), 7.5)
+
+
+def test_get_hours_worked_reports_errors(credentials, legal_employee_ids):
+    token_dict, client_id, legal_id = credentials
+    employee_ids = legal_employee_ids[:2] + ["1"]  # "1" isn't an employee
+
+    with pytest.raises(ValueError):
+        get_hours_worked(token_dict, client_id, legal_id, employee_ids, lookback_weeks=2, as_of=date(2025, 2, 5))
+
+    hours_worked = get_hours_worked(token_dict, client_id, legal_id, employee_ids, lookback_weeks=2,
+                                    as_of=date(2025, 2, 5), ignore_errors=True)
+    assert sorted(hours_worked) == sorted(legal_employee_ids[:2])
+    assert all(hours > 0 for hours in hours_worked.values())
+
+
+def test_workers_are_capped_at_the_pool_size(client, credentials, legal_employee_ids, monkeypatch):
+    import insperity_timecard_hours
+
+    token_dict, client_id, legal_id = credentials
+    pool_sizes = []
+
+    class RecordingExecutor(insperity_timecard_hours.ThreadPoolExecutor):
+        def __init__(self, max_workers: int):
+            pool_sizes.append(max_workers)
+            super().__init__(max_workers=max_workers)
+
+    monkeypatch.setattr(insperity_timecard_hours, 'ThreadPoolExecutor', RecordingExecutor)
+    get_weekly_hours(token_dict, client_id, legal_id, legal_employee_ids[:40], START_DATE, END_DATE, max_workers=1000)
+
+    assert pool_sizes == [client.pool_maxsize]